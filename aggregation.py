@@ -0,0 +1,244 @@
+import threading
+
+import numpy as np
+
+from history_store import PROBABILITY_COLUMNS, RECORD_DTYPE
+from inference import CLASS_NAMES
+from serial_protocol import SENSOR_FIELDS
+
+# Window width (s) -> windows kept at that resolution (None: unbounded)
+RESOLUTIONS = {
+    1: 86_400,        # one day of 1 s windows
+    60: 43_200,       # 30 days of 1 min windows
+    3_600: 43_800,    # 5 years of 1 h windows
+    86_400: None,     # 1 day windows, kept forever
+}
+FLUSH_ROWS = 256   # single records are buffered and folded in batches of this many
+STATE_COUNT_COLUMNS = tuple(f'{name.lower()}_count' for name in CLASS_NAMES)
+
+# One tumbling window. Sums rather than means, so windows merge exactly.
+WINDOW_DTYPE = np.dtype(
+    [('timestamp', np.int64), ('count', np.int64)]
+    + [(f'{name}_{stat}', dtype) for name in SENSOR_FIELDS
+       for stat, dtype in (('min', np.float32), ('max', np.float32), ('sum', np.float64))]
+    + [(f'{name}_sum', np.float64) for name in PROBABILITY_COLUMNS]
+    + [(name, np.int64) for name in STATE_COUNT_COLUMNS]
+)
+
+
+def resolution_label(resolution_s):
+    """Human-readable window width, e.g. '1 min'"""
+    for unit_s, unit in ((86_400, 'day'), (3_600, 'h'), (60, 'min')):
+        if resolution_s >= unit_s and resolution_s % unit_s == 0:
+            return f'{resolution_s // unit_s} {unit}'
+    return f'{resolution_s} s'
+
+
+def window_columns(windows):
+    """
+    Chart-ready columns for an array of windows: timestamp, count,
+    <sensor>_min/_max/_mean, <probability>_mean and the per-state counts
+    """
+    count = np.maximum(windows['count'], 1)
+    columns = {'timestamp': windows['timestamp'], 'count': windows['count']}
+    for name in SENSOR_FIELDS:
+        columns[f'{name}_min'] = windows[f'{name}_min']
+        columns[f'{name}_max'] = windows[f'{name}_max']
+        columns[f'{name}_mean'] = windows[f'{name}_sum'] / count
+    for name in PROBABILITY_COLUMNS:
+        columns[f'{name}_mean'] = windows[f'{name}_sum'] / count
+    for name in STATE_COUNT_COLUMNS:
+        columns[name] = windows[name]
+    return columns
+
+
+def summarize(records, window_ns, utc_offset=None):
+    """
+    Collapse time-ordered RECORD_DTYPE rows into one window per `window_ns`
+    bucket. With `utc_offset` (UNIX ns -> local UTC offset in ns, e.g.
+    history_store.local_offsets_ns) buckets follow local wall-clock time.
+    """
+    timestamps = records['timestamp']
+    if utc_offset is None:
+        ids = timestamps // window_ns
+        starts = np.flatnonzero(np.diff(ids, prepend=ids[0] - 1))
+        window_starts = ids[starts] * window_ns
+    else:
+        offsets = utc_offset(timestamps)
+        ids = (timestamps + offsets) // window_ns
+        starts = np.flatnonzero(np.diff(ids, prepend=ids[0] - 1) | np.diff(offsets, prepend=offsets[0]))
+        # Local bucket starts back in UTC, at the offset in force there: a DST change inside a day
+        # window keeps it one window, while an hour repeated when clocks go back becomes two
+        local_starts = ids[starts] * window_ns
+        window_starts = local_starts - utc_offset(local_starts - offsets[starts])
+        distinct = np.diff(window_starts, prepend=window_starts[0] - 1) != 0
+        starts, window_starts = starts[distinct], window_starts[distinct]
+    windows = np.empty(len(starts), dtype=WINDOW_DTYPE)
+    windows['timestamp'] = window_starts
+    windows['count'] = np.diff(np.append(starts, len(records)))
+    for name in SENSOR_FIELDS:
+        values = records[name]
+        windows[f'{name}_min'] = np.minimum.reduceat(values, starts)
+        windows[f'{name}_max'] = np.maximum.reduceat(values, starts)
+        windows[f'{name}_sum'] = np.add.reduceat(values.astype(np.float64), starts)
+    for name in PROBABILITY_COLUMNS:
+        windows[f'{name}_sum'] = np.add.reduceat(records[name].astype(np.float64), starts)
+    for code, name in enumerate(STATE_COUNT_COLUMNS):
+        windows[name] = np.add.reduceat((records['prediction'] == code).astype(np.int64), starts)
+    return windows
+
+
+def merge_window(into, window):
+    """Fold `window` into `into`, a one-element view of the window for the same bucket"""
+    into['count'] += window['count']
+    for name in SENSOR_FIELDS:
+        into[f'{name}_min'] = np.minimum(into[f'{name}_min'], window[f'{name}_min'])
+        into[f'{name}_max'] = np.maximum(into[f'{name}_max'], window[f'{name}_max'])
+        into[f'{name}_sum'] += window[f'{name}_sum']
+    for name in PROBABILITY_COLUMNS:
+        into[f'{name}_sum'] += window[f'{name}_sum']
+    for name in STATE_COUNT_COLUMNS:
+        into[name] += window[name]
+
+
+class _Level:
+    """Windows of one resolution in a growable array, oldest dropped beyond `retention`"""
+
+    def __init__(self, resolution_s, retention, utc_offset):
+        self.resolution_s = resolution_s
+        self.window_ns = resolution_s * 1_000_000_000
+        self.retention = retention
+        self.utc_offset = utc_offset
+        self.windows = np.empty(64, dtype=WINDOW_DTYPE)
+        self.size = 0
+        self.trimmed_before = None   # start of the oldest kept window once older ones were dropped
+
+    @property
+    def view(self):
+        return self.windows[:self.size]
+
+    def add(self, records):
+        new = summarize(records, self.window_ns, self.utc_offset)
+        if self.size:
+            # The first bucket usually continues the open window; late rows land in older ones
+            last = self.windows[self.size - 1]['timestamp']
+            late = int(np.searchsorted(new['timestamp'], last, 'right'))
+            for window in new[:late]:
+                self._merge_late(window)
+            new = new[late:]
+        self._append(new)
+
+    def _merge_late(self, window):
+        view = self.view
+        i = int(np.searchsorted(view['timestamp'], window['timestamp']))
+        if i < self.size and view[i]['timestamp'] == window['timestamp']:
+            merge_window(view[i:i + 1], window)
+        elif self.trimmed_before is None or window['timestamp'] >= self.trimmed_before:
+            self.windows = np.insert(view, i, window)
+            self.size += 1
+
+    def _append(self, new):
+        if not len(new):
+            return
+        if self.size + len(new) > len(self.windows):
+            grown = np.empty(max(2 * len(self.windows), self.size + len(new)), dtype=WINDOW_DTYPE)
+            grown[:self.size] = self.view
+            self.windows = grown
+        self.windows[self.size:self.size + len(new)] = new
+        self.size += len(new)
+        if self.retention is not None and self.size > 2 * self.retention:
+            # Compact in place, like HistoryStore, so trimming stays amortized O(1)
+            self.windows[:self.retention] = self.windows[self.size - self.retention:self.size]
+            self.size = self.retention
+            self.trimmed_before = int(self.windows[0]['timestamp'])
+
+    def covers(self, start_ns):
+        return self.trimmed_before is None or (start_ns is not None and start_ns >= self.trimmed_before)
+
+    def slice(self, start_ns=None, end_ns=None):
+        """Index range of the windows overlapping [start_ns, end_ns)"""
+        timestamps = self.view['timestamp']
+        lo = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns - self.window_ns, 'right'))
+        hi = self.size if end_ns is None else int(np.searchsorted(timestamps, end_ns, 'left'))
+        return lo, hi
+
+
+class HistoryAggregator:
+    """
+    Multi-resolution summaries of the prediction history.
+
+    Every record is folded into tumbling windows at each resolution in
+    `resolutions` (1 s, 1 min, 1 h and 1 day by default) holding per-sensor
+    min/max/sum, probability sums and per-state prediction counts, so a
+    query never touches raw rows. `add` is vectorized over a batch of
+    records; single records are buffered and folded FLUSH_ROWS at a time
+    (or before the next query), so per-prediction appends stay cheap.
+    Windows are aligned to local time via `utc_offset` (see
+    history_store.local_offsets_ns), so day windows match the
+    dashboard's date range across DST changes. Finer resolutions only keep a bounded number
+    of windows; queries older than that fall through to coarser ones.
+    """
+
+    def __init__(self, resolutions=None, utc_offset=None):
+        resolutions = RESOLUTIONS if resolutions is None else resolutions
+        self.utc_offset = utc_offset
+        self.levels = [_Level(r, resolutions[r], utc_offset) for r in sorted(resolutions)]
+        self.records = 0
+        self._pending = np.empty(FLUSH_ROWS, dtype=RECORD_DTYPE)
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, records):
+        """Fold a RECORD_DTYPE array (or a single record) into every resolution"""
+        records = np.atleast_1d(records)
+        if not len(records):
+            return
+        with self._lock:
+            self.records += len(records)
+            if self._pending_rows + len(records) > FLUSH_ROWS:
+                self._flush()
+            if len(records) >= FLUSH_ROWS:
+                self._fold(records)
+                return
+            self._pending[self._pending_rows:self._pending_rows + len(records)] = records
+            self._pending_rows += len(records)
+
+    def _flush(self):
+        if self._pending_rows:
+            self._fold(self._pending[:self._pending_rows].copy())
+            self._pending_rows = 0
+
+    def _fold(self, records):
+        if np.any(np.diff(records['timestamp']) < 0):
+            records = records[np.argsort(records['timestamp'], kind='stable')]
+        for level in self.levels:
+            level.add(records)
+
+    def windows(self, resolution_s, start_ns=None, end_ns=None):
+        """Copy of the windows of one resolution overlapping [start_ns, end_ns)"""
+        level = next(level for level in self.levels if level.resolution_s == resolution_s)
+        with self._lock:
+            self._flush()
+            return level.view[slice(*level.slice(start_ns, end_ns))].copy()
+
+    def query(self, start_ns=None, end_ns=None, max_points=1000):
+        """
+        Summaries of [start_ns, end_ns) sized for a chart of `max_points` points.
+
+        Returns:
+        (resolution_s, windows): the finest resolution with at most
+            `max_points` windows in range, and a copy of those windows; or
+            (None, None) when the range holds no more than `max_points`
+            records, so the caller can plot raw rows instead
+        """
+        with self._lock:
+            self._flush()
+            covering = [level for level in self.levels if level.covers(start_ns)] or self.levels[-1:]
+            finest = covering[0]
+            lo, hi = finest.slice(start_ns, end_ns)
+            if int(finest.view['count'][lo:hi].sum()) <= max_points:
+                return None, None
+            for level in covering:
+                lo, hi = level.slice(start_ns, end_ns)
+                if hi - lo <= max_points or level is covering[-1]:
+                    return level.resolution_s, level.view[lo:hi].copy()
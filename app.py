@@ -1,42 +1,126 @@
 import streamlit as st
-import serial
 import json
-import boto3
-from datetime import datetime
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from datetime import datetime, timedelta
+import numpy as np
+import os
 import time
+from pathlib import Path
+from serial_protocol import DECODERS, SENSOR_FIELDS, parse_sensor_line
+from sensor_stream import SensorRingBuffer, SerialReader
+from sensor_states import STATE_NAMES, STATE_THRESHOLDS, classify_readings
+from history_store import PROBABILITY_COLUMNS, RECORD_DTYPE, HistoryStore, local_offsets_ns
+from timeseries_log import TimeSeriesLog
+from aggregation import STATE_COUNT_COLUMNS, HistoryAggregator, resolution_label, window_columns
+from export import LATENCY_COLUMNS, export_records
+from charts import POINT_BUDGET, IncrementalChart, build_probability_figure, build_sensor_figure, fill_window_figure
+from features import PIPELINE_FILE, FeaturePipeline
+from instrumentation import Instrumentation
+from change_gate import FORWARD_REASONS, ChangeGate
+from prediction_cache import SENSOR_RESOLUTION, PredictionCache
+from inference import make_features, predict_reading
+from dispatcher import make_sagemaker_client
+from model_registry import REGISTRY_FILE, ModelRegistry, load_specs
+from monitor_client import DEFAULT_URL, MonitorClient, RemoteHistory
+
+# Persistent telemetry log, survives browser refreshes and restarts
+TELEMETRY_DIR = 'telemetry'
+
+
+@st.cache_resource(show_spinner=False)
+def get_telemetry_log(directory):
+    """Open the on-disk telemetry log once per process"""
+    return TimeSeriesLog(directory)
+
+
+@st.cache_resource(show_spinner=False)
+def get_history_aggregator(directory):
+    """Multi-resolution summaries of the telemetry log, built once per process and kept current on append"""
+    aggregator = HistoryAggregator(utc_offset=local_offsets_ns)
+    for chunk in get_telemetry_log(directory).iter_range():
+        aggregator.add(chunk)
+    return aggregator
+
+
+@st.cache_resource(show_spinner=False)
+def get_instrumentation():
+    """Per-stage latency histograms shared by every session in this process"""
+    return Instrumentation()
+
 
 # Initialize session state
 if 'history' not in st.session_state:
-    st.session_state.history = []
+    st.session_state.history = HistoryStore(retention=st.session_state.get('history_retention', 100_000))
+    # Restore the most recent predictions from disk
+    records = get_telemetry_log(TELEMETRY_DIR).tail(st.session_state.history.retention)
+    st.session_state.history.extend({name: records[name] for name in RECORD_DTYPE.names})
 if 'arduino' not in st.session_state:
     st.session_state.arduino = None
 if 'connection_status' not in st.session_state:
     st.session_state.connection_status = False
-if 'latency_history' not in st.session_state:
-    st.session_state.latency_history = []
+if 'reader' not in st.session_state:
+    st.session_state.reader = None
+if 'sensor_buffer' not in st.session_state:
+    st.session_state.sensor_buffer = None
+if 'gate' not in st.session_state:
+    st.session_state.gate = ChangeGate()
 
-# AWS SageMaker endpoint configuration
+# AWS SageMaker endpoint used until the model registry file names another
 ENDPOINT_NAME = 'cpu-state-xgboost-endpoint-improved-1744570066'
-sagemaker_runtime = boto3.client('sagemaker-runtime', region_name='us-east-1')
+# Active model and shadow candidate; the notebook rewrites it after a redeploy and the dashboard follows
+MODEL_REGISTRY_PATH = REGISTRY_FILE
+# Concurrent requests allowed per endpoint; the client's connection pool is sized to match
+MAX_IN_FLIGHT = 8
+
+# Tail percentiles shown next to the mean in the latency statistics
+LATENCY_PERCENTILES = [0.5, 0.95, 0.99]
+
+# Trained model artifact used by the local (edge) inference backend
+LOCAL_MODEL_PATH = 'model.tar.gz'
+# Scaler parameters saved by the notebook next to the model; without it the legacy ten features are sent
+FEATURE_PIPELINE_PATH = PIPELINE_FILE
+
+# Prediction cache defaults (entries kept / seconds an entry stays valid)
+CACHE_CAPACITY = 4096
+CACHE_TTL_S = 30
+
+# Micro-batching defaults (rows per request / how long to wait for more rows)
+MAX_BATCH_SIZE = 16
+BATCH_WINDOW_MS = 20
+
+# Headless monitor_service.py the dashboard can run as a client of
+MONITOR_URL = os.environ.get('MONITOR_URL', DEFAULT_URL)
+MONITOR_REFRESH_S = 5
 
 # Arduino Configuration
 ARDUINO_PORT = 'COM13'
 BAUD_RATE = 9600
+BINARY_BAUD_RATE = 115200  # arduino_code.ino with BINARY_PROTOCOL 1
 TIMEOUT = 1
+RING_BUFFER_CAPACITY = 4096
 
 # Streamlit app title
 st.set_page_config(page_title="CPU State Monitor", layout="wide")
 st.title("CPU State Monitor")
 
 def connect_arduino():
-    """Establish connection to Arduino"""
+    """Establish connection to Arduino and start the background reader"""
     try:
         if st.session_state.arduino is None:
-            st.session_state.arduino = serial.Serial(ARDUINO_PORT, BAUD_RATE, timeout=TIMEOUT)
+            protocol = st.session_state.get('serial_protocol', 'text')
+            baud_rate = BINARY_BAUD_RATE if protocol == 'binary' else BAUD_RATE
+            import serial  # pyserial is only needed once a port is opened
+            st.session_state.arduino = serial.Serial(ARDUINO_PORT, baud_rate, timeout=TIMEOUT)
             st.session_state.connection_status = True
+
+            # Binary frames can only be decoded by the background reader
+            if st.session_state.get('continuous_ingestion', True) or protocol == 'binary':
+                st.session_state.sensor_buffer = SensorRingBuffer(RING_BUFFER_CAPACITY)
+                st.session_state.reader = SerialReader(
+                    st.session_state.arduino,
+                    st.session_state.sensor_buffer,
+                    DECODERS[protocol]()
+                )
+                st.session_state.reader.start()
             return True
     except Exception as e:
         st.error(f"Failed to connect to Arduino: {str(e)}")
@@ -44,9 +128,16 @@ def connect_arduino():
         st.session_state.arduino = None
         return False
 
+def stop_reader():
+    """Stop the background reader thread, if one is running"""
+    if st.session_state.reader is not None:
+        st.session_state.reader.stop(timeout=TIMEOUT + 1)
+        st.session_state.reader = None
+
 def disconnect_arduino():
     """Safely disconnect from Arduino"""
     try:
+        stop_reader()
         if st.session_state.arduino is not None:
             st.session_state.arduino.close()
             st.session_state.arduino = None
@@ -56,129 +147,266 @@ def disconnect_arduino():
         st.error(f"Error disconnecting Arduino: {str(e)}")
 
 def read_sensor_data():
-    """Read data from Arduino and return parsed values"""
+    """Return the latest sensor reading from the ring buffer, or read one line from Arduino"""
     try:
         if st.session_state.arduino is None:
             if not connect_arduino():
                 return None
+
+        instrumentation = get_instrumentation()
         
+        # Continuous mode: the background reader owns the port, just take a snapshot
+        reader = st.session_state.reader
+        if reader is not None:
+            if reader.error is not None:
+                raise reader.error
+            with instrumentation.span('serial_read'):
+                latest = st.session_state.sensor_buffer.latest()
+            return latest[1] if latest else {}
+
         # Read data from Arduino
-        line = st.session_state.arduino.readline().decode('utf-8').strip()
+        with instrumentation.span('serial_read'):
+            line = st.session_state.arduino.readline().decode('utf-8').strip()
         
         # Parse the data
-        data = {}
-        parts = line.split(" | ")
-        
-        for part in parts:
-            if ":" in part:
-                key, value = part.split(":", 1)
-                key = key.strip().lower()
-                try:
-                    value = float(value.split()[0])  # Extract the numeric value
-                    
-                    # Map the keys to the expected format
-                    if "temperature" in key:
-                        data['temperature'] = value
-                    elif "voltage" in key:
-                        data['voltage'] = value
-                    elif "current" in key:
-                        data['current'] = value
-                    elif "cpu usage" in key or "cpu" in key:
-                        data['cpu_usage'] = value
-                    elif "fan speed" in key or "fan" in key:
-                        data['fan_speed'] = value
-                except ValueError:
-                    continue
-        
-        return data
+        with instrumentation.span('parse'):
+            return parse_sensor_line(line)
     except Exception as e:
         st.error(f"Error reading sensor data: {str(e)}")
         # If there's an error, try to reconnect
+        stop_reader()
         st.session_state.arduino = None
         st.session_state.connection_status = False
         return None
 
-def get_sensor_state(sensor_type, value):
-    """Determine sensor state based on thresholds"""
-    ranges = {
-        'temperature': {'normal': (0, 70), 'warning': (70, 85)},
-        'voltage': {'normal': (3.0, 3.6), 'warning': (2.7, 3.0)},
-        'current': {'normal': (0, 2.0), 'warning': (2.0, 2.5)},
-        'cpu_usage': {'normal': (0, 70), 'warning': (70, 85)},
-        'fan_speed': {'normal': (1000, 2500), 'warning': (2500, 3000)}
-    }
-    
-    range_values = ranges[sensor_type]
-    if range_values['normal'][0] <= value <= range_values['normal'][1]:
-        return 0  # Normal
-    elif range_values['warning'][0] <= value <= range_values['warning'][1]:
-        return 1  # Warning
-    else:
-        return 2  # Critical
+@st.cache_resource(show_spinner=False)
+def get_sagemaker_runtime():
+    """
+    SageMaker runtime client, built on first use and shared by the process;
+    boto3's import and credential/endpoint resolution stay off the first paint
+    """
+    return make_sagemaker_client(region_name='us-east-1', max_pool_connections=MAX_IN_FLIGHT)
+
+@st.cache_resource(show_spinner=False)
+def get_model_registry(path):
+    """
+    Active model (plus any shadow candidate) shared by every session, built on
+    the first prediction; swaps from the sidebar or edits to the registry
+    file take effect without a restart
+    """
+    # A reading in the middle of every normal band, used to check a new model answers before the swap
+    nominal = STATE_THRESHOLDS[:, :2].mean(axis=1).tolist()
+    return ModelRegistry.from_file(
+        path,
+        default={'endpoint': ENDPOINT_NAME},
+        client_factory=get_sagemaker_runtime,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=BATCH_WINDOW_MS,
+        max_in_flight=MAX_IN_FLIGHT,
+        probe=make_features(nominal, get_feature_pipeline(FEATURE_PIPELINE_PATH)),
+        instrumentation=get_instrumentation()
+    ).watch()
+
+def registry_entry():
+    """The registry file's specs without building any model, for display"""
+    if os.path.exists(MODEL_REGISTRY_PATH):
+        return load_specs(MODEL_REGISTRY_PATH)
+    return {'active': {'endpoint': ENDPOINT_NAME}, 'candidate': None, 'shadow_fraction': 0.0}
+
+@st.cache_resource
+def get_feature_pipeline(path):
+    """Load the fitted feature pipeline once per process, or None if it hasn't been saved"""
+    if not os.path.exists(path):
+        return None
+    return FeaturePipeline.load(path)
+
+@st.cache_resource
+def get_prediction_cache(resolution_steps, ttl_s, capacity=CACHE_CAPACITY):
+    """Prediction cache shared by every session; changing its settings starts a fresh one"""
+    resolution = {name: step * resolution_steps for name, step in SENSOR_RESOLUTION.items()}
+    return PredictionCache(resolution, capacity=capacity, ttl_s=ttl_s)
+
+def current_route():
+    """Label stage timings by network type for endpoint calls, or "Edge" for local scoring"""
+    if get_model_registry(MODEL_REGISTRY_PATH).active.kind == 'local':
+        return 'Edge'
+    return st.session_state.get('network_type', '4G')
+
+def current_model_tag():
+    """Identifies the model answering predictions, so cached results are dropped when it changes"""
+    pipeline_version = os.path.getmtime(FEATURE_PIPELINE_PATH) if os.path.exists(FEATURE_PIPELINE_PATH) else None
+    return (*get_model_registry(MODEL_REGISTRY_PATH).active.tag, pipeline_version)
 
 def get_prediction(data):
     """Get prediction from SageMaker endpoint"""
     try:
-        # Add state labels
-        features = [
-            data['temperature'],
-            data['voltage'],
-            data['current'],
-            data['cpu_usage'],
-            data['fan_speed'],
-            get_sensor_state('temperature', data['temperature']),
-            get_sensor_state('voltage', data['voltage']),
-            get_sensor_state('current', data['current']),
-            get_sensor_state('cpu_usage', data['cpu_usage']),
-            get_sensor_state('fan_speed', data['fan_speed'])
-        ]
+        values = [data[name] for name in SENSOR_FIELDS]
         
-        # Convert to CSV
-        csv_data = ','.join(map(str, features))
-        
-        # Record start time
-        start_time = time.time()
+        cache = None
+        if st.session_state.get('prediction_cache', True):
+            cache = get_prediction_cache(
+                st.session_state.get('cache_resolution_steps', 1),
+                st.session_state.get('cache_ttl_s', CACHE_TTL_S)
+            )
         
-        # Get prediction
-        response = sagemaker_runtime.invoke_endpoint(
-            EndpointName=ENDPOINT_NAME,
-            ContentType='text/csv',
-            Body=csv_data
+        # The active model's predictor folds concurrent rows into one multi-row request
+        registry = get_model_registry(MODEL_REGISTRY_PATH)
+        registry.set_batching(
+            st.session_state.get('max_batch_size', MAX_BATCH_SIZE),
+            st.session_state.get('batch_window_ms', BATCH_WINDOW_MS)
         )
         
-        # Calculate latency
-        latency = (time.time() - start_time) * 1000  # Convert to milliseconds
-        
-        # Parse response
-        result = response['Body'].read().decode().strip()
-        probabilities = [float(p) for p in result.split(',')]
-        
-        # Store latency information
-        network_type = st.session_state.get('network_type', '4G')  # Default to 4G if not set
-        st.session_state.latency_history.append({
-            'timestamp': datetime.now().isoformat(),
-            'network_type': network_type,
-            'latency': latency,
-            'prediction': ['Normal', 'Warning', 'Critical'][probabilities.index(max(probabilities))]
-        })
-        
-        return {
-            'input_data': csv_data,
-            'probabilities': {
-                'Normal': probabilities[0],
-                'Warning': probabilities[1],
-                'Critical': probabilities[2]
-            },
-            'prediction': ['Normal', 'Warning', 'Critical'][probabilities.index(max(probabilities))],
-            'latency': latency
-        }
+        # Batch stages are recorded once per batch by the predictor, under this row's route
+        route = current_route()
+        return predict_reading(
+            values,
+            lambda features: registry.predict(features, route=route),
+            pipeline=get_feature_pipeline(FEATURE_PIPELINE_PATH),
+            cache=cache,
+            model_tag=current_model_tag(),
+            instrumentation=get_instrumentation(),
+            network=route
+        )
     except Exception as e:
         st.error(f"Error getting prediction: {str(e)}")
         return None
 
+def gated_prediction(data):
+    """Get a prediction only if the change gate says the reading needs one; otherwise reuse the last"""
+    if not st.session_state.get('change_detection', True):
+        return get_prediction(data)
+    
+    gate = st.session_state.gate
+    gate_start = time.perf_counter()
+    if gate.check([data[name] for name in SENSOR_FIELDS]) is None:
+        gate_latency = (time.perf_counter() - gate_start) * 1000
+        return {
+            **gate.last_prediction,
+            'latency': gate_latency,
+            'amortized_latency': gate_latency,
+            'batch_size': 1,
+            'backend': 'gate'
+        }
+    
+    result = get_prediction(data)
+    if result:
+        gate.remember(result)
+    else:
+        gate.forward_failed()
+    return result
+
+@st.cache_resource
+def get_monitor_client(url):
+    return MonitorClient(url)
+
+def get_remote_history(client, device):
+    """Session mirror of one device's history on the monitor service, topped up on every rerun"""
+    key = (client.url, device)
+    if st.session_state.get('remote_history_key') != key:
+        st.session_state.remote_history = RemoteHistory(client, device, st.session_state.get('history_retention', 100_000))
+        st.session_state.remote_history_key = key
+    st.session_state.remote_history.refresh()
+    return st.session_state.remote_history
+
+def show_service_overview(client, device):
+    """Fleet table plus the selected device's latest reading and prediction, from the monitor service"""
+    devices = client.devices()
+    st.subheader("Fleet")
+    st.dataframe(
+        [{key: d[key] for key in ('device_id', 'prediction', 'readings', 'predicted', 'suppressed', 'shed', 'errors')}
+         for d in devices],
+        hide_index=True,
+        use_container_width=True
+    )
+    current = next((d for d in devices if d['device_id'] == device), None)
+    if current is None or current['reading'] is None:
+        st.info("No readings from this device yet.")
+        return
+    st.subheader(f"Sensor Data ({device})")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("##### Raw Values")
+        for name, value in current['reading'].items():
+            st.write(f"{name.replace('_', ' ').title()}: {value:.2f}")
+    with col2:
+        st.markdown("##### State Labels")
+        states = classify_readings([current['reading'][name] for name in SENSOR_FIELDS])
+        for name, state in zip(SENSOR_FIELDS, states):
+            st.write(f"{name.replace('_', ' ').title()}: {STATE_NAMES[state]}")
+    if current['prediction'] is not None:
+        st.subheader("Prediction Result")
+        state_color = {'Normal': 'green', 'Warning': 'orange', 'Critical': 'red'}[current['prediction']]
+        st.markdown(f"""
+        <h3 style='text-align: center'>
+            System Status: <span style='color: {state_color}'>{current['prediction']}</span>
+        </h3>
+        """, unsafe_allow_html=True)
+        for state, prob in current['probabilities'].items():
+            st.markdown(f"**{state}**")
+            st.progress(float(prob))
+
+def show_monitor_view(client, device):
+    """
+    Service overview for the data tab. Run as a fragment, so auto refresh
+    re-runs only this part (topping up the history mirror on the way) and
+    the rest of the page stays responsive between polls.
+    """
+    try:
+        get_remote_history(client, device)
+        show_service_overview(client, device)
+    except Exception as e:
+        st.error(f"Error fetching data from the monitor service: {str(e)}")
+
+def show_export(path, rows):
+    """Describe a written export file and offer it for download"""
+    st.caption(f"Wrote {rows} rows to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    st.download_button(
+        label="Click to Download",
+        data=Path(path).read_bytes,  # only read when the user clicks
+        file_name=os.path.basename(path),
+        mime="text/csv" if path.endswith('.csv') else "application/octet-stream"
+    )
+
+def describe_model(spec):
+    return f"endpoint `{spec['endpoint']}`" if 'endpoint' in spec else f"local model `{spec['model']}`"
+
 # Create tabs
 data_tab, history_tab, latency_tab = st.tabs(["Current Data", "History", "Network Latency"])
 
+# Data source: this process (serial + inference) or a headless monitor service
+with st.sidebar:
+    st.subheader("Data Source")
+    data_source = st.radio(
+        "Readings and predictions from",
+        options=['local', 'service'],
+        format_func=lambda s: {'local': 'This dashboard (Arduino)', 'service': 'Monitor service'}[s],
+        key='data_source'
+    )
+    service_mode = data_source == 'service'
+    monitor_client = None
+    monitor_device = None
+    if service_mode:
+        monitor_url = st.text_input("Service URL", value=MONITOR_URL, key='monitor_url')
+        try:
+            monitor_client = get_monitor_client(monitor_url)
+            device_ids = [d['device_id'] for d in monitor_client.devices()]
+        except Exception as e:
+            st.error(f"Monitor service unavailable: {str(e)}")
+            device_ids = []
+        monitor_device = st.selectbox("Device", device_ids, key='monitor_device')
+        st.checkbox("Auto refresh", value=True, key='monitor_auto_refresh',
+                    help=f"Poll the service every {MONITOR_REFRESH_S} s")
+
+# History shown in the tabs: the session's own, or the service's for the selected device
+history_store = st.session_state.history
+remote_history = None
+if service_mode and monitor_device is not None:
+    try:
+        remote_history = get_remote_history(monitor_client, monitor_device)
+        history_store = remote_history.store
+    except Exception as e:
+        st.error(f"Error fetching history from the monitor service: {str(e)}")
+
 # Network type selector in sidebar
 with st.sidebar:
     st.subheader("Network Configuration")
@@ -188,13 +416,159 @@ with st.sidebar:
         key='network_type'
     )
 
+    st.subheader("Model")
+    try:
+        entry = registry_entry()
+        if service_mode:
+            status = monitor_client.model() if monitor_client is not None else None
+            entry = status and {
+                'active': status['active']['spec'],
+                'candidate': status['candidate']['spec'] if status['candidate'] else None,
+                'shadow_fraction': status['shadow_fraction']
+            }
+    except Exception as e:
+        st.error(f"Error reading the model registry: {str(e)}")
+        entry = None
+    if entry:
+        active, candidate = entry['active'], entry.get('candidate')
+        st.caption(f"Active: {describe_model(active)}")
+        if candidate:
+            st.caption(f"Shadowing {describe_model(candidate)} on {entry['shadow_fraction']:.0%} of traffic")
+    if not service_mode:
+        model_kind = st.radio(
+            "Target",
+            options=['endpoint', 'model'],
+            format_func=lambda k: {'endpoint': 'SageMaker endpoint', 'model': 'Local (edge) model'}[k],
+            key='model_kind',
+            horizontal=True
+        )
+        target = st.text_input(
+            "Endpoint name" if model_kind == 'endpoint' else "Model artifact",
+            value=ENDPOINT_NAME if model_kind == 'endpoint' else LOCAL_MODEL_PATH,
+            key=f'model_target_{model_kind}'
+        )
+        shadow_percent = st.slider("Shadow traffic (%)", min_value=1, max_value=100, value=10, key='shadow_percent')
+        spec = {model_kind: target}
+        col1, col2 = st.columns(2)
+        try:
+            # In-flight predictions finish on the old model; new ones go to the new one
+            if col1.button("Swap now", help="Make this the active model without dropping in-flight readings"):
+                get_model_registry(MODEL_REGISTRY_PATH).activate(spec)
+                st.rerun()
+            if col2.button("Shadow test", help="Also score a share of readings on this model and compare"):
+                get_model_registry(MODEL_REGISTRY_PATH).shadow(spec, shadow_percent / 100)
+                st.rerun()
+            if entry and entry.get('candidate'):
+                if col1.button("Promote"):
+                    get_model_registry(MODEL_REGISTRY_PATH).promote()
+                    st.rerun()
+                if col2.button("Stop shadow"):
+                    get_model_registry(MODEL_REGISTRY_PATH).stop_shadow()
+                    st.rerun()
+        except Exception as e:
+            st.error(f"Error switching models: {str(e)}")
+
+    st.subheader("History")
+    st.number_input(
+        "Rows kept in memory",
+        min_value=1_000,
+        max_value=10_000_000,
+        value=100_000,
+        step=10_000,
+        key='history_retention',
+        help="Oldest predictions are dropped beyond this many rows"
+    )
+    st.session_state.history.retention = st.session_state.history_retention
+
+    st.subheader("Change Detection")
+    st.checkbox(
+        "Only predict when readings change",
+        value=True,
+        key='change_detection',
+        help="Stable readings reuse the last prediction until a sensor changes state, "
+             "deviates from its running mean or the heartbeat interval passes"
+    )
+    st.session_state.gate.threshold = st.number_input(
+        "Deviation threshold (std devs)",
+        min_value=0.5,
+        max_value=10.0,
+        value=3.0,
+        step=0.5,
+        key='gate_threshold'
+    )
+    st.session_state.gate.heartbeat_s = st.number_input(
+        "Heartbeat (s)",
+        min_value=1,
+        max_value=3600,
+        value=30,
+        key='gate_heartbeat_s'
+    )
+
+    st.subheader("Prediction Cache")
+    st.checkbox(
+        "Reuse predictions for unchanged readings",
+        value=True,
+        key='prediction_cache'
+    )
+    st.number_input(
+        "Resolution (ADC steps)",
+        min_value=1,
+        max_value=100,
+        value=1,
+        key='cache_resolution_steps',
+        help="Readings that round to the same multiple of this many Arduino ADC steps share a prediction"
+    )
+    st.number_input(
+        "Entry lifetime (s)",
+        min_value=1,
+        max_value=3600,
+        value=CACHE_TTL_S,
+        key='cache_ttl_s'
+    )
+
+    st.subheader("Inference Batching")
+    st.number_input(
+        "Max batch size (rows)",
+        min_value=1,
+        max_value=256,
+        value=MAX_BATCH_SIZE,
+        key='max_batch_size'
+    )
+    st.number_input(
+        "Batch window (ms)",
+        min_value=0,
+        max_value=1000,
+        value=BATCH_WINDOW_MS,
+        key='batch_window_ms'
+    )
+
 # Connection status and control in sidebar
 with st.sidebar:
     st.subheader("Arduino Connection")
     status_color = "green" if st.session_state.connection_status else "red"
     st.markdown(f"Status: <span style='color: {status_color}'>{'Connected' if st.session_state.connection_status else 'Disconnected'}</span>", unsafe_allow_html=True)
+    st.radio(
+        "Serial protocol",
+        options=['text', 'binary'],
+        key='serial_protocol',
+        disabled=st.session_state.connection_status,
+        help="Must match BINARY_PROTOCOL in arduino_code.ino"
+    )
+    st.checkbox(
+        "Continuous ingestion",
+        value=True,
+        key='continuous_ingestion',
+        disabled=st.session_state.connection_status,
+        help="Drain the serial port in a background thread instead of reading one line per click"
+    )
+    if st.session_state.reader is not None:
+        st.caption(f"Buffered readings: {len(st.session_state.sensor_buffer)} "
+                   f"(received {st.session_state.reader.readings}, "
+                   f"unparsed {st.session_state.reader.parse_errors})")
     
-    if not st.session_state.connection_status:
+    if service_mode:
+        st.caption("The monitor service owns the serial ports while the dashboard is its client")
+    elif not st.session_state.connection_status:
         if st.button("Connect to Arduino"):
             connect_arduino()
             st.rerun()
@@ -205,28 +579,39 @@ with st.sidebar:
 
 # Current Data Tab
 with data_tab:
-    read_button = st.button("Read Sensor Data and Predict", disabled=not st.session_state.connection_status)
+    if service_mode and monitor_device is not None:
+        run_every = MONITOR_REFRESH_S if st.session_state.get('monitor_auto_refresh', True) else None
+        st.fragment(run_every=run_every)(show_monitor_view)(monitor_client, monitor_device)
+    read_button = st.button("Read Sensor Data and Predict",
+                            disabled=service_mode or not st.session_state.connection_status)
     
     if read_button:
         # Read sensor data
         sensor_data = read_sensor_data()
         
-        if sensor_data and all(k in sensor_data for k in ['temperature', 'voltage', 'current', 'cpu_usage', 'fan_speed']):
-            # Get prediction
-            result = get_prediction(sensor_data)
+        if sensor_data and all(k in sensor_data for k in SENSOR_FIELDS):
+            # Get prediction (or reuse the last one if nothing has changed)
+            result = gated_prediction(sensor_data)
             
             if result:
                 # Store in history
-                history_entry = {
-                    'timestamp': datetime.now().isoformat(),
-                    'sensor_data': sensor_data,
-                    'endpoint_input': result['input_data'],
-                    'prediction': result['prediction'],
-                    'probabilities': result['probabilities']
-                }
-                st.session_state.history.append(history_entry)
+                st.session_state.history.append(
+                    datetime.now(),
+                    sensor_data,
+                    result['probabilities'],
+                    result['latency'],
+                    amortized_latency=result['amortized_latency'],
+                    batch_size=result['batch_size'],
+                    network_type=st.session_state.get('network_type', '4G'),
+                    backend=result['backend']
+                )
+                history = st.session_state.history
+                record = history.records(len(history) - 1)
+                get_telemetry_log(TELEMETRY_DIR).append(record)
+                get_history_aggregator(TELEMETRY_DIR).add(record)
                 
                 # Display current data
+                render_start = time.perf_counter_ns()
                 st.subheader("Sensor Data")
                 col1, col2 = st.columns(2)
                 
@@ -237,14 +622,17 @@ with data_tab:
                 
                 with col2:
                     st.markdown("##### State Labels")
-                    for name, value in sensor_data.items():
-                        state = get_sensor_state(name, value)
-                        state_name = {0: "Normal", 1: "Warning", 2: "Critical"}[state]
-                        st.write(f"{name.replace('_', ' ').title()}: {state_name}")
+                    states = classify_readings([sensor_data[name] for name in SENSOR_FIELDS])
+                    for name, state in zip(SENSOR_FIELDS, states):
+                        st.write(f"{name.replace('_', ' ').title()}: {STATE_NAMES[state]}")
                 
                 # Show endpoint input
                 st.subheader("Data Sent to Endpoint")
                 st.code(result['input_data'])
+                if result['backend'] == 'cache':
+                    st.caption("Served from the prediction cache; no endpoint call was made")
+                elif result['backend'] == 'gate':
+                    st.caption("Readings unchanged; reused the last prediction without a model call")
                 
                 # Show prediction
                 st.subheader("Prediction Result")
@@ -267,15 +655,16 @@ with data_tab:
                     st.markdown(f"**{state}**")
                     st.progress(float(prob))
                     st.markdown(f"<p style='text-align: right; color: {color}'>{prob:.1%}</p>", unsafe_allow_html=True)
+                get_instrumentation().record('render', time.perf_counter_ns() - render_start, current_route())
 
 # History Tab
 with history_tab:
     st.header("Prediction History")
     
-    if st.session_state.history:
-        # Convert history to DataFrame
-        history_df = pd.DataFrame(st.session_state.history)
-        history_df['timestamp'] = pd.to_datetime(history_df['timestamp'])
+    telemetry_log = remote_history if service_mode else get_telemetry_log(TELEMETRY_DIR)
+    if telemetry_log is not None and len(telemetry_log):
+        first_date = datetime.fromtimestamp(telemetry_log.first_timestamp() / 1e9).date()
+        last_date = datetime.fromtimestamp(telemetry_log.last_timestamp() / 1e9).date()
         
         # Time range selector
         st.subheader("Time Range")
@@ -283,124 +672,113 @@ with history_tab:
         with col1:
             start_date = st.date_input(
                 "Start Date",
-                value=history_df['timestamp'].min().date(),
-                min_value=history_df['timestamp'].min().date(),
-                max_value=history_df['timestamp'].max().date()
+                value=first_date,
+                min_value=first_date,
+                max_value=last_date
             )
         with col2:
             end_date = st.date_input(
                 "End Date",
-                value=history_df['timestamp'].max().date(),
-                min_value=history_df['timestamp'].min().date(),
-                max_value=history_df['timestamp'].max().date()
+                value=last_date,
+                min_value=first_date,
+                max_value=last_date
             )
         
-        # Filter data based on selected date range
-        mask = (history_df['timestamp'].dt.date >= start_date) & (history_df['timestamp'].dt.date <= end_date)
-        filtered_df = history_df[mask]
+        # Filter data based on selected date range via the log's sparse timestamp index
+        start_ns = int(datetime.combine(start_date, datetime.min.time()).timestamp() * 1e9)
+        end_ns = int((datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)).timestamp() * 1e9)
+        # Ranges with more rows than the chart can show are drawn from pre-aggregated windows
+        try:
+            if service_mode:
+                resolution, windows = monitor_client.aggregates(monitor_device, start_ns, end_ns, POINT_BUDGET)
+            else:
+                resolution, windows = get_history_aggregator(TELEMETRY_DIR).query(start_ns, end_ns, POINT_BUDGET)
+        except Exception as e:
+            st.error(f"Error summarizing history: {str(e)}")
+            resolution = None
+        if resolution is None:
+            filtered_records = telemetry_log.query(start_ns, end_ns)
+            rows_in_range = len(filtered_records)
+        else:
+            summary = window_columns(windows)
+            rows_in_range = int(summary['count'].sum())
         
-        if not filtered_df.empty:
+        if rows_in_range:
+            import plotly.graph_objects as go  # deferred until there is a chart to draw
+            if resolution is None:
+                # Raw ranges fit the point budget unless summarizing failed; LTTB bounds them if not
+                if 'charts' not in st.session_state:
+                    st.session_state.charts = {}
+                timestamps = filtered_records['timestamp']
+            else:
+                st.caption(
+                    f"{rows_in_range:,} readings shown as {len(windows)} {resolution_label(resolution)} windows "
+                    "(means, with min/max bands for sensors)"
+                )
+            
             # 1. State Probabilities Over Time
             st.subheader("System State Probabilities")
-            fig_probs = go.Figure()
-            
-            for state in ['Normal', 'Warning', 'Critical']:
-                probs = [entry['probabilities'][state] for entry in filtered_df.to_dict('records')]
-                fig_probs.add_trace(go.Scatter(
-                    x=filtered_df['timestamp'],
-                    y=probs,
-                    name=state,
-                    fill='tonexty',
-                    line=dict(
-                        width=2,
-                        color={'Normal': 'green', 'Warning': 'orange', 'Critical': 'red'}[state]
-                    )
-                ))
-            
-            fig_probs.update_layout(
-                title="State Probabilities Over Time",
-                xaxis_title="Time",
-                yaxis_title="Probability",
-                height=400,
-                yaxis=dict(range=[0, 1]),
-                hovermode='x unified',
-                showlegend=True,
-                legend=dict(
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="left",
-                    x=0.01
+            if resolution is None:
+                chart_key = ('probabilities', start_ns, end_ns)
+                if chart_key not in st.session_state.charts:
+                    st.session_state.charts[chart_key] = IncrementalChart(build_probability_figure())
+                fig_probs = st.session_state.charts[chart_key].update(
+                    timestamps,
+                    [filtered_records[column] for column in PROBABILITY_COLUMNS]
+                )
+            else:
+                fig_probs = fill_window_figure(
+                    build_probability_figure(),
+                    summary['timestamp'],
+                    [summary[f'{column}_mean'] for column in PROBABILITY_COLUMNS]
                 )
-            )
             st.plotly_chart(fig_probs, use_container_width=True)
             
             # 2. Sensor Data Visualization
             st.subheader("Sensor Readings")
             
-            # Create sensor data DataFrame
-            sensor_data = pd.DataFrame([h['sensor_data'] for h in filtered_df.to_dict('records')])
-            sensor_data.index = filtered_df['timestamp']
-            
             # Sensor selection
             selected_sensors = st.multiselect(
                 "Select sensors to display",
-                ['temperature', 'voltage', 'current', 'cpu_usage', 'fan_speed'],
+                list(SENSOR_FIELDS),
                 default=['temperature', 'cpu_usage']
             )
             
-            if selected_sensors:
-                # Create subplots for selected sensors
-                fig_sensors = make_subplots(
-                    rows=len(selected_sensors),
-                    cols=1,
-                    subplot_titles=[s.replace('_', ' ').title() for s in selected_sensors],
-                    vertical_spacing=0.05
+            if selected_sensors and resolution is None:
+                # Subplots and threshold lines are built once per selection; later reruns only add points
+                chart_key = ('sensors', tuple(selected_sensors), start_ns, end_ns)
+                if chart_key not in st.session_state.charts:
+                    st.session_state.charts[chart_key] = IncrementalChart(build_sensor_figure(selected_sensors))
+                fig_sensors = st.session_state.charts[chart_key].update(
+                    timestamps,
+                    [filtered_records[sensor] for sensor in selected_sensors]
                 )
-                
-                # Add traces for each selected sensor
-                for i, sensor in enumerate(selected_sensors, 1):
-                    fig_sensors.add_trace(
-                        go.Scatter(
-                            x=sensor_data.index,
-                            y=sensor_data[sensor],
-                            name=sensor.replace('_', ' ').title(),
-                            line=dict(width=2),
-                            fill='tozeroy'
-                        ),
-                        row=i,
-                        col=1
-                    )
-                    
-                    # Add threshold lines
-                    if sensor == 'temperature':
-                        fig_sensors.add_hline(y=70, line_dash="dash", line_color="orange", row=i, col=1)
-                        fig_sensors.add_hline(y=85, line_dash="dash", line_color="red", row=i, col=1)
-                    elif sensor == 'voltage':
-                        fig_sensors.add_hline(y=3.0, line_dash="dash", line_color="orange", row=i, col=1)
-                        fig_sensors.add_hline(y=2.7, line_dash="dash", line_color="red", row=i, col=1)
-                    elif sensor == 'current':
-                        fig_sensors.add_hline(y=2.0, line_dash="dash", line_color="orange", row=i, col=1)
-                        fig_sensors.add_hline(y=2.5, line_dash="dash", line_color="red", row=i, col=1)
-                    elif sensor == 'cpu_usage':
-                        fig_sensors.add_hline(y=70, line_dash="dash", line_color="orange", row=i, col=1)
-                        fig_sensors.add_hline(y=85, line_dash="dash", line_color="red", row=i, col=1)
-                    elif sensor == 'fan_speed':
-                        fig_sensors.add_hline(y=2500, line_dash="dash", line_color="orange", row=i, col=1)
-                        fig_sensors.add_hline(y=3000, line_dash="dash", line_color="red", row=i, col=1)
-                
-                fig_sensors.update_layout(
-                    height=250 * len(selected_sensors),
-                    showlegend=False,
-                    hovermode='x unified'
+                st.plotly_chart(fig_sensors, use_container_width=True)
+            elif selected_sensors:
+                # The newest window is still filling, so aggregated charts are rebuilt each rerun
+                fig_sensors = fill_window_figure(
+                    build_sensor_figure(selected_sensors),
+                    summary['timestamp'],
+                    [summary[f'{sensor}_mean'] for sensor in selected_sensors],
+                    bands=[(summary[f'{sensor}_min'], summary[f'{sensor}_max']) for sensor in selected_sensors]
                 )
                 st.plotly_chart(fig_sensors, use_container_width=True)
             
+            if resolution is None:
+                # Drop charts for ranges/selections that are no longer shown
+                live_keys = {('probabilities', start_ns, end_ns), ('sensors', tuple(selected_sensors), start_ns, end_ns)}
+                st.session_state.charts = {k: v for k, v in st.session_state.charts.items() if k in live_keys}
+            
             # 3. State Distribution Pie Chart
             st.subheader("State Distribution")
-            predictions = filtered_df['prediction'].value_counts()
+            if resolution is None:
+                predictions = np.bincount(filtered_records['prediction'], minlength=len(STATE_NAMES))
+            else:
+                predictions = [int(summary[column].sum()) for column in STATE_COUNT_COLUMNS]
             fig_pie = go.Figure(data=[go.Pie(
-                labels=predictions.index,
-                values=predictions.values,
+                labels=list(STATE_NAMES),
+                values=predictions,
+                sort=False,
                 marker=dict(colors=['green', 'orange', 'red'])
             )])
             fig_pie.update_layout(
@@ -411,14 +789,17 @@ with history_tab:
             
             # 4. Export functionality
             st.subheader("Export Data")
-            if st.button("Download History Data as CSV"):
-                csv = filtered_df.to_csv(index=False)
-                st.download_button(
-                    label="Click to Download",
-                    data=csv,
-                    file_name="sensor_history.csv",
-                    mime="text/csv"
-                )
+            history_format = st.radio("Format", ['csv', 'parquet'], horizontal=True, key='history_export_format')
+            if st.button("Export History Data"):
+                try:
+                    # Streams from the memory-mapped log one chunk at a time
+                    st.session_state.history_export = export_records(
+                        telemetry_log.iter_range(start_ns, end_ns), 'sensor_history', history_format
+                    )
+                except Exception as e:
+                    st.error(f"Error exporting history: {str(e)}")
+            if st.session_state.get('history_export'):
+                show_export(*st.session_state.history_export)
     else:
         st.info("No history data available. Click 'Read Sensor Data and Predict' to collect data.")
 
@@ -426,16 +807,24 @@ with history_tab:
 with latency_tab:
     st.header("Network Latency Comparison")
     
-    if st.session_state.latency_history:
-        latency_df = pd.DataFrame(st.session_state.latency_history)
-        latency_df['timestamp'] = pd.to_datetime(latency_df['timestamp'])
+    if history_store:
+        import plotly.graph_objects as go
+        latency_df = history_store.to_frame()[
+            ['timestamp', 'network_type', 'backend', 'latency', 'amortized_latency', 'batch_size', 'prediction']
+        ]
+        # Remote calls are compared by network type, local scoring is reported as "Edge"
+        # and rows answered without a model call as "Cache" / "Gated"
+        latency_df['route'] = (latency_df['network_type'].astype(str)
+                               .mask(latency_df['backend'] == 'local', 'Edge')
+                               .mask(latency_df['backend'] == 'cache', 'Cache')
+                               .mask(latency_df['backend'] == 'gate', 'Gated'))
         
         # 1. Box Plot Comparison
         st.subheader("Latency Distribution by Network Type")
         fig_box = go.Figure()
         
-        for network in ['4G', '5G']:
-            network_data = latency_df[latency_df['network_type'] == network]['latency']
+        for network in ['4G', '5G', 'Edge']:
+            network_data = latency_df[latency_df['route'] == network]['latency']
             if not network_data.empty:
                 fig_box.add_trace(go.Box(
                     y=network_data,
@@ -457,11 +846,11 @@ with latency_tab:
         st.subheader("Latency Over Time")
         fig_time = go.Figure()
         
-        for network in ['4G', '5G']:
-            network_df = latency_df[latency_df['network_type'] == network]
+        for network in ['4G', '5G', 'Edge']:
+            network_df = latency_df[latency_df['route'] == network]
             if not network_df.empty:
                 fig_time.add_trace(go.Scatter(
-                    x=network_df['timestamp'],
+                    x=network_df['timestamp'].dt.tz_localize(None),   # local wall-clock time, as in the history charts
                     y=network_df['latency'],
                     name=network,
                     mode='lines+markers'
@@ -478,25 +867,111 @@ with latency_tab:
         
         # 3. Summary Statistics
         st.subheader("Latency Statistics")
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         
         with col1:
             st.markdown("#### 4G Network")
-            g4_stats = latency_df[latency_df['network_type'] == '4G']['latency'].describe()
+            g4_stats = latency_df[latency_df['route'] == '4G']['latency'].describe(percentiles=LATENCY_PERCENTILES)
             if not g4_stats.empty:
                 st.write(f"Average: {g4_stats['mean']:.2f} ms")
                 st.write(f"Minimum: {g4_stats['min']:.2f} ms")
                 st.write(f"Maximum: {g4_stats['max']:.2f} ms")
                 st.write(f"Std Dev: {g4_stats['std']:.2f} ms")
+                st.write(f"P50 / P95 / P99: {g4_stats['50%']:.2f} / {g4_stats['95%']:.2f} / {g4_stats['99%']:.2f} ms")
+                g4_amortized = latency_df[latency_df['route'] == '4G']['amortized_latency'].mean()
+                st.write(f"Amortized per row: {g4_amortized:.2f} ms")
         
         with col2:
             st.markdown("#### 5G Network")
-            g5_stats = latency_df[latency_df['network_type'] == '5G']['latency'].describe()
+            g5_stats = latency_df[latency_df['route'] == '5G']['latency'].describe(percentiles=LATENCY_PERCENTILES)
             if not g5_stats.empty:
                 st.write(f"Average: {g5_stats['mean']:.2f} ms")
                 st.write(f"Minimum: {g5_stats['min']:.2f} ms")
                 st.write(f"Maximum: {g5_stats['max']:.2f} ms")
                 st.write(f"Std Dev: {g5_stats['std']:.2f} ms")
+                st.write(f"P50 / P95 / P99: {g5_stats['50%']:.2f} / {g5_stats['95%']:.2f} / {g5_stats['99%']:.2f} ms")
+                g5_amortized = latency_df[latency_df['route'] == '5G']['amortized_latency'].mean()
+                st.write(f"Amortized per row: {g5_amortized:.2f} ms")
+        
+        with col3:
+            st.markdown("#### Edge (Local Model)")
+            edge_stats = latency_df[latency_df['route'] == 'Edge']['latency'].describe(percentiles=LATENCY_PERCENTILES)
+            if edge_stats['count'] > 0:
+                st.write(f"Average: {edge_stats['mean']:.3f} ms")
+                st.write(f"Minimum: {edge_stats['min']:.3f} ms")
+                st.write(f"Maximum: {edge_stats['max']:.3f} ms")
+                st.write(f"Std Dev: {edge_stats['std']:.3f} ms")
+                st.write(f"P50 / P95 / P99: {edge_stats['50%']:.3f} / {edge_stats['95%']:.3f} / {edge_stats['99%']:.3f} ms")
+        
+        # Prediction cache effectiveness
+        if not service_mode and st.session_state.get('prediction_cache', True):
+            cache = get_prediction_cache(
+                st.session_state.get('cache_resolution_steps', 1),
+                st.session_state.get('cache_ttl_s', CACHE_TTL_S)
+            )
+            st.markdown("#### Prediction Cache")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Hit rate", f"{cache.hit_rate:.1%}")
+            col2.metric("Hits / misses", f"{cache.stats['hits']} / {cache.stats['misses']}")
+            col3.metric("Latency saved", f"{cache.stats['saved_latency_ms'] / 1000:.2f} s")
+        
+        # Change detection effectiveness
+        if not service_mode and st.session_state.get('change_detection', True):
+            gate_stats = st.session_state.gate.stats
+            st.markdown("#### Change Detection")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Suppression rate", f"{st.session_state.gate.suppression_rate:.1%}")
+            col2.metric("Forwarded / suppressed",
+                        f"{gate_stats['readings'] - gate_stats['suppressed']} / {gate_stats['suppressed']}")
+            col3.caption("Forwarded because of: " + ", ".join(
+                f"{reason.replace('_', ' ')} {gate_stats[reason]}" for reason in FORWARD_REASONS))
+        
+        # Shadow test: the candidate model against the active one on the same readings
+        try:
+            if service_mode:
+                model_status = monitor_client.model() if monitor_client is not None else {}
+            elif registry_entry().get('candidate'):
+                model_status = get_model_registry(MODEL_REGISTRY_PATH).status()
+            else:
+                model_status = {}
+        except Exception as e:
+            st.error(f"Error fetching the shadow test: {str(e)}")
+            model_status = {}
+        shadow = model_status.get('shadow')
+        if shadow:
+            st.markdown("#### Shadow Test")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Agreement", "–" if shadow['agreement'] is None else f"{shadow['agreement']:.1%}")
+            col2.metric("Readings compared", shadow['compared'])
+            col3.metric("Candidate errors / skipped", f"{shadow['candidate_errors']} / {shadow['skipped']}")
+            st.dataframe(
+                [{'model': f"{side}: {describe_model(model_status[side]['spec'])}",
+                  **{key: shadow['latency'][side][key] for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms')}}
+                 for side in ('active', 'candidate')],
+                hide_index=True,
+                use_container_width=True
+            )
+        
+        # Where the time goes: per-stage percentiles from the process-wide histograms
+        try:
+            if service_mode:
+                stage_summary = monitor_client.stages()
+                prometheus_metrics = monitor_client.metrics
+            else:
+                instrumentation = get_instrumentation()
+                stage_summary = instrumentation.summary()
+                prometheus_metrics = instrumentation.to_prometheus
+        except Exception as e:
+            st.error(f"Error fetching stage timings: {str(e)}")
+            stage_summary = []
+        if stage_summary:
+            st.subheader("Pipeline Stage Breakdown")
+            st.dataframe(stage_summary, hide_index=True, use_container_width=True)
+            col1, col2 = st.columns(2)
+            col1.download_button("Prometheus metrics", prometheus_metrics(),
+                                 file_name="pipeline_metrics.prom", mime="text/plain")
+            col2.download_button("JSON metrics", json.dumps(stage_summary, indent=2),
+                                 file_name="pipeline_metrics.json", mime="application/json")
         
         # 4. Latency Improvement Analysis
         if not g4_stats.empty and not g5_stats.empty:
@@ -529,13 +1004,15 @@ with latency_tab:
         
         # 5. Export Latency Data
         st.subheader("Export Latency Data")
-        if st.button("Download Latency Data as CSV"):
-            csv = latency_df.to_csv(index=False)
-            st.download_button(
-                label="Click to Download",
-                data=csv,
-                file_name="latency_comparison.csv",
-                mime="text/csv"
-            )
+        latency_format = st.radio("Format", ['csv', 'parquet'], horizontal=True, key='latency_export_format')
+        if st.button("Export Latency Data"):
+            try:
+                st.session_state.latency_export = export_records(
+                    history_store.iter_records(), 'latency_comparison', latency_format, LATENCY_COLUMNS
+                )
+            except Exception as e:
+                st.error(f"Error exporting latency data: {str(e)}")
+        if st.session_state.get('latency_export'):
+            show_export(*st.session_state.latency_export)
     else:
-        st.info("No latency data available. Make predictions with both 4G and 5G networks to see comparison.") 
\ No newline at end of file
+        st.info("No latency data available. Make predictions with both 4G and 5G networks to see comparison.") 
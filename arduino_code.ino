@@ -6,13 +6,75 @@
   - Current Sensor: Simulated with a potentiometer on A2.
   - CPU Usage Monitor: Simulated with a potentiometer on A3.
   - Fan Speed Sensor: Simulated with a potentiometer on A4.
+
+  Output modes:
+  - BINARY_PROTOCOL 0: human-readable text lines at 9600 baud, once per second.
+  - BINARY_PROTOCOL 1: 25-byte framed packets at 115200 baud, every 10 ms.
+    Select "binary" as the serial protocol in the dashboard to decode them.
 */
 
+#define BINARY_PROTOCOL 0
+
+#if BINARY_PROTOCOL
+const long BAUD_RATE = 115200;
+const unsigned long SAMPLE_INTERVAL_MS = 10;
+#else
+const long BAUD_RATE = 9600;
+const unsigned long SAMPLE_INTERVAL_MS = 1000;  // delay 1 second between reads for clarity
+#endif
+
+// Binary frame layout (little-endian, no padding); must match FRAME_DTYPE in serial_protocol.py
+struct __attribute__((packed)) SensorFrame {
+  uint8_t sync[2];      // 0xA5 0x5A
+  uint16_t seq;         // increments every frame, wraps at 65535
+  float values[5];      // temperature, voltage, current, cpu usage, fan speed
+  uint8_t checksum;     // low byte of the sum of the seq and values bytes
+};
+
+uint16_t sequence = 0;
+
 void setup() {
-  Serial.begin(9600);    // initialize serial communication at 9600 baud
+  Serial.begin(BAUD_RATE);    // initialize serial communication
+}
+
+void sendFrame(float temperature, float voltage, float current, float cpuUsage, float fanSpeed) {
+  SensorFrame frame;
+  frame.sync[0] = 0xA5;
+  frame.sync[1] = 0x5A;
+  frame.seq = sequence++;
+  frame.values[0] = temperature;
+  frame.values[1] = voltage;
+  frame.values[2] = current;
+  frame.values[3] = cpuUsage;
+  frame.values[4] = fanSpeed;
+
+  const uint8_t *bytes = (const uint8_t *)&frame;
+  uint8_t sum = 0;
+  for (size_t i = 2; i < sizeof(frame) - 1; i++) {
+    sum += bytes[i];
+  }
+  frame.checksum = sum;
+
+  Serial.write(bytes, sizeof(frame));
+}
+
+void sendTextLine(float temperature, float voltage, float current, float cpuUsage, float fanSpeed) {
+  // Print out sensor readings to Serial Monitor
+  Serial.print("Temperature (°C): ");
+  Serial.print(temperature);
+  Serial.print(" | Voltage (V): ");
+  Serial.print(voltage);
+  Serial.print(" | Current (A): ");
+  Serial.print(current);
+  Serial.print(" | CPU Usage (%): ");
+  Serial.print(cpuUsage);
+  Serial.print(" | Fan Speed (RPM): ");
+  Serial.println(fanSpeed);
 }
 
 void loop() {
+  unsigned long started = millis();
+
   // Read analog values from sensors
   int tempRaw      = analogRead(A0);  // LM35 temperature sensor
   int voltageRaw   = analogRead(A1);  // simulated voltage sensor
@@ -34,17 +96,15 @@ void loop() {
   float cpuUsage  = cpuUsageRaw * (5.0 / 1023.0) * 20;       // CPU usage in % (scale factor to get 0-100%)
   float fanSpeed  = fanSpeedRaw * (5.0 / 1023.0) * 1000;     // Fan speed in RPM (simulation scale)
 
-  // Print out sensor readings to Serial Monitor
-  Serial.print("Temperature (°C): ");
-  Serial.print(temperature);
-  Serial.print(" | Voltage (V): ");
-  Serial.print(voltage);
-  Serial.print(" | Current (A): ");
-  Serial.print(current);
-  Serial.print(" | CPU Usage (%): ");
-  Serial.print(cpuUsage);
-  Serial.print(" | Fan Speed (RPM): ");
-  Serial.println(fanSpeed);
+#if BINARY_PROTOCOL
+  sendFrame(temperature, voltage, current, cpuUsage, fanSpeed);
+#else
+  sendTextLine(temperature, voltage, current, cpuUsage, fanSpeed);
+#endif
 
-  delay(1000); // delay 1 second between reads for clarity
+  // Keep a steady sample rate regardless of how long the reads took
+  unsigned long elapsed = millis() - started;
+  if (elapsed < SAMPLE_INTERVAL_MS) {
+    delay(SAMPLE_INTERVAL_MS - elapsed);
+  }
 }
@@ -0,0 +1,79 @@
+"""
+Throughput benchmark for InferenceDispatcher against a local stub endpoint.
+
+Runs the same workload with increasing numbers of in-flight requests and
+prints requests/s and rows/s for each, e.g.:
+
+    python benchmark_dispatcher.py --requests 400 --latency-ms 25 --in-flight 1 4 16
+"""
+import argparse
+import json
+import os
+import time
+
+from dispatcher import InferenceDispatcher, make_sagemaker_client
+from inference import RemoteBackend
+from stub_endpoint import StubEndpoint
+
+# Ten-value feature row in the format get_prediction() sends
+SAMPLE_ROW = [45.0, 3.3, 1.2, 35.0, 1800.0, 0, 0, 0, 0, 0]
+
+
+def run(stub, n_requests, rows_per_request, in_flight):
+    """Push `n_requests` batches through a dispatcher and return throughput figures"""
+    client = make_sagemaker_client(endpoint_url=stub.url, max_pool_connections=in_flight)
+    dispatcher = InferenceDispatcher(RemoteBackend(client, 'stub-endpoint'),
+                                     max_in_flight=in_flight, max_queue=in_flight * 4)
+    batch = [SAMPLE_ROW] * rows_per_request
+
+    # Warm the connection pool so connection setup isn't measured
+    for future in [dispatcher.submit(batch) for _ in range(in_flight)]:
+        future.result()
+
+    start = time.perf_counter()
+    futures = [dispatcher.submit(batch) for _ in range(n_requests)]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    dispatcher.close()
+
+    return {
+        'in_flight': in_flight,
+        'requests': n_requests,
+        'rows_per_request': rows_per_request,
+        'seconds': round(elapsed, 4),
+        'requests_per_s': round(n_requests / elapsed, 1),
+        'rows_per_s': round(n_requests * rows_per_request / elapsed, 1),
+        'retries': dispatcher.stats['retries'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=25)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    # The stub ignores credentials, but botocore still wants some to sign with
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+
+    with StubEndpoint(latency_ms=args.latency_ms, throttle_rate=args.throttle_rate) as stub:
+        results = [run(stub, args.requests, args.rows_per_request, n) for n in args.in_flight]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Stub latency: {args.latency_ms} ms, {args.requests} requests x {args.rows_per_request} rows")
+    for r in results:
+        print(f"in-flight {r['in_flight']:>3}: {r['requests_per_s']:>8.1f} req/s  "
+              f"{r['rows_per_s']:>9.1f} rows/s  ({r['seconds']:.2f}s, {r['retries']} retries)")
+
+
+if __name__ == "__main__":
+    main()
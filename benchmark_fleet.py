@@ -0,0 +1,153 @@
+"""
+Load test for FleetIngestor with simulated devices.
+
+Each simulated device streams binary frames from the fleet generator over
+its own socket at `--rate` readings per second; the ingestor multiplexes
+them on one thread and scores them through a shared batching predictor
+against the stub endpoint. Prints sustained readings/s as the device count
+grows, e.g.:
+
+    python benchmark_fleet.py --devices 1 10 50 100 200 --rate 100 --duration 5
+    python benchmark_fleet.py --devices 100 --no-gate --json
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+from dispatcher import InferenceDispatcher, make_sagemaker_client
+from fleet import FleetIngestor, SocketSource
+from generate_synthetic_data import device_profiles, generate_chunk
+from inference import BatchingPredictor, RemoteBackend
+from serial_protocol import FRAME_DTYPE, FRAME_SIZE, FRAME_SYNC, SENSOR_FIELDS
+from stub_endpoint import StubEndpoint
+
+TICK_S = 0.005   # simulator send interval
+
+
+def device_frames(n_devices, n_steps, seed=42):
+    """Per-device byte strings of `n_steps` binary frames of synthetic telemetry"""
+    profile_seed, trace_seed = np.random.SeedSequence(seed).spawn(2)
+    bias, drift = device_profiles(profile_seed, n_devices)
+    columns = generate_chunk(np.random.default_rng(trace_seed), bias, drift, 0, 0, n_steps, 0)
+    values = np.column_stack([columns[name] for name in SENSOR_FIELDS])
+    # Rows are ordered by time, then device
+    values = values.reshape(n_steps, n_devices, len(SENSOR_FIELDS)).swapaxes(0, 1)
+
+    streams = []
+    for device_values in values:
+        frames = np.zeros(n_steps, dtype=FRAME_DTYPE)
+        frames['sync'] = np.frombuffer(FRAME_SYNC, dtype='u1')
+        frames['seq'] = np.arange(n_steps) & 0xFFFF
+        frames['values'] = device_values
+        raw = frames.view('u1').reshape(n_steps, FRAME_SIZE)
+        raw[:, -1] = raw[:, 2:-1].sum(axis=1) & 0xFF
+        streams.append(frames.tobytes())
+    return streams
+
+
+def simulate(sockets, streams, rate, duration, stop_event):
+    """Write each device's frames at `rate` per second from a single thread"""
+    sent = [0] * len(sockets)
+    start = time.monotonic()
+    while not stop_event.is_set():
+        elapsed = time.monotonic() - start
+        if elapsed >= duration:
+            break
+        due = int(elapsed * rate) + 1
+        for i, (sock, stream) in enumerate(zip(sockets, streams)):
+            if due > sent[i]:
+                sock.sendall(stream[sent[i] * FRAME_SIZE:due * FRAME_SIZE])
+                sent[i] = due
+        time.sleep(TICK_S)
+    return sum(sent)
+
+
+def run(stub, n_devices, args):
+    """Stream `n_devices` simulated devices through a FleetIngestor and return throughput figures"""
+    client = make_sagemaker_client(endpoint_url=stub.url, max_pool_connections=args.in_flight)
+    backend = RemoteBackend(client, 'stub-endpoint')
+    dispatcher = InferenceDispatcher(backend, max_in_flight=args.in_flight)
+    predictor = BatchingPredictor(backend, args.batch_size, args.batch_window_ms, dispatcher=dispatcher)
+    ingestor = FleetIngestor(predictor, change_detection=not args.no_gate, max_pending=args.max_pending).start()
+
+    n_steps = int(args.rate * args.duration) + 1
+    pairs = [socket.socketpair() for _ in range(n_devices)]
+    for i, (device_end, ingest_end) in enumerate(pairs):
+        ingestor.add_source(SocketSource(f'device-{i:04d}', ingest_end, protocol='binary'))
+    streams = device_frames(n_devices, n_steps, args.seed)
+
+    stop_event = threading.Event()
+    start = time.perf_counter()
+    sent = simulate([device_end for device_end, _ in pairs], streams, args.rate, args.duration, stop_event)
+    # Let in-flight readings land before reading the counters
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and (ingestor.stats['readings'] < sent
+                                           or ingestor.stats['completed'] < ingestor.stats['submitted']):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    stats = dict(ingestor.stats)
+    ingestor.stop()
+    predictor.close()
+    dispatcher.close()
+    for device_end, _ in pairs:
+        device_end.close()
+
+    return {
+        'devices': n_devices,
+        'offered_per_s': round(sent / elapsed, 1),
+        'readings': stats['readings'],
+        'readings_per_s': round(stats['readings'] / elapsed, 1),
+        'predictions_per_s': round(stats['completed'] / elapsed, 1),
+        'suppressed': stats['suppressed'],
+        'shed': stats['shed'],
+        'errors': stats['errors'],
+        'requests': stub.requests,
+        'seconds': round(elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--devices', type=int, nargs='+', default=[1, 10, 50, 100])
+    parser.add_argument('--rate', type=float, default=100, help="Readings per second per device")
+    parser.add_argument('--duration', type=float, default=5, help="Seconds of streaming per run")
+    parser.add_argument('--latency-ms', type=float, default=12, help="Stub endpoint latency")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-window-ms', type=float, default=5)
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--max-pending', type=int, default=4096)
+    parser.add_argument('--no-gate', action='store_true', help="Score every reading (no change detection)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    # The stub ignores credentials, but botocore still wants some to sign with
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+
+    with StubEndpoint(latency_ms=args.latency_ms) as stub:
+        results = []
+        for n in args.devices:
+            stub.requests = stub.rows = 0
+            results.append(run(stub, n, args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.rate:g} readings/s per device for {args.duration:g}s, stub latency {args.latency_ms} ms, "
+          f"change detection {'off' if args.no_gate else 'on'}")
+    for r in results:
+        print(f"{r['devices']:>5} devices: {r['readings_per_s']:>9.1f} readings/s "
+              f"(offered {r['offered_per_s']:.1f})  {r['predictions_per_s']:>8.1f} predictions/s  "
+              f"{r['requests']:>5} requests  {r['suppressed']} suppressed  {r['shed']} shed")
+
+
+if __name__ == "__main__":
+    main()
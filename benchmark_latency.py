@@ -0,0 +1,190 @@
+"""
+Reproducible 4G vs 5G prediction latency benchmark.
+
+Replays a recorded or synthetic sensor trace through the dashboard's
+prediction path (features, batching predictor, dispatcher, endpoint client)
+against a local stub endpoint that emulates each network's latency, jitter
+and loss, and writes warm-up-excluded percentiles and throughput as JSON:
+
+    python benchmark_latency.py --readings 2000 --networks 4G 5G --output latency.json
+    python benchmark_latency.py --trace exports/sensor_history-20250101-120000.csv --rate 50
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from dispatcher import InferenceDispatcher, make_sagemaker_client
+from inference import BatchingPredictor, RemoteBackend, predict_reading
+from instrumentation import PERCENTILES, Instrumentation, LatencyHistogram
+from serial_protocol import SENSOR_FIELDS
+from stub_endpoint import NETWORK_PROFILES, StubEndpoint
+
+RESULT_VERSION = 1
+
+
+def synthetic_trace(n_readings, seed=42):
+    """One device's readings from the fleet generator, as an N x 5 array"""
+    from generate_synthetic_data import device_profiles, generate_chunk
+
+    root = np.random.SeedSequence(seed)
+    profile_seed, trace_seed = root.spawn(2)
+    bias, drift = device_profiles(profile_seed, 1)
+    columns = generate_chunk(np.random.default_rng(trace_seed), bias, drift, 0, 0, n_readings, 0)
+    return np.column_stack([columns[name] for name in SENSOR_FIELDS]).astype(np.float64)
+
+
+def load_trace(path):
+    """Readings from a CSV with the SENSOR_FIELDS columns (history export, test_data.csv, ...)"""
+    import pandas as pd
+
+    return pd.read_csv(path, usecols=list(SENSOR_FIELDS))[list(SENSOR_FIELDS)].to_numpy(np.float64)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_network(network, trace, args, pipeline=None, cache=None):
+    """Replay `trace` against a stub emulating `network`; returns the result dict for it"""
+    stub = StubEndpoint.for_network(network, seed=args.seed).start()
+    client = make_sagemaker_client(endpoint_url=stub.url, max_pool_connections=args.in_flight)
+    backend = RemoteBackend(client, 'benchmark-endpoint')
+    dispatcher = InferenceDispatcher(backend, max_in_flight=args.in_flight)
+    instrumentation = Instrumentation()
+    predictor = BatchingPredictor(backend, args.batch_size, args.batch_window_ms, dispatcher=dispatcher,
+                                  instrumentation=instrumentation)
+    end_to_end = LatencyHistogram()
+    lock = threading.Lock()
+    counter = itertools.count()
+    errors = [0]
+    interval_ns = int(1e9 / args.rate) if args.rate else 0
+    measured_start = [None]
+    start_ns = time.perf_counter_ns()
+
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= len(trace):
+                return
+            warm = i >= args.warmup
+            if warm and measured_start[0] is None:
+                with lock:
+                    if measured_start[0] is None:
+                        measured_start[0] = time.perf_counter_ns()
+            # At a fixed rate, latency counts from the scheduled send time, so a slow
+            # response that delays later readings is charged to them (no coordinated omission)
+            scheduled = start_ns + i * interval_ns
+            if interval_ns:
+                delay = scheduled - time.perf_counter_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+            began = scheduled if interval_ns else time.perf_counter_ns()
+            try:
+                # Warm-up rows carry no route, so their batches' stage timings aren't recorded
+                predict_reading(trace[i].tolist(),
+                                lambda features: predictor.predict(features, route=network if warm else None),
+                                pipeline, cache, ('benchmark', network), instrumentation if warm else None, network)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            if warm:
+                with lock:
+                    end_to_end.record(time.perf_counter_ns() - began)
+
+    threads = [threading.Thread(target=worker, name=f'replay-{n}') for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = (time.perf_counter_ns() - (measured_start[0] or start_ns)) / 1e9
+
+    predictor.close()
+    dispatcher.close()
+    stub.stop()
+
+    return {
+        'profile': {**NETWORK_PROFILES[network]},
+        'readings': len(trace),
+        'measured': end_to_end.count,
+        'errors': errors[0],
+        'seconds': round(elapsed, 4),
+        'throughput_rps': round(end_to_end.count / elapsed, 2) if elapsed else None,
+        'latency_ms': end_to_end.summary(PERCENTILES),
+        'stages': {row['stage']: {k: v for k, v in row.items() if k not in ('stage', 'network')}
+                   for row in instrumentation.summary()},
+        'endpoint': {'requests': stub.requests, 'rows': stub.rows, 'lost': stub.lost,
+                     'retries': dispatcher.stats['retries']},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trace', help="CSV of recorded readings (default: a synthetic trace)")
+    parser.add_argument('--readings', type=int, default=1000, help="Synthetic trace length")
+    parser.add_argument('--networks', nargs='+', default=list(NETWORK_PROFILES), choices=list(NETWORK_PROFILES))
+    parser.add_argument('--warmup', type=int, default=50, help="Leading readings excluded from the results")
+    parser.add_argument('--concurrency', type=int, default=1, help="Readings replayed in parallel (with --rate, enough to keep up)")
+    parser.add_argument('--rate', type=float, default=0, help="Readings per second (default: back-to-back)")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--batch-window-ms', type=float, default=0)
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--pipeline', help="feature_pipeline.json (default: the legacy ten features)")
+    parser.add_argument('--cache', action='store_true', help="Put the prediction cache in front of the endpoint")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    # The stub ignores credentials, but botocore still wants some to sign with
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.readings, args.seed)
+    pipeline = None
+    if args.pipeline:
+        from features import FeaturePipeline
+        pipeline = FeaturePipeline.load(args.pipeline)
+
+    results = {}
+    for network in args.networks:
+        cache = None
+        if args.cache:
+            from prediction_cache import PredictionCache
+            cache = PredictionCache()
+        results[network] = run_network(network, trace, args, pipeline, cache)
+
+    report = {
+        'benchmark': 'prediction_latency',
+        'version': RESULT_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'git_commit': git_commit()},
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        for network, r in results.items():
+            latency = r['latency_ms']
+            print(f"{network}: p50 {latency['p50_ms']:.2f} ms  p99 {latency['p99_ms']:.2f} ms  "
+                  f"p99.9 {latency['p99_9_ms']:.2f} ms  {r['throughput_rps']} readings/s")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
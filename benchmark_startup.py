@@ -0,0 +1,125 @@
+"""
+Startup benchmark for the dashboard.
+
+Measures, in fresh interpreters, the cold import time of the heavy
+dependencies and the duration of app.py's first script run (first paint)
+and of a rerun, with an empty telemetry directory. Also reports which heavy
+modules the first run imported beyond those streamlit itself loads; any of
+them, or a first run over --max-first-run-s, fails the benchmark (exit
+status 1), e.g.:
+
+    python benchmark_startup.py --runs 5
+    python benchmark_startup.py --max-first-run-s 3 --json > startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, 'app.py')
+
+# Modules the dashboard must not import until a feature needs them
+HEAVY_MODULES = ('boto3', 'botocore', 'plotly', 'serial', 'xgboost', 'sklearn', 'pyarrow', 'paho')
+# Cold import cost of each, for context
+IMPORT_MODULES = ('streamlit', 'numpy', 'pandas', 'boto3', 'plotly.graph_objects', 'serial')
+
+FIRST_PAINT = '''
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+preloaded = set(sys.modules)   # whatever streamlit itself pulls in is out of the app's hands
+ready = time.perf_counter()
+at.run()
+first = time.perf_counter()
+heavy = sorted(m for m in {heavy!r} if m in sys.modules and m not in preloaded)
+at.run()
+rerun = time.perf_counter()
+print(json.dumps({{
+    'streamlit_import_s': ready - start,
+    'first_run_s': first - ready,
+    'rerun_s': rerun - first,
+    'heavy_modules': heavy,
+    'exceptions': [str(e.value) for e in at.exception],
+}}))
+'''
+
+
+def python(code, cwd=None, env=None):
+    """Run `code` in a fresh interpreter and return (stdout, wall-clock seconds)"""
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if done.returncode:
+        raise RuntimeError(done.stderr.strip().splitlines()[-1] if done.stderr.strip() else "child failed")
+    return done.stdout, elapsed
+
+
+def import_time(module, runs):
+    """Median cold import time of `module` in seconds, or None if it isn't installed"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    try:
+        return statistics.median(float(python(code)[0]) for _ in range(runs))
+    except RuntimeError:
+        return None
+
+
+def first_paint(runs):
+    """Median first-run/rerun figures of app.py, each run in a fresh process and empty directory"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith('AWS_')}
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [APP_DIR, env.get('PYTHONPATH')]))
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            out, wall = python(FIRST_PAINT.format(app=APP_PATH, heavy=HEAVY_MODULES), cwd=workdir, env=env)
+        sample = json.loads(out.strip().splitlines()[-1])
+        sample['process_s'] = wall
+        samples.append(sample)
+    result = {key: statistics.median(s[key] for s in samples)
+              for key in ('streamlit_import_s', 'first_run_s', 'rerun_s', 'process_s')}
+    result['heavy_modules'] = sorted({m for s in samples for m in s['heavy_modules']})
+    result['exceptions'] = sorted({e for s in samples for e in s['exceptions']})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes per measurement (median reported)")
+    parser.add_argument('--max-first-run-s', type=float, help="Fail if the first script run is slower than this")
+    parser.add_argument('--skip-imports', action='store_true', help="Only measure the app")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    imports = {} if args.skip_imports else {module: import_time(module, args.runs) for module in IMPORT_MODULES}
+    paint = first_paint(args.runs)
+
+    failures = []
+    if paint['exceptions']:
+        failures.append(f"app raised: {'; '.join(paint['exceptions'])}")
+    if paint['heavy_modules']:
+        failures.append(f"first run imported {', '.join(paint['heavy_modules'])}")
+    if args.max_first_run_s is not None and paint['first_run_s'] > args.max_first_run_s:
+        failures.append(f"first run took {paint['first_run_s']:.2f}s (budget {args.max_first_run_s:.2f}s)")
+
+    if args.json:
+        print(json.dumps({'imports_s': imports, 'app': paint, 'failures': failures}, indent=2))
+    else:
+        for module, seconds in imports.items():
+            print(f"import {module:<22} {'not installed' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+        print(f"streamlit test harness   {paint['streamlit_import_s'] * 1000:8.1f} ms")
+        print(f"first run (first paint)  {paint['first_run_s'] * 1000:8.1f} ms")
+        print(f"rerun                    {paint['rerun_s'] * 1000:8.1f} ms")
+        print(f"whole process            {paint['process_s'] * 1000:8.1f} ms")
+        print(f"heavy modules loaded     {', '.join(paint['heavy_modules']) or 'none'}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
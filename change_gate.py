@@ -0,0 +1,106 @@
+import math
+import time
+from collections import deque
+
+from prediction_cache import SENSOR_RESOLUTION
+from sensor_states import classify_readings
+from serial_protocol import SENSOR_FIELDS
+
+# Reasons a reading is forwarded to the model
+FORWARD_REASONS = ('initial', 'state_change', 'deviation', 'heartbeat')
+
+
+class ChangeGate:
+    """
+    Decides whether a reading needs a fresh prediction.
+
+    Keeps an exponentially weighted mean and variance per sensor (O(1)
+    memory). A reading is forwarded when it is the first one, when any
+    sensor's Normal/Warning/Critical state differs from the last forwarded
+    reading, when any sensor is more than `threshold` standard deviations
+    (and at least `min_delta`, by default one ADC step) from its running
+    mean, or when `heartbeat_s` seconds have passed since the last forward.
+    Otherwise the caller reuses the last prediction.
+
+    Every forward must be resolved, in the order they were made, with
+    `remember` (its prediction) or `forward_failed`. A reading's states only
+    count as seen once its prediction is remembered, so until then readings
+    in a new state keep being forwarded, and a failed forward leaves the
+    gate armed rather than suppressing behind a stale prediction.
+    """
+
+    def __init__(self, alpha=0.1, threshold=3.0, heartbeat_s=30.0, min_delta=None, clock=time.monotonic):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.heartbeat_s = heartbeat_s
+        min_delta = {**SENSOR_RESOLUTION, **(min_delta or {})}
+        self._min_delta = [min_delta[name] for name in SENSOR_FIELDS]
+        self._clock = clock
+        self._mean = None
+        self._var = [0.0] * len(SENSOR_FIELDS)
+        self._states = None          # states of the reading behind last_prediction
+        self._last_forward = None
+        self._forwarded = deque()    # (states, time) of forwards not yet resolved
+        self.last_prediction = None
+        self.stats = {'readings': 0, 'suppressed': 0, **{reason: 0 for reason in FORWARD_REASONS}}
+
+    def _update(self, values):
+        """Fold a reading into the running mean and variance"""
+        for i, x in enumerate(values):
+            diff = x - self._mean[i]
+            increment = self.alpha * diff
+            self._mean[i] += increment
+            self._var[i] = (1 - self.alpha) * (self._var[i] + diff * increment)
+
+    def check(self, values, states=None):
+        """
+        Test one reading (five values in SENSOR_FIELDS order). Callers that
+        already classified the reading can pass its `states`.
+
+        Returns:
+        str or None: the reason to forward it to the model, or None to reuse
+            the last prediction
+        """
+        values = [float(v) for v in values]
+        now = self._clock()
+        self.stats['readings'] += 1
+
+        states = classify_readings(values).tolist() if states is None else list(states)
+        if self._mean is None or self.last_prediction is None:
+            reason = 'initial'
+        elif states != self._states:
+            reason = 'state_change'
+        elif any(abs(x - m) > max(self.threshold * math.sqrt(v), d)
+                 for x, m, v, d in zip(values, self._mean, self._var, self._min_delta)):
+            reason = 'deviation'
+        elif now - (self._forwarded[-1][1] if self._forwarded else self._last_forward) >= self.heartbeat_s:
+            reason = 'heartbeat'
+        else:
+            reason = None
+
+        if self._mean is None:
+            self._mean = list(values)
+        else:
+            self._update(values)
+
+        if reason is None:
+            self.stats['suppressed'] += 1
+        else:
+            self.stats[reason] += 1
+            self._forwarded.append((states, now))
+        return reason
+
+    def remember(self, prediction):
+        """Record the prediction made for the oldest unresolved forwarded reading"""
+        self.last_prediction = prediction
+        if self._forwarded:
+            self._states, self._last_forward = self._forwarded.popleft()
+
+    def forward_failed(self):
+        """The oldest unresolved forward got no prediction (error or shed); forget it"""
+        if self._forwarded:
+            self._forwarded.popleft()
+
+    @property
+    def suppression_rate(self):
+        return self.stats['suppressed'] / self.stats['readings'] if self.stats['readings'] else 0.0
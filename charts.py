@@ -0,0 +1,181 @@
+from functools import lru_cache
+
+import numpy as np
+
+from history_store import local_offsets_ns
+from inference import CLASS_NAMES
+from sensor_states import SENSOR_INDEX, STATE_THRESHOLDS
+
+# Maximum points sent to the browser per trace
+POINT_BUDGET = 1000
+
+STATE_COLORS = {'Normal': 'green', 'Warning': 'orange', 'Critical': 'red'}
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of `n_out` points (always including the first and
+    last) that best preserve the visual shape of the series y(x).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        # Twice the triangle area between the last pick, each candidate and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+@lru_cache(maxsize=None)
+def threshold_shapes(sensor, row):
+    """Dashed warning/critical lines for one sensor's subplot, built once"""
+    normal_lo, normal_hi, warning_lo, warning_hi = STATE_THRESHOLDS[SENSOR_INDEX[sensor]]
+    if warning_lo >= normal_hi:
+        levels = ((normal_hi, 'orange'), (warning_hi, 'red'))   # warning band above normal
+    else:
+        levels = ((normal_lo, 'orange'), (warning_lo, 'red'))   # warning band below normal
+    axis = '' if row == 1 else str(row)
+    return tuple(
+        dict(type='line', xref=f'x{axis} domain', x0=0, x1=1, yref=f'y{axis}', y0=float(level), y1=float(level),
+             line=dict(dash='dash', color=color))
+        for level, color in levels
+    )
+
+
+def build_probability_figure():
+    """Empty state probability chart; traces are filled by IncrementalChart"""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for state in CLASS_NAMES:
+        fig.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name=state,
+            fill='tonexty',
+            line=dict(width=2, color=STATE_COLORS[state])
+        ))
+    fig.update_layout(
+        title="State Probabilities Over Time",
+        xaxis_title="Time",
+        yaxis_title="Probability",
+        height=400,
+        yaxis=dict(range=[0, 1]),
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
+    )
+    return fig
+
+
+def build_sensor_figure(sensors):
+    """Empty sensor subplots with their threshold lines; traces are filled by IncrementalChart"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=len(sensors),
+        cols=1,
+        subplot_titles=[s.replace('_', ' ').title() for s in sensors],
+        vertical_spacing=0.05
+    )
+    shapes = []
+    for i, sensor in enumerate(sensors, 1):
+        fig.add_trace(
+            go.Scatter(x=[], y=[], name=sensor.replace('_', ' ').title(), line=dict(width=2), fill='tozeroy'),
+            row=i,
+            col=1
+        )
+        shapes.extend(threshold_shapes(sensor, i))
+    fig.update_layout(
+        shapes=shapes,
+        height=250 * len(sensors),
+        showlegend=False,
+        hovermode='x unified'
+    )
+    return fig
+
+
+class IncrementalChart:
+    """
+    A Plotly figure whose traces are extended with newly appended rows.
+
+    `update(timestamps, columns)` is called with the full (time-ordered)
+    range on every rerun; only rows beyond those already seen are processed.
+    Each trace keeps at most `budget` points, re-downsampled with LTTB when
+    new points push it over, so the figure payload stays bounded however
+    long the history gets. A range that no longer extends the previous one
+    (different start, fewer rows) triggers a rebuild.
+    """
+
+    def __init__(self, figure, budget=POINT_BUDGET):
+        self.figure = figure
+        self.budget = budget
+        self.rows = 0
+        self._first = None
+        self._x = [np.empty(0, dtype=np.int64) for _ in figure.data]
+        self._y = [np.empty(0, dtype=np.float64) for _ in figure.data]
+
+    def update(self, timestamps, columns):
+        """Extend the traces with rows past the last update; `timestamps` are UNIX ns"""
+        if len(timestamps) < self.rows or (len(timestamps) and timestamps[0] != self._first):
+            self.rows = 0
+            self._x = [np.empty(0, dtype=np.int64) for _ in self._x]
+            self._y = [np.empty(0, dtype=np.float64) for _ in self._y]
+        if len(timestamps) == self.rows:
+            return self.figure
+
+        new_x = np.asarray(timestamps[self.rows:], dtype=np.int64)
+        for i, column in enumerate(columns):
+            x = np.concatenate((self._x[i], new_x))
+            y = np.concatenate((self._y[i], np.asarray(column[self.rows:], dtype=np.float64)))
+            if self.budget and len(x) > self.budget:
+                keep = lttb_indices(x, y, self.budget)
+                x, y = x[keep], y[keep]
+            self._x[i], self._y[i] = x, y
+            self.figure.data[i].update(x=(x + local_offsets_ns(x)).view('M8[ns]'), y=y)
+
+        self.rows = len(timestamps)
+        self._first = timestamps[0]
+        return self.figure
+
+
+def fill_window_figure(figure, timestamps, columns, bands=None):
+    """
+    Set the traces of a figure from build_probability_figure/build_sensor_figure
+    to aggregated window values (one point per window). `bands`, if given,
+    holds a (low, high) pair per trace, drawn as a shaded min/max envelope.
+    """
+    import plotly.graph_objects as go
+
+    x = np.asarray(timestamps, dtype=np.int64)
+    x = (x + local_offsets_ns(x)).view('M8[ns]')
+    traces = list(figure.data)
+    for trace, column in zip(traces, columns):
+        trace.update(x=x, y=column)
+    for i, (low, high) in enumerate(bands or ()):
+        trace = traces[i]
+        trace.update(fill=None)
+        axes = dict(xaxis=trace.xaxis, yaxis=trace.yaxis)
+        figure.add_trace(go.Scatter(x=x, y=high, mode='lines', line=dict(width=0), hoverinfo='skip',
+                                    showlegend=False, **axes))
+        figure.add_trace(go.Scatter(x=x, y=low, mode='lines', line=dict(width=0), fill='tonexty',
+                                    fillcolor='rgba(99, 110, 250, 0.2)', name='min/max', showlegend=False, **axes))
+    return figure
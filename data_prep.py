@@ -0,0 +1,455 @@
+"""
+Prepare training data for SageMaker XGBoost and upload it to S3.
+
+The notebook's preprocessing step as a script, sized for fleet data. Raw
+CSV or Parquet shards (files, or directories such as the train/ and test/
+folders written by generate_synthetic_data.py) are read in chunks and never
+held in memory whole. A first pass fits the feature pipeline from streaming
+sums, one worker process per shard; a second pass engineers, scales and
+splits each chunk in one go and writes header-less, label-first CSV parts
+(one per shard and split) as the XGBoost container expects. Parts go up
+concurrently through one shared transfer manager, multipart when large.
+A manifest of content hashes, kept locally and next to the data in S3,
+lets a rerun skip shards whose input has not changed and parts whose bytes
+are already uploaded, e.g.:
+
+    python data_prep.py --train data/fleet/train --test data/fleet/test --bucket predictive-maintanence
+    python data_prep.py --train train_data.csv --test test_data.csv --output prepared
+    python data_prep.py --train data/fleet/train --bucket test --endpoint-url http://127.0.0.1:9000
+
+The last form targets a local S3 stand-in (stub_s3.py, MinIO, ...).
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import FEATURE_NAMES, PIPELINE_FILE, FeaturePipeline, FeatureStats
+from serial_protocol import SENSOR_FIELDS
+
+SPLITS = ('train', 'validation', 'test')
+LABEL = 'cpu_state'
+SHARD_FORMATS = ('.csv', '.parquet')
+MANIFEST_FILE = 'manifest.json'
+CHUNK_ROWS = 262_144              # rows read, featurized and written per chunk
+HASH_READ_BYTES = 1 << 20
+VALIDATION_FRACTION = 0.2         # the notebook's train_test_split(test_size=0.2)
+
+MULTIPART_CHUNK = 16 << 20        # S3 requires at least 5 MB per piece
+MULTIPART_THRESHOLD = 4 * MULTIPART_CHUNK   # parts above this are uploaded in MULTIPART_CHUNK pieces
+UPLOAD_CONCURRENCY = 16           # requests in flight across all uploads
+
+
+def find_shards(paths):
+    """CSV/Parquet files in `paths` (files, or directories searched non-recursively), in sorted order"""
+    shards = []
+    for path in [paths] if isinstance(paths, str) else paths:
+        if os.path.isdir(path):
+            shards.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                 if name.lower().endswith(SHARD_FORMATS)))
+        elif os.path.exists(path):
+            shards.append(path)
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return [os.path.normpath(shard) for shard in shards]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_READ_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_shard(path, chunk_rows=CHUNK_ROWS, stats=None):
+    """
+    Yield (readings, labels) chunks from one CSV or Parquet shard.
+
+    readings: N x 5 float64 in SENSOR_FIELDS order; labels: N int8 cpu_state
+    codes. Rows with a missing or non-numeric value are dropped and counted
+    in `stats['dropped']`.
+    """
+    import pandas as pd
+
+    columns = list(SENSOR_FIELDS) + [LABEL]
+    if path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        shard = pq.ParquetFile(path)
+        missing = [name for name in columns if name not in shard.schema_arrow.names]
+        frames = (batch.to_pandas() for batch in shard.iter_batches(batch_size=chunk_rows, columns=columns))
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        missing = [name for name in columns if name not in header]
+        frames = pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column(s)")
+
+    for frame in frames:
+        frame = frame[columns]   # usecols keeps the file's column order
+        if not all(dtype.kind in 'fi' for dtype in frame.dtypes):
+            frame = frame.apply(pd.to_numeric, errors='coerce')
+        values = frame.to_numpy(np.float64)
+        valid = ~np.isnan(values).any(axis=1)
+        if stats is not None:
+            stats['dropped'] = stats.get('dropped', 0) + int(len(valid) - valid.sum())
+        if not valid.all():
+            values = values[valid]
+        if len(values):
+            yield values[:, :len(SENSOR_FIELDS)], values[:, -1].astype(np.int8)
+
+
+def _scan_shard(task):
+    """Hash one shard and, when its statistics are needed and not cached, compute them"""
+    sha256 = file_sha256(task['path'])
+    cached = task['previous'] or {}
+    result = {'sha256': sha256, 'stats': None}
+    if task['fit']:
+        if cached.get('sha256') == sha256 and cached.get('stats'):
+            result['stats'] = cached['stats']
+        else:
+            stats = FeatureStats()
+            for readings, labels in read_shard(task['path'], task['chunk_rows']):
+                stats.add(readings, labels)
+            result['stats'] = stats.to_dict()
+    return result
+
+
+def _write_parts(task):
+    """
+    Featurize, scale and split one shard chunk by chunk, writing one CSV
+    part per split. Returns {relative part path: {'sha256', 'rows'}}.
+
+    Parts are formatted by Arrow's CSV writer, an order of magnitude faster
+    than DataFrame.to_csv, and hashed as they are written.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    pipeline = FeaturePipeline.from_dict(task['pipeline'])
+    # Seeded per shard name, so a shard's split doesn't depend on the others
+    rng = np.random.default_rng([task['seed'], zlib.crc32(task['name'].encode())])
+    splits = ('train', 'validation') if task['role'] == 'train' else ('test',)
+    files, digests, rows = {}, {}, {}
+    stats = {}
+
+    try:
+        for readings, labels in read_shard(task['path'], task['chunk_rows'], stats):
+            # Column-major, so every column is contiguous for the split and for Arrow
+            features = pipeline.transform(readings, np.empty((len(readings), len(FEATURE_NAMES)), np.float32, 'F'))
+            columns = [labels] + list(features.T)
+            if task['role'] == 'train':
+                is_validation = rng.random(len(labels)) < task['validation_fraction']
+                masks = {'train': ~is_validation, 'validation': is_validation}
+            else:
+                masks = {'test': None}
+            for split, mask in masks.items():
+                part = columns if mask is None else [column[mask] for column in columns]
+                if not len(part[0]):
+                    continue
+                table = pa.Table.from_arrays([pa.array(column) for column in part], names=(LABEL,) + FEATURE_NAMES)
+                buffer = pa.BufferOutputStream()
+                pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False))
+                data = buffer.getvalue()
+                if split not in files:
+                    relpath = f"{split}/{task['name']}.csv"
+                    files[split] = open(os.path.join(task['output_dir'], relpath), 'wb')
+                    digests[split], rows[split] = hashlib.sha256(), 0
+                files[split].write(data)
+                digests[split].update(data)
+                rows[split] += len(part[0])
+    finally:
+        for f in files.values():
+            f.close()
+
+    parts = {f"{split}/{task['name']}.csv": {'sha256': digests[split].hexdigest(), 'rows': rows[split]}
+             for split in splits if split in files}
+    return {'parts': parts, 'dropped': stats.get('dropped', 0)}
+
+
+def pipeline_fingerprint(pipeline):
+    return hashlib.sha256(json.dumps(pipeline.to_dict(), sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def make_s3_client(region_name=None, endpoint_url=None, max_pool_connections=UPLOAD_CONCURRENCY):
+    """
+    S3 client with a connection pool sized for UPLOAD_CONCURRENCY. With an
+    `endpoint_url` (a local stand-in) buckets are addressed by path.
+    """
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        s3={'addressing_style': 'path'} if endpoint_url else None,
+    )
+    return boto3.client('s3', region_name=region_name, endpoint_url=endpoint_url, config=config)
+
+
+def _remote_manifest(client, bucket, key):
+    try:
+        return json.load(client.get_object(Bucket=bucket, Key=key)['Body'])
+    except client.exceptions.NoSuchKey:
+        return {}
+
+
+def _channel_objects(client, bucket, prefix):
+    """Part names (split/file) of every object under the channel prefixes"""
+    root = f'{prefix}/' if prefix else ''
+    parts = set()
+    paginator = client.get_paginator('list_objects_v2')
+    for split in SPLITS:
+        for page in paginator.paginate(Bucket=bucket, Prefix=f'{root}{split}/'):
+            parts.update(obj['Key'][len(root):] for obj in page.get('Contents', ()))
+    return parts
+
+
+def _map(function, tasks, workers):
+    """function over tasks, in order, in worker processes (in-process for a single worker)"""
+    if workers == 1 or len(tasks) <= 1:
+        return map(function, tasks)
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+
+    def results():
+        with pool:
+            yield from pool.map(function, tasks)
+    return results()
+
+
+def prepare(train, test=(), output_dir='prepared', pipeline=None, bucket=None, prefix='', client=None,
+            validation_fraction=VALIDATION_FRACTION, seed=42, chunk_rows=CHUNK_ROWS, workers=None,
+            multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_CHUNK,
+            max_concurrency=UPLOAD_CONCURRENCY):
+    """
+    Build the train/validation/test channels from raw shards and upload them.
+
+    Training shards are split into train and validation parts row by row
+    (seeded per shard, so the split is reproducible); test shards become
+    test parts. When `pipeline` is None it is fitted on the training shards,
+    reusing the statistics cached in the manifest for shards that have not
+    changed. A shard is only rewritten when its content, the pipeline or the
+    split settings changed, and a part is only uploaded when its hash
+    differs from the one recorded in the bucket's manifest. Parts left over
+    from shards no longer in the input are removed locally. The channel
+    prefixes (`prefix`/train/ etc.) belong to this function: any object
+    under them that the new manifest does not list, including files
+    uploaded by other means, is deleted, since SageMaker trains on
+    everything under a channel.
+
+    Parameters:
+    train, test (str or list): shard files or directories of shards
+    output_dir (str): local directory for the parts and MANIFEST_FILE
+    pipeline (FeaturePipeline): scaler to apply; fitted when None
+    bucket, prefix (str): upload destination; nothing is uploaded without a bucket
+    client: boto3 S3 client (default: make_s3_client())
+    workers (int): processes for reading and writing shards (default: CPU count)
+
+    Returns:
+    dict: the pipeline, the fitted FeatureStats (None for a given pipeline),
+        rows per split, shards written/skipped, parts uploaded/skipped,
+        bytes uploaded, elapsed seconds and the channel locations
+    """
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count()
+    sources = [(path, 'train') for path in find_shards(train)] + [(path, 'test') for path in find_shards(test)]
+    names = {}
+    for path, role in sources:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if names.setdefault((role, name), path) != path:
+            raise ValueError(f"{names[role, name]} and {path} would both write {role} parts named {name}")
+    for split in SPLITS:
+        os.makedirs(os.path.join(output_dir, split), exist_ok=True)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    previous = load_manifest(manifest_path)
+    previous_shards = previous.get('shards', {})
+
+    # Pass 1: hash every shard and gather the statistics of changed training shards
+    fit = pipeline is None
+    scans = list(_map(_scan_shard, [
+        {'path': path, 'fit': fit and role == 'train', 'previous': previous_shards.get(path),
+         'chunk_rows': chunk_rows} for path, role in sources], workers))
+    stats = None
+    if fit:
+        stats = FeatureStats()
+        for scan in scans:
+            if scan['stats'] is not None:
+                stats.merge(FeatureStats.from_dict(scan['stats']))
+        if not stats.count:
+            raise ValueError("No training rows to fit the feature pipeline on")
+        pipeline = stats.pipeline()
+
+    settings = {'pipeline': pipeline_fingerprint(pipeline), 'validation_fraction': validation_fraction,
+                'seed': seed}
+    reuse = previous.get('settings') == settings
+
+    # Pass 2: rewrite the shards whose input or settings changed
+    shards, tasks = {}, []
+    for (path, role), scan in zip(sources, scans):
+        cached = previous_shards.get(path)
+        entry = {'role': role, 'sha256': scan['sha256'], 'stats': scan['stats']}
+        if entry['stats'] is None and cached and cached.get('sha256') == scan['sha256']:
+            entry['stats'] = cached.get('stats')   # kept for the next refit
+        if (reuse and cached and cached.get('sha256') == scan['sha256'] and cached.get('role') == role
+                and all(os.path.exists(os.path.join(output_dir, part)) for part in cached['parts'])):
+            entry['parts'] = cached['parts']
+        else:
+            tasks.append({'path': path, 'role': role, 'name': os.path.splitext(os.path.basename(path))[0],
+                          'output_dir': output_dir, 'pipeline': pipeline.to_dict(), 'seed': seed,
+                          'validation_fraction': validation_fraction, 'chunk_rows': chunk_rows})
+        shards[path] = entry
+
+    summary = {'shards_written': len(tasks), 'shards_skipped': len(sources) - len(tasks), 'dropped': 0,
+               'parts_uploaded': 0, 'parts_skipped': 0, 'parts_deleted': 0, 'bytes_uploaded': 0}
+    manager = None
+    uploads, uploaded = [], {}
+    if bucket:
+        from boto3.s3.transfer import TransferConfig, create_transfer_manager
+
+        client = client or make_s3_client(max_pool_connections=max_concurrency)
+        remote_key = f'{prefix}/{MANIFEST_FILE}' if prefix else MANIFEST_FILE
+        remote = _remote_manifest(client, bucket, remote_key)
+        uploaded = {part: meta['sha256'] for entry in remote.get('shards', {}).values()
+                    for part, meta in entry.get('parts', {}).items()}
+        # One manager for every part: a shared thread pool and connection pool, multipart above the threshold
+        manager = create_transfer_manager(client, TransferConfig(
+            multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency))
+
+    def upload(parts):
+        for part, meta in parts.items():
+            if uploaded.get(part) == meta['sha256']:
+                summary['parts_skipped'] += 1
+                continue
+            path = os.path.join(output_dir, part)
+            key = f'{prefix}/{part}' if prefix else part
+            uploads.append(manager.upload(path, bucket, key, extra_args={'Metadata': {'sha256': meta['sha256']}}))
+            summary['parts_uploaded'] += 1
+            summary['bytes_uploaded'] += os.path.getsize(path)
+
+    try:
+        # Unchanged shards' parts go first; the others as soon as they are written, overlapping the remaining work
+        if manager is not None:
+            for entry in shards.values():
+                if 'parts' in entry:
+                    upload(entry['parts'])
+        for task, result in zip(tasks, _map(_write_parts, tasks, workers)):
+            shards[task['path']]['parts'] = result['parts']
+            summary['dropped'] += result['dropped']
+            if manager is not None:
+                upload(result['parts'])
+        for future in uploads:
+            future.result()
+    finally:
+        if manager is not None:
+            manager.shutdown()
+
+    new_manifest = {'settings': settings, 'shards': shards}
+    current_parts = {part for entry in shards.values() for part in entry['parts']}
+    stale = {part for entry in previous_shards.values() for part in entry.get('parts', {})} - current_parts
+    for part in stale:
+        path = os.path.join(output_dir, part)
+        if os.path.exists(path):
+            os.remove(path)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(new_manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    if bucket:
+        # The manifest goes up last, so an interrupted run never records parts that didn't arrive
+        client.put_object(Bucket=bucket, Key=remote_key, Body=json.dumps(new_manifest).encode())
+        remote_stale = sorted(_channel_objects(client, bucket, prefix) - current_parts)
+        for start in range(0, len(remote_stale), 1000):
+            keys = [{'Key': f'{prefix}/{part}' if prefix else part} for part in remote_stale[start:start + 1000]]
+            client.delete_objects(Bucket=bucket, Delete={'Objects': keys, 'Quiet': True})
+        summary['parts_deleted'] = len(remote_stale)
+
+    rows = dict.fromkeys(SPLITS, 0)
+    for entry in shards.values():
+        for part, meta in entry['parts'].items():
+            rows[part.split('/', 1)[0]] += meta['rows']
+    root = f's3://{bucket}/{prefix}/' if prefix else f's3://{bucket}/'
+    summary.update({
+        'pipeline': pipeline,
+        'stats': stats,
+        'rows': rows,
+        'seconds': time.perf_counter() - start_time,
+        'channels': {split: (f'{root}{split}/' if bucket else os.path.join(output_dir, split))
+                     for split in SPLITS if rows[split]},
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--train', nargs='+', default=['train_data.csv'],
+                        help="Training shards: CSV/Parquet files or directories of them")
+    parser.add_argument('--test', nargs='*', default=['test_data.csv'], help="Test shards")
+    parser.add_argument('--output', default='prepared', help="Local directory for the prepared parts")
+    parser.add_argument('--pipeline', default=PIPELINE_FILE,
+                        help="Feature pipeline to apply; fitted on the training shards and saved here if missing")
+    parser.add_argument('--refit', action='store_true', help="Refit and overwrite --pipeline even if it exists")
+    parser.add_argument('--validation-fraction', type=float, default=VALIDATION_FRACTION)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--bucket', help="Upload the parts to this S3 bucket")
+    parser.add_argument('--prefix', default='cpu-state-xgboost-improved')
+    parser.add_argument('--endpoint-url', help="Override the S3 URL (e.g. a local S3 stand-in)")
+    parser.add_argument('--region')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--concurrency', type=int, default=UPLOAD_CONCURRENCY, help="Upload requests in flight")
+    parser.add_argument('--multipart-mb', type=int, default=MULTIPART_CHUNK >> 20,
+                        help="Multipart piece size; parts over four pieces are uploaded in pieces")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    pipeline = None
+    if os.path.exists(args.pipeline) and not args.refit:
+        pipeline = FeaturePipeline.load(args.pipeline)
+    client = None
+    if args.bucket:
+        client = make_s3_client(args.region, args.endpoint_url, max_pool_connections=args.concurrency)
+
+    result = prepare(args.train, args.test, args.output, pipeline, args.bucket, args.prefix, client,
+                     args.validation_fraction, args.seed, args.chunk_rows, args.workers,
+                     multipart_threshold=4 * (args.multipart_mb << 20),
+                     multipart_chunksize=args.multipart_mb << 20, max_concurrency=args.concurrency)
+    if result['stats'] is not None:
+        result['pipeline'].save(args.pipeline)
+
+    summary = {key: value for key, value in result.items() if key not in ('pipeline', 'stats')}
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    rows = ', '.join(f"{rows} {split}" for split, rows in summary['rows'].items())
+    print(f"Prepared {rows} rows in {summary['seconds']:.2f}s "
+          f"({summary['shards_written']} shards written, {summary['shards_skipped']} unchanged)")
+    if summary['dropped']:
+        print(f"Dropped {summary['dropped']} rows with missing values")
+    if result['stats'] is not None:
+        print(f"Fitted the feature pipeline on {result['stats'].count} rows; saved to {args.pipeline}")
+    if args.bucket:
+        print(f"Uploaded {summary['parts_uploaded']} parts ({summary['bytes_uploaded'] / 1e6:.1f} MB), "
+              f"{summary['parts_skipped']} already up to date, {summary['parts_deleted']} stale parts deleted")
+    for split, location in summary['channels'].items():
+        print(f"{split}: {location}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import predict_rows
+
+# Error codes the runtime API uses when an endpoint is over capacity
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'Throttling',
+    'TooManyRequestsException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+}
+
+
+def make_sagemaker_client(region_name='us-east-1', max_pool_connections=32, endpoint_url=None,
+                          connect_timeout=5, read_timeout=60):
+    """
+    Create a sagemaker-runtime client tuned for concurrent use.
+
+    The connection pool is sized for the number of in-flight requests and TCP
+    keep-alive is enabled so warm connections are reused. botocore's own retries
+    are turned off because InferenceDispatcher retries throttled calls itself.
+    """
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={'total_max_attempts': 1, 'mode': 'standard'}
+    )
+    return boto3.client('sagemaker-runtime', region_name=region_name,
+                        endpoint_url=endpoint_url, config=config)
+
+
+def is_throttling_error(exc):
+    """True if `exc` is a botocore error caused by endpoint throttling"""
+    response = getattr(exc, 'response', None) or {}
+    code = response.get('Error', {}).get('Code')
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in THROTTLING_ERROR_CODES or status == 429
+
+
+class InferenceDispatcher:
+    """
+    Runs backend batch predictions concurrently with bounded resources.
+
+    At most `max_in_flight` requests run at once; up to `max_queue` more may wait
+    for a worker. When both are used up, `submit` blocks (or raises queue.Full
+    after `timeout`) so producers slow down instead of growing an unbounded
+    backlog. Throttled calls are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, backend, max_in_flight=8, max_queue=64, max_retries=4,
+                 backoff_base=0.05, backoff_max=2.0):
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='inference')
+        self._slots = threading.BoundedSemaphore(max_in_flight + max_queue)
+        self._stats_lock = threading.Lock()
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'retries': 0, 'rejected': 0}
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def submit(self, rows, timeout=None, raw=False):
+        """
+        Queue a batch of feature rows and return a Future of its result dicts
+        (or, with `raw`, of the backend's (probabilities, latency) tuple).
+
+        Blocks while the dispatcher is saturated; with a `timeout` raises
+        queue.Full if no slot frees up in time.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            self._count('rejected')
+            raise queue.Full("Inference dispatcher is saturated")
+        try:
+            future = self._executor.submit(self._call, rows, raw)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._count('submitted')
+        return future
+
+    def predict(self, features, timeout=None):
+        """Blocking single-row prediction through the pool"""
+        return self.submit([features], timeout).result()[0]
+
+    def _call(self, rows, raw=False):
+        attempt = 0
+        while True:
+            try:
+                results = self.backend.predict_batch(rows) if raw else predict_rows(self.backend, rows)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_throttling_error(e):
+                    self._count('failed')
+                    raise
+                # Full jitter keeps retrying callers from synchronising
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                time.sleep(random.uniform(0, delay))
+                attempt += 1
+                self._count('retries')
+                continue
+            self._count('completed')
+            return results
+
+    def close(self, wait=True):
+        """Stop accepting work and optionally wait for queued requests"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,224 @@
+"""
+Offline evaluation of the model on a labelled test set.
+
+Batches are encoded with np.savetxt, sized to stay under the endpoint's
+request payload limit and scored concurrently through InferenceDispatcher;
+the confusion matrix is accumulated as batches complete. Works against the
+deployed endpoint or a local model, e.g.:
+
+    python evaluation.py --data test_data.csv --model model.tar.gz
+    python evaluation.py --data test_data.csv --endpoint cpu-state-xgboost-endpoint-improved-1744570066
+"""
+import argparse
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from dispatcher import InferenceDispatcher, make_sagemaker_client
+from inference import CLASS_NAMES, LocalBackend, RemoteBackend, encode_csv_rows
+
+# SageMaker real-time endpoints reject request bodies over 6 MB; keep some headroom
+MAX_PAYLOAD_BYTES = 5 * 1024 * 1024
+MAX_BATCH_ROWS = 10_000
+SAMPLE_ROWS = 1024   # rows encoded up front to estimate the CSV size of a row
+
+
+class StreamingMetrics:
+    """Confusion matrix and per-class precision/recall/F1, updated one batch at a time"""
+
+    def __init__(self, class_names=CLASS_NAMES):
+        self.class_names = tuple(class_names)
+        n = len(self.class_names)
+        self.confusion = np.zeros((n, n), dtype=np.int64)
+
+    def update(self, actual, predicted):
+        n = len(self.class_names)
+        counts = np.bincount(np.asarray(actual, dtype=np.int64) * n + predicted, minlength=n * n)
+        self.confusion += counts.reshape(n, n)
+
+    @property
+    def rows(self):
+        return int(self.confusion.sum())
+
+    @property
+    def accuracy(self):
+        return np.trace(self.confusion) / max(self.rows, 1)
+
+    def per_class(self):
+        """dict of class name -> precision, recall, f1 and support"""
+        tp = np.diag(self.confusion).astype(np.float64)
+        predicted = self.confusion.sum(axis=0)
+        support = self.confusion.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.nan_to_num(tp / predicted)
+            recall = np.nan_to_num(tp / support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        return {
+            name: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]),
+                   'support': int(support[i])}
+            for i, name in enumerate(self.class_names)
+        }
+
+    def report(self):
+        """Text table in the layout of sklearn's classification_report"""
+        lines = [f"{'':>12} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+        per_class = self.per_class()
+        for name, m in per_class.items():
+            lines.append(f"{name:>12} {m['precision']:>9.2f} {m['recall']:>9.2f} {m['f1']:>9.2f} {m['support']:>9}")
+        macro = [np.mean([m[key] for m in per_class.values()]) for key in ('precision', 'recall', 'f1')]
+        lines += ["", f"{'accuracy':>12} {'':>9} {'':>9} {self.accuracy:>9.2f} {self.rows:>9}",
+                  f"{'macro avg':>12} {macro[0]:>9.2f} {macro[1]:>9.2f} {macro[2]:>9.2f} {self.rows:>9}"]
+        return '\n'.join(lines)
+
+
+def plan_batch_rows(features, payload_limit=MAX_PAYLOAD_BYTES, max_rows=MAX_BATCH_ROWS, sample_rows=SAMPLE_ROWS):
+    """
+    Rows per request so an encoded batch stays under `payload_limit` bytes.
+
+    Encodes an evenly spaced sample and sizes batches by its longest line,
+    so batches are as large as the limit allows without measuring each one.
+    """
+    if payload_limit is None or not len(features):
+        return max_rows
+    sample = features[::max(1, len(features) // sample_rows)][:sample_rows]
+    longest = max(len(line) for line in encode_csv_rows(sample).split('\n')) + 1
+    return int(max(1, min(max_rows, payload_limit // longest)))
+
+
+def evaluate(backend, features, labels, class_names=CLASS_NAMES, max_in_flight=8, payload_limit=MAX_PAYLOAD_BYTES,
+             max_batch_rows=MAX_BATCH_ROWS, keep_probabilities=True):
+    """
+    Score a labelled test set on `backend` and accumulate metrics as batches finish.
+
+    Parameters:
+    backend: RemoteBackend, PredictorBackend or LocalBackend
+    features (array-like or DataFrame): N x n_features model inputs
+    labels (array-like): N true class indices
+    max_in_flight (int): batches scored concurrently
+    payload_limit (int): request size cap for backends that send CSV (ignored for local scoring)
+    keep_probabilities (bool): also return the N x n_classes probabilities
+
+    Returns:
+    dict: metrics (StreamingMetrics), accuracy, predictions, probabilities,
+        batch sizing and throughput figures
+    """
+    if hasattr(features, 'to_numpy'):
+        features = features.to_numpy()
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    labels = np.asarray(labels)
+    n = len(features)
+
+    limit = None if backend.name == 'local' else payload_limit
+    batch_rows = plan_batch_rows(features, limit, max_batch_rows)
+    metrics = StreamingMetrics(class_names)
+    predictions = np.empty(n, dtype=np.int8)
+    probabilities = np.empty((n, len(class_names)), dtype=np.float32) if keep_probabilities else None
+    latencies = []
+
+    def consume(start, stop, future):
+        probs, latency = future.result()
+        predicted = np.argmax(probs, axis=1)
+        predictions[start:stop] = predicted
+        if probabilities is not None:
+            probabilities[start:stop] = probs
+        metrics.update(labels[start:stop], predicted)
+        latencies.append(latency)
+
+    # A short queue bounds the number of encoded batches alive at once
+    dispatcher = InferenceDispatcher(backend, max_in_flight=max_in_flight, max_queue=max_in_flight)
+    start_time = time.perf_counter()
+    pending = deque()
+    try:
+        for start in range(0, n, batch_rows):
+            stop = min(start + batch_rows, n)
+            pending.append((start, stop, dispatcher.submit(features[start:stop], raw=True)))
+            while pending and pending[0][2].done():
+                consume(*pending.popleft())
+        while pending:
+            consume(*pending.popleft())
+    finally:
+        dispatcher.close(wait=not pending)
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        'metrics': metrics,
+        'accuracy': metrics.accuracy,
+        'predictions': predictions,
+        'probabilities': probabilities,
+        'rows': n,
+        'batch_rows': batch_rows,
+        'batches': len(latencies),
+        'seconds': elapsed,
+        'rows_per_s': n / elapsed if elapsed else float('inf'),
+        'mean_batch_latency_ms': float(np.mean(latencies)) if latencies else 0.0,
+        'retries': dispatcher.stats['retries'],
+    }
+
+
+def load_test_set(path, pipeline_path=None):
+    """
+    Features and labels from a labelled CSV (test_data.csv layout).
+
+    With a saved feature pipeline the 16 scaled features are built from the
+    readings; otherwise the legacy ten columns (readings and label columns)
+    are used as-is.
+    """
+    import pandas as pd
+
+    from features import LABEL_FEATURES, FeaturePipeline
+    from serial_protocol import SENSOR_FIELDS
+
+    data = pd.read_csv(path)
+    if pipeline_path:
+        features = FeaturePipeline.load(pipeline_path).transform(data)
+    else:
+        features = data[list(SENSOR_FIELDS + LABEL_FEATURES)].to_numpy(np.float32)
+    return features, data['cpu_state'].to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', default='test_data.csv', help="Labelled CSV with a cpu_state column")
+    parser.add_argument('--pipeline', help="feature_pipeline.json to build the 16 model features")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--model', help="Score locally with this model artifact")
+    target.add_argument('--endpoint', help="Score on this SageMaker endpoint")
+    parser.add_argument('--endpoint-url', help="Override the runtime URL (e.g. a stub endpoint)")
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--payload-limit', type=int, default=MAX_PAYLOAD_BYTES)
+    parser.add_argument('--max-batch-rows', type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    features, labels = load_test_set(args.data, args.pipeline)
+    if args.model:
+        backend = LocalBackend(args.model)
+    else:
+        client = make_sagemaker_client(args.region, max_pool_connections=args.in_flight,
+                                       endpoint_url=args.endpoint_url)
+        backend = RemoteBackend(client, args.endpoint)
+
+    result = evaluate(backend, features, labels, max_in_flight=args.in_flight, payload_limit=args.payload_limit,
+                      max_batch_rows=args.max_batch_rows, keep_probabilities=False)
+    summary = {key: result[key] for key in ('rows', 'batch_rows', 'batches', 'seconds', 'rows_per_s',
+                                            'mean_batch_latency_ms', 'retries', 'accuracy')}
+    if args.json:
+        summary['confusion_matrix'] = result['metrics'].confusion.tolist()
+        summary['per_class'] = result['metrics'].per_class()
+        print(json.dumps(summary, indent=2, default=float))
+        return
+
+    print(f"Scored {summary['rows']} rows in {summary['batches']} batches of up to {summary['batch_rows']} "
+          f"({summary['seconds']:.2f}s, {summary['rows_per_s']:.0f} rows/s, {summary['retries']} retries)")
+    print(f"Test Accuracy: {summary['accuracy'] * 100:.2f}%")
+    print("\nConfusion Matrix:")
+    print(result['metrics'].confusion)
+    print("\nClassification Report:")
+    print(result['metrics'].report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+from datetime import datetime
+
+import numpy as np
+
+from history_store import CATEGORICAL_COLUMNS, HISTORY_COLUMNS, columns_to_frame, local_offsets_ns
+
+EXPORT_DIR = 'exports'
+CHUNK_ROWS = 65_536   # rows formatted per chunk; bounds memory during an export
+
+LATENCY_COLUMNS = ('timestamp', 'network_type', 'backend', 'latency', 'amortized_latency',
+                   'batch_size', 'prediction')
+
+
+def iter_chunks(parts, chunk_rows=CHUNK_ROWS):
+    """Re-slice an iterable of RECORD_DTYPE arrays into chunks of at most `chunk_rows` rows"""
+    for part in parts:
+        for start in range(0, len(part), chunk_rows):
+            yield part[start:start + chunk_rows]
+
+
+def iter_csv(parts, columns=tuple(HISTORY_COLUMNS), chunk_rows=CHUNK_ROWS):
+    """
+    Generate a CSV export as encoded byte chunks.
+
+    `parts` is an iterable of RECORD_DTYPE arrays (e.g. TimeSeriesLog.iter_range);
+    only one chunk of rows is formatted at a time, so memory stays constant
+    regardless of how many rows are exported.
+    """
+    yield (','.join(columns) + '\n').encode()
+    for chunk in iter_chunks(parts, chunk_rows):
+        frame = columns_to_frame(chunk)[list(columns)]
+        if 'timestamp' in frame:
+            # Local ISO-8601 strings, formatted by NumPy far faster than tz-aware datetimes
+            local = (chunk['timestamp'] + local_offsets_ns(chunk['timestamp'])).view('M8[ns]')
+            frame['timestamp'] = np.datetime_as_string(local, unit='us')
+        yield frame.to_csv(index=False, header=False).encode()
+
+
+def write_csv(parts, path, columns=tuple(HISTORY_COLUMNS), chunk_rows=CHUNK_ROWS):
+    """Stream records to a CSV file; returns the number of rows written"""
+    rows = 0
+
+    def counted(parts):
+        nonlocal rows
+        for part in parts:
+            rows += len(part)
+            yield part
+
+    with open(path, 'wb') as f:
+        for data in iter_csv(counted(parts), columns, chunk_rows):
+            f.write(data)
+    return rows
+
+
+def parquet_schema(columns=tuple(HISTORY_COLUMNS)):
+    """Typed Arrow schema for the exported columns"""
+    import pyarrow as pa
+
+    fields = []
+    for name in columns:
+        if name == 'timestamp':
+            fields.append(pa.field(name, pa.timestamp('ns', tz='UTC')))
+        elif name in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int8(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.from_numpy_dtype(np.dtype(HISTORY_COLUMNS[name]))))
+    return pa.schema(fields)
+
+
+def _arrow_table(chunk, schema):
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        values = np.ascontiguousarray(chunk[field.name])
+        if field.name in CATEGORICAL_COLUMNS:
+            arrays.append(pa.DictionaryArray.from_arrays(values, list(CATEGORICAL_COLUMNS[field.name])))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(parts, path, columns=tuple(HISTORY_COLUMNS), compression='zstd', chunk_rows=CHUNK_ROWS):
+    """Stream records to a Parquet file, one row group per chunk; returns the number of rows written"""
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(columns)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for chunk in iter_chunks(parts, chunk_rows):
+            writer.write_table(_arrow_table(chunk, schema))
+            rows += len(chunk)
+    return rows
+
+
+WRITERS = {
+    'csv': write_csv,
+    'parquet': write_parquet,
+}
+
+
+def export_records(parts, name, fmt='csv', columns=tuple(HISTORY_COLUMNS), directory=EXPORT_DIR):
+    """Write an export file named after `name` and the current time; returns (path, rows)"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}")
+    rows = WRITERS[fmt](parts, path, columns)
+    return path, rows
@@ -0,0 +1,215 @@
+import json
+import tarfile
+
+import numpy as np
+
+from serial_protocol import SENSOR_FIELDS
+
+# Training label rules (same as generate_synthetic_data.label_columns), in training column order
+LABEL_FEATURES = ('temp_label', 'voltage_label', 'current_label', 'usage_label', 'fan_label')
+ENGINEERED_FEATURES = ('temp_current', 'usage_voltage', 'temp_squared', 'usage_squared',
+                       'voltage_current_ratio', 'temp_fan_ratio')
+
+# Model input columns, in the order the notebook trains on
+FEATURE_NAMES = SENSOR_FIELDS + LABEL_FEATURES + ENGINEERED_FEATURES
+# Columns standardized by the scaler; the 0/1 labels pass through unchanged
+SCALED_FEATURES = SENSOR_FIELDS + ENGINEERED_FEATURES
+
+PIPELINE_FILE = 'feature_pipeline.json'
+BLOCK_ROWS = 8192   # rows per fused pass; keeps the float64 scratch block in cache
+
+
+def _engineer(x, out):
+    """Write the unscaled features for float64 readings `x` (n x 5) into `out` (n x 16)"""
+    temperature, voltage, current, cpu_usage, fan_speed = x.T
+    out[:, :5] = x
+    np.greater(temperature, 85, out=out[:, 5])
+    np.logical_or(voltage < 10, voltage > 14, out=out[:, 6])
+    np.greater(current, 13, out=out[:, 7])
+    np.greater(cpu_usage, 90, out=out[:, 8])
+    np.less(fan_speed, 1500, out=out[:, 9])
+    np.multiply(temperature, current, out=out[:, 10])
+    np.multiply(cpu_usage, voltage, out=out[:, 11])
+    np.square(temperature, out=out[:, 12])
+    np.square(cpu_usage, out=out[:, 13])
+    np.divide(voltage, current + 0.001, out=out[:, 14])       # avoid division by zero
+    np.divide(temperature, fan_speed + 0.001, out=out[:, 15])
+
+
+def _as_readings(data):
+    """N x 5 readings in SENSOR_FIELDS order from an array or a DataFrame with those columns"""
+    if hasattr(data, 'columns'):
+        data = data[list(SENSOR_FIELDS)].to_numpy()
+    return np.asarray(data).reshape(-1, len(SENSOR_FIELDS))
+
+
+class FeatureStats:
+    """
+    Streaming mean and covariance of the unscaled features plus the label.
+
+    Rows are folded in BLOCK_ROWS at a time, and partial results (per chunk,
+    shard or worker process) are combined with `merge` using the pairwise
+    update of Chan et al., so the fitted scaler matches FeaturePipeline.fit
+    on the whole frame without ever holding it in memory.
+    """
+
+    COLUMNS = FEATURE_NAMES + ('cpu_state',)
+
+    def __init__(self, count=0, mean=None, comoment=None):
+        k = len(self.COLUMNS)
+        self.count = count
+        self.mean = np.zeros(k) if mean is None else np.asarray(mean, dtype=np.float64)
+        # Sum of outer products of the deviations from the mean
+        self.comoment = np.zeros((k, k)) if comoment is None else np.asarray(comoment, dtype=np.float64)
+
+    def add(self, data, labels):
+        """Fold in N readings (array or DataFrame) and their N cpu_state labels"""
+        x = _as_readings(data)
+        labels = np.asarray(labels)
+        block = np.empty((min(len(x), BLOCK_ROWS), len(self.COLUMNS)))
+        for start in range(0, len(x), BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, len(x))
+            scratch = block[:stop - start]
+            _engineer(x[start:stop].astype(np.float64, copy=False), scratch[:, :len(FEATURE_NAMES)])
+            scratch[:, -1] = labels[start:stop]
+            mean = scratch.mean(axis=0)
+            centered = scratch - mean
+            self._combine(stop - start, mean, centered.T @ centered)
+        return self
+
+    def merge(self, other):
+        """Fold in the statistics of another FeatureStats"""
+        return self._combine(other.count, other.mean, other.comoment)
+
+    def _combine(self, count, mean, comoment):
+        if not count:
+            return self
+        total = self.count + count
+        delta = mean - self.mean
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.count * count / total)
+        self.mean = self.mean + delta * (count / total)
+        self.count = total
+        return self
+
+    def pipeline(self):
+        """FeaturePipeline with the fitted mean and (population) standard deviation"""
+        k = len(FEATURE_NAMES)
+        scale = np.sqrt(np.diag(self.comoment)[:k] / max(self.count, 1))
+        scale[scale == 0] = 1.0
+        return FeaturePipeline(dict(zip(FEATURE_NAMES, self.mean[:k])), dict(zip(FEATURE_NAMES, scale)))
+
+    def correlation(self):
+        """Pearson correlation matrix over COLUMNS (NaN for constant columns)"""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.comoment / np.outer(std, std)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean.tolist(), 'comoment': self.comoment.tolist()}
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(params['count'], params['mean'], params['comoment'])
+
+
+class FeaturePipeline:
+    """
+    Feature engineering plus standardization, shared by training and live inference.
+
+    Produces the 16 model inputs in FEATURE_NAMES order: the five readings,
+    the five warning labels and six interaction/squared/ratio features, with
+    the readings and engineered features standardized by the fitted mean and
+    scale (as StandardScaler would). `transform` computes and scales blocks of
+    rows in one pass into a preallocated float32 array; `transform_one` does
+    the same for a single reading with plain float arithmetic, which is
+    cheaper than NumPy for five values.
+    """
+
+    def __init__(self, mean, scale):
+        """`mean`/`scale` map each name in SCALED_FEATURES to its fitted value"""
+        self.mean = np.zeros(len(FEATURE_NAMES))
+        self.scale = np.ones(len(FEATURE_NAMES))
+        for i, name in enumerate(FEATURE_NAMES):
+            if name in SCALED_FEATURES:
+                self.mean[i] = mean[name]
+                self.scale[i] = scale[name]
+        self._inv_scale = 1.0 / self.scale
+        # Python floats for the single-row path
+        self._mean_list = self.mean.tolist()
+        self._inv_scale_list = self._inv_scale.tolist()
+
+    @classmethod
+    def fit(cls, data):
+        """Fit the scaler on training readings (array or DataFrame)"""
+        x = _as_readings(data).astype(np.float64)
+        features = np.empty((len(x), len(FEATURE_NAMES)))
+        _engineer(x, features)
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0   # constant columns pass through, as in StandardScaler
+        return cls(dict(zip(FEATURE_NAMES, mean)), dict(zip(FEATURE_NAMES, scale)))
+
+    def transform(self, data, out=None):
+        """
+        Build scaled features for a batch of readings.
+
+        Parameters:
+        data (array-like or DataFrame): N x 5 readings in SENSOR_FIELDS order
+        out (np.ndarray): optional preallocated N x 16 float32 output
+
+        Returns:
+        np.ndarray: N x 16 float32 features in FEATURE_NAMES order
+        """
+        x = _as_readings(data)
+        if out is None:
+            out = np.empty((len(x), len(FEATURE_NAMES)), dtype=np.float32)
+        block = np.empty((min(len(x), BLOCK_ROWS), len(FEATURE_NAMES)))
+        for start in range(0, len(x), BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, len(x))
+            scratch = block[:stop - start]
+            _engineer(x[start:stop].astype(np.float64, copy=False), scratch)
+            scratch -= self.mean
+            scratch *= self._inv_scale
+            out[start:stop] = scratch
+        return out
+
+    def transform_one(self, values, out=None):
+        """Scaled features for one reading (five values in SENSOR_FIELDS order) as a float32 row"""
+        temperature, voltage, current, cpu_usage, fan_speed = map(float, values)
+        features = (
+            temperature, voltage, current, cpu_usage, fan_speed,
+            float(temperature > 85), float(voltage < 10 or voltage > 14), float(current > 13),
+            float(cpu_usage > 90), float(fan_speed < 1500),
+            temperature * current, cpu_usage * voltage, temperature * temperature, cpu_usage * cpu_usage,
+            voltage / (current + 0.001), temperature / (fan_speed + 0.001),
+        )
+        if out is None:
+            out = np.empty(len(FEATURE_NAMES), dtype=np.float32)
+        out[:] = [(f - m) * s for f, m, s in zip(features, self._mean_list, self._inv_scale_list)]
+        return out
+
+    def to_dict(self):
+        return {
+            'features': list(FEATURE_NAMES),
+            'mean': {name: float(self.mean[FEATURE_NAMES.index(name)]) for name in SCALED_FEATURES},
+            'scale': {name: float(self.scale[FEATURE_NAMES.index(name)]) for name in SCALED_FEATURES},
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        if tuple(params['features']) != FEATURE_NAMES:
+            raise ValueError(f"Pipeline was fitted for features {params['features']}, expected {list(FEATURE_NAMES)}")
+        return cls(params['mean'], params['scale'])
+
+    def save(self, path=PIPELINE_FILE):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path=PIPELINE_FILE):
+        """Load from a saved JSON file, or from PIPELINE_FILE packaged inside a model.tar.gz"""
+        if tarfile.is_tarfile(path):
+            with tarfile.open(path) as archive:
+                return cls.from_dict(json.load(archive.extractfile(PIPELINE_FILE)))
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,461 @@
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+from aggregation import HistoryAggregator
+from change_gate import ChangeGate
+from history_store import HistoryStore, local_offsets_ns
+from inference import make_features
+from sensor_states import classify_readings
+from sensor_stream import SensorRingBuffer
+from serial_protocol import DECODERS, SENSOR_FIELDS
+
+# MQTT topics carry the device ID in place of the '+' wildcard
+MQTT_TOPIC = 'sensors/+/readings'
+POLL_INTERVAL_S = 0.01   # how often sources without a file descriptor are read
+
+
+class DeviceState:
+    """Everything kept per device: recent readings, change gate, prediction history, its summaries and counters"""
+
+    def __init__(self, device_id, buffer_capacity=4096, retention=10_000, gate=None, log=None):
+        self.device_id = device_id
+        self.readings = SensorRingBuffer(buffer_capacity)   # written only by the ingestion loop
+        self.history = HistoryStore(retention)
+        self.gate = gate
+        self.log = log   # optional TimeSeriesLog that every prediction is also appended to
+        self.aggregates = HistoryAggregator(utc_offset=local_offsets_ns)
+        if log is not None:
+            for chunk in log.iter_range():
+                self.aggregates.add(chunk)
+        self.last_prediction = None
+        self.last_seen = None
+        self.stats = {'readings': 0, 'predicted': 0, 'suppressed': 0, 'shed': 0, 'errors': 0}
+        self._lock = threading.Lock()   # guards history, last_prediction and stats
+        # Readings not yet recorded, in arrival order: (kind, future, timestamp, values), kind being
+        # 'predict', 'gate' or 'shed'. Guarded with the gate by order_lock, so history stays time-ordered.
+        self.pending = deque()
+        self.order_lock = threading.Lock()
+
+    def record(self, timestamp, values, result, network_type):
+        with self._lock:
+            self.history.append(
+                timestamp,
+                dict(zip(SENSOR_FIELDS, values)),
+                result['probabilities'],
+                result['latency'],
+                result['amortized_latency'],
+                result['batch_size'],
+                network_type,
+                result['backend']
+            )
+            self.last_prediction = result
+            record = self.history.records(len(self.history) - 1)
+            self.aggregates.add(record)
+            if self.log is not None:
+                self.log.append(record)
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def summary(self):
+        latest = self.readings.latest()
+        with self._lock:
+            prediction = self.last_prediction
+            return {
+                'device_id': self.device_id,
+                'last_seen': self.last_seen,
+                'reading': latest[1] if latest else None,
+                'prediction': prediction['prediction'] if prediction else None,
+                'probabilities': prediction['probabilities'] if prediction else None,
+                **self.stats,
+            }
+
+
+class StreamSource:
+    """
+    One device on a byte stream, decoded with a serial_protocol decoder.
+
+    Subclasses provide `read_chunk`, returning the bytes available now
+    (b'' if none) or None once the stream has ended.
+    """
+
+    def __init__(self, device_id, stream, protocol='text'):
+        self.device_id = device_id
+        self.stream = stream
+        self.decoder = DECODERS[protocol]()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def attach(self, ingestor):
+        ingestor.register(self, self)
+
+    def read_chunk(self):
+        raise NotImplementedError
+
+    def handle(self, emit, events=selectors.EVENT_READ):
+        """Decode whatever is readable; returns False once the source is exhausted"""
+        chunk = self.read_chunk()
+        if chunk is None:
+            return False
+        if chunk:
+            now = time.time()
+            n = self.decoder.feed(chunk)
+            while n:
+                emit(self.device_id, now, self.decoder.values[:n])
+                n = self.decoder.feed(b'')
+        return True
+
+    def close(self):
+        self.stream.close()
+
+
+class SerialSource(StreamSource):
+    """
+    A device on a serial port (a pyserial Serial opened with timeout=0).
+
+    On POSIX the port's file descriptor is watched by the selector; where a
+    port has no selectable descriptor (Windows COM ports) it is polled every
+    POLL_INTERVAL_S instead.
+    """
+
+    def attach(self, ingestor):
+        try:
+            self.stream.fileno()
+        except Exception:
+            ingestor.poll(self)
+        else:
+            ingestor.register(self, self)
+
+    def read_chunk(self):
+        return self.stream.read(self.stream.in_waiting or 1) if self.stream.in_waiting else b''
+
+
+class SocketSource(StreamSource):
+    """A device streaming over a connected socket (TCP bridge, socketpair in tests and benchmarks)"""
+
+    def __init__(self, device_id, sock, protocol='text'):
+        sock.setblocking(False)
+        super().__init__(device_id, sock, protocol)
+
+    def read_chunk(self):
+        try:
+            return self.stream.recv(65536) or None
+        except (BlockingIOError, InterruptedError):
+            return b''
+
+
+class MqttSource:
+    """
+    Every device publishing to an MQTT broker under `topic`.
+
+    The device ID is the topic level matched by the '+' wildcard
+    (sensors/<device_id>/readings by default) and payloads are in the
+    serial `protocol`, one decoder per device. Uses paho-mqtt's hooks for
+    external event loops, so the client's socket is served by the
+    ingestion selector rather than a network thread of its own.
+    """
+
+    def __init__(self, host='localhost', port=1883, topic=MQTT_TOPIC, protocol='text', qos=0, keepalive=60,
+                 client_id=''):
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError as e:
+            raise ImportError("MQTT ingestion needs paho-mqtt (pip install paho-mqtt)") from e
+
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.protocol = protocol
+        self.qos = qos
+        self.keepalive = keepalive
+        self._device_level = topic.split('/').index('+')
+        self._decoders = {}
+        self._emit = None
+        self._ingestor = None
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        else:
+            self.client = mqtt.Client(client_id=client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.client.on_socket_open = lambda client, userdata, sock: self._ingestor.register(sock, self)
+        self.client.on_socket_close = lambda client, userdata, sock: self._ingestor.unregister(sock)
+        self.client.on_socket_register_write = (
+            lambda client, userdata, sock: self._ingestor.modify(sock, self, selectors.EVENT_READ | selectors.EVENT_WRITE))
+        self.client.on_socket_unregister_write = (
+            lambda client, userdata, sock: self._ingestor.modify(sock, self, selectors.EVENT_READ))
+
+    def attach(self, ingestor):
+        self._ingestor = ingestor
+        self._emit = ingestor.emit
+        self.client.connect(self.host, self.port, self.keepalive)
+        ingestor.poll(self)   # keepalives and reconnects run from loop_misc
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        client.subscribe(self.topic, self.qos)
+
+    def _on_message(self, client, userdata, message):
+        device_id = message.topic.split('/')[self._device_level]
+        decoder = self._decoders.get(device_id)
+        if decoder is None:
+            decoder = self._decoders[device_id] = DECODERS[self.protocol]()
+        payload = message.payload
+        if self.protocol == 'text' and not payload.endswith(b'\n'):
+            payload += b'\n'   # one reading per message
+        now = time.time()
+        n = decoder.feed(payload)
+        while n:
+            self._emit(device_id, now, decoder.values[:n])
+            n = decoder.feed(b'')
+
+    def handle(self, emit, events=0):
+        if events & selectors.EVENT_READ:
+            self.client.loop_read()
+        if events & selectors.EVENT_WRITE:
+            self.client.loop_write()
+        if not events:
+            self.client.loop_misc()
+        return True
+
+    def close(self):
+        self.client.disconnect()
+
+
+class FleetIngestor:
+    """
+    Ingests readings from many devices on one thread and scores them through one shared predictor.
+
+    Sources (serial ports, sockets, an MQTT subscription) are multiplexed
+    with `selectors`, so a hundred devices cost one thread, not a hundred.
+    Each decoded reading is tagged with its device ID, appended to that
+    device's ring buffer and passed through the device's ChangeGate; readings
+    that need a prediction are submitted to `predictor` (a BatchingPredictor
+    with a dispatcher, or a ModelRegistry), which folds readings from all
+    devices into shared multi-row requests. Results land in the device's HistoryStore
+    in reading order: each device queues its readings until every earlier
+    prediction has come back, so gated readings reuse the newest prediction
+    and the history stays time-ordered. At most `max_pending` predictions are
+    outstanding; readings beyond that are shed (kept in the ring buffer but
+    not scored) rather than queued without bound.
+
+    Parameters:
+    predictor: object with `submit(features, route) -> Future` of a result dict; rows are submitted
+        with `network_type` as their route
+    pipeline (FeaturePipeline): features for the model, or None for the legacy ten values
+    change_detection (bool): give each device a ChangeGate built from `gate_options`
+    log_factory (callable): device ID -> TimeSeriesLog persisting that device's predictions, or None
+    instrumentation (Instrumentation): optional; receives each row's end-to-end prediction time under
+        `network_type`. Batch stage timings come from the predictor, so give it the same instance
+    """
+
+    def __init__(self, predictor, pipeline=None, network_type='4G', change_detection=True, gate_options=None,
+                 buffer_capacity=4096, retention=10_000, max_pending=1024, log_factory=None, instrumentation=None):
+        self.predictor = predictor
+        self.pipeline = pipeline
+        self.network_type = network_type
+        self.change_detection = change_detection
+        self.gate_options = gate_options or {}
+        self.buffer_capacity = buffer_capacity
+        self.retention = retention
+        self.max_pending = max_pending
+        self.log_factory = log_factory
+        self.instrumentation = instrumentation
+        self.devices = {}
+        self.stats = {'readings': 0, 'submitted': 0, 'completed': 0, 'suppressed': 0, 'shed': 0, 'errors': 0}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._polled = []
+        self._sources = []
+        self._added = deque()
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ, None)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.error = None   # last exception raised by a source
+        self.source_errors = 0
+
+    # Called by sources (from the loop thread) to manage their registrations
+
+    def register(self, fileobj, source, events=selectors.EVENT_READ):
+        self._selector.register(fileobj, events, source)
+
+    def modify(self, fileobj, source, events):
+        self._selector.modify(fileobj, events, source)
+
+    def unregister(self, fileobj):
+        try:
+            self._selector.unregister(fileobj)
+        except (KeyError, ValueError):
+            pass
+
+    def poll(self, source):
+        self._polled.append(source)
+
+    # Public API
+
+    def add_source(self, source):
+        """Start ingesting from `source`; safe to call from any thread"""
+        if isinstance(getattr(source, 'device_id', None), str):
+            self.device(source.device_id)
+        self._added.append(source)
+        self._wake()
+        return source
+
+    def device(self, device_id):
+        """State for `device_id`, created on first use"""
+        state = self.devices.get(device_id)
+        if state is None:
+            with self._lock:
+                state = self.devices.get(device_id)
+                if state is None:
+                    gate = ChangeGate(**self.gate_options) if self.change_detection else None
+                    log = self.log_factory(device_id) if self.log_factory is not None else None
+                    state = DeviceState(device_id, self.buffer_capacity, self.retention, gate, log)
+                    self.devices[device_id] = state
+        return state
+
+    def snapshot(self):
+        """One summary dict per device, ordered by device ID"""
+        return [self.devices[device_id].summary() for device_id in sorted(self.devices)]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='fleet-ingestor', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for source in self._sources:
+            try:
+                source.close()
+            except Exception:
+                pass
+        self._selector.close()
+        self._wake_recv.close()
+        self._wake_send.close()
+
+    # Ingestion loop
+
+    def _wake(self):
+        try:
+            self._wake_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        next_poll = time.monotonic()
+        while not self._stop_event.is_set():
+            timeout = max(0.0, next_poll - time.monotonic()) if self._polled else None
+            for key, events in self._selector.select(timeout):
+                if key.data is None:
+                    self._drain_wakeups()
+                elif not self._handle(key.data, events):
+                    self.unregister(key.fileobj)
+            if self._polled and time.monotonic() >= next_poll:
+                self._polled = [source for source in self._polled if self._handle(source, 0)]
+                next_poll = time.monotonic() + POLL_INTERVAL_S
+
+    def _handle(self, source, events):
+        """Let `source` read; a source that ends or fails is dropped without stopping the others"""
+        try:
+            return source.handle(self.emit, events)
+        except Exception as e:
+            self.error = e
+            self.source_errors += 1
+            return False
+
+    def _drain_wakeups(self):
+        try:
+            while self._wake_recv.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self._added:
+            source = self._added.popleft()
+            self._sources.append(source)
+            source.attach(self)
+
+    def emit(self, device_id, timestamp, rows):
+        """Handle readings decoded for one device (loop thread only); `rows` may be a decoder's buffer"""
+        state = self.device(device_id)
+        state.last_seen = timestamp
+        self.stats['readings'] += len(rows)
+        state.stats['readings'] += len(rows)
+        # One vectorized classification serves both the gate and the legacy features
+        all_states = classify_readings(rows).tolist()
+        for row, states in zip(rows, all_states):
+            state.readings.append(timestamp, row)
+            values = row.tolist()
+
+            future = None
+            with state.order_lock:
+                if state.gate is not None and state.gate.check(values, states) is None:
+                    kind = 'gate'
+                else:
+                    with self._lock:
+                        kind = 'shed' if self._pending >= self.max_pending else 'predict'
+                        if kind == 'predict':
+                            self._pending += 1
+                    if kind == 'predict':
+                        submitted = time.perf_counter_ns()
+                        future = self.predictor.submit(make_features(values, self.pipeline, states),
+                                                       self.network_type)
+                state.pending.append((kind, future, timestamp, values))
+
+            if kind == 'predict':
+                self.stats['submitted'] += 1
+                future.add_done_callback(
+                    lambda f, state=state, submitted=submitted: self._completed(f, state, submitted))
+                continue
+            if kind == 'gate':
+                state.count('suppressed')
+                self.stats['suppressed'] += 1
+            else:
+                state.count('shed')
+                self.stats['shed'] += 1
+            self._flush(state)
+
+    def _completed(self, future, state, submitted):
+        with self._lock:
+            self._pending -= 1
+            self.stats['completed'] += 1
+        if self.instrumentation is not None and future.exception() is None:
+            self.instrumentation.record('prediction', time.perf_counter_ns() - submitted, self.network_type)
+        self._flush(state)
+
+    def _flush(self, state):
+        """Record the device's queued readings from the head, up to the first prediction still in flight"""
+        with state.order_lock:
+            while state.pending:
+                kind, future, timestamp, values = state.pending[0]
+                if future is not None and not future.done():
+                    return
+                state.pending.popleft()
+                if kind == 'gate':
+                    state.record(timestamp, values, {**state.gate.last_prediction, 'latency': 0.0,
+                                                     'amortized_latency': 0.0, 'batch_size': 1, 'backend': 'gate'},
+                                 self.network_type)
+                elif kind == 'shed' or future.exception() is not None:
+                    # Re-arm the gate so the next reading is forwarded again
+                    if state.gate is not None:
+                        state.gate.forward_failed()
+                    if kind == 'predict':
+                        state.count('errors')
+                        with self._lock:
+                            self.stats['errors'] += 1
+                else:
+                    result = future.result()
+                    if state.gate is not None:
+                        state.gate.remember(result)
+                    state.record(timestamp, values, result, self.network_type)
+                    state.count('predicted')
@@ -1,7 +1,51 @@
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-import os
+
+SENSOR_FIELDS = ('temperature', 'voltage', 'current', 'cpu_usage', 'fan_speed')
+
+# Per-sensor noise around each device's baseline, matching generate_synthetic_data()
+SENSOR_MEANS = np.array([70.0, 12.0, 10.0, 50.0, 2000.0], dtype=np.float32)
+SENSOR_STDS = np.array([15.0, 1.0, 2.0, 0.0, 500.0], dtype=np.float32)   # cpu_usage is uniform(0, 100)
+
+# Additive offsets applied to each sensor while a fault is active (code = row index + 1)
+FAULT_TYPES = ('overheat', 'voltage_sag', 'current_spike', 'fan_failure')
+FAULT_EFFECTS = np.array([
+    [25.0, 0.0, 0.0, 20.0, 0.0],       # overheat
+    [0.0, -3.0, 0.0, 0.0, 0.0],        # voltage_sag
+    [5.0, 0.0, 5.0, 0.0, 0.0],         # current_spike
+    [15.0, 0.0, 0.0, 0.0, -1800.0],    # fan_failure
+], dtype=np.float32)
+
+CHUNK_ROWS = 1_000_000   # rows generated and written per task; bounds memory per worker
+
+
+def label_columns(columns):
+    """
+    Sensor warning labels and the CPU state derived from them.
+
+    Parameters:
+    columns (mapping): DataFrame or dict of arrays with the five sensor columns
+
+    Returns:
+    dict: boolean label arrays plus 'cpu_state' (0: Normal, 1: Warning, 2: Critical)
+    """
+    labels = {
+        'temp_label': columns['temperature'] > 85,
+        'voltage_label': (columns['voltage'] < 10) | (columns['voltage'] > 14),
+        'current_label': columns['current'] > 13,
+        'usage_label': columns['cpu_usage'] > 90,
+        'fan_label': columns['fan_speed'] < 1500,
+    }
+    warning_conditions = sum(labels.values())
+    labels['cpu_state'] = np.minimum(warning_conditions, 2)
+    return labels
+
 
 def generate_synthetic_data(n_samples=10000):
     """
@@ -31,23 +75,232 @@ def generate_synthetic_data(n_samples=10000):
     df['fan_speed'] = df['fan_speed'] + df['temperature'] * 10
     df['current'] = df['current'] + df['cpu_usage'] * 0.05
     
-    # Create sensor labels (0: safe, 1: warning)
-    df['temp_label'] = (df['temperature'] > 85).astype(int)
-    df['voltage_label'] = ((df['voltage'] < 10) | (df['voltage'] > 14)).astype(int)
-    df['current_label'] = (df['current'] > 13).astype(int)
-    df['usage_label'] = (df['cpu_usage'] > 90).astype(int)
-    df['fan_label'] = (df['fan_speed'] < 1500).astype(int)
-    
-    # Define CPU state (0: Normal, 1: Warning, 2: Critical)
-    df['cpu_state'] = 0
-    warning_conditions = df[['temp_label', 'voltage_label', 'current_label', 
-                           'usage_label', 'fan_label']].sum(axis=1)
-    df.loc[warning_conditions >= 1, 'cpu_state'] = 1
-    df.loc[warning_conditions >= 2, 'cpu_state'] = 2
+    # Create sensor labels (0: safe, 1: warning) and CPU state (0: Normal, 1: Warning, 2: Critical)
+    for name, values in label_columns(df).items():
+        df[name] = values.astype(int)
     
     return df
 
+
+def device_profiles(seed_seq, n_devices, drift_per_day=0.1):
+    """
+    Per-device baseline offsets and drift rates.
+
+    Offsets are a fraction of each sensor's spread; drift is in sensor units
+    per day, scaled so a device drifts about `drift_per_day` standard
+    deviations a day in a random direction.
+    """
+    rng = np.random.default_rng(seed_seq)
+    spread = np.where(SENSOR_STDS > 0, SENSOR_STDS, 10.0).astype(np.float32)
+    bias = rng.normal(0, 0.2, (n_devices, len(SENSOR_FIELDS))).astype(np.float32) * spread
+    drift = rng.normal(0, drift_per_day, (n_devices, len(SENSOR_FIELDS))).astype(np.float32) * spread
+    return bias, drift
+
+
+def generate_chunk(rng, bias, drift, first_device, first_step, n_steps, start_ns, interval_s=1.0,
+                   fault_rate=1e-4, fault_duration=60):
+    """
+    Generate one chunk of a fleet's telemetry.
+
+    The chunk covers `n_steps` consecutive time steps for the devices whose
+    profiles are given in `bias`/`drift` (one row each), ordered by time and
+    then device. Faults start independently per device and step with
+    probability `fault_rate` and last a geometric number of steps with mean
+    `fault_duration`; a fault running past the end of the chunk is cut off.
+
+    Returns:
+    dict: column name -> NumPy array
+    """
+    n_devices = len(bias)
+    shape = (n_steps, n_devices)
+    steps = np.arange(first_step, first_step + n_steps, dtype=np.int64)
+
+    elapsed_days = (steps * (interval_s / 86400.0)).astype(np.float32)[:, None, None]
+    values = rng.standard_normal(shape + (len(SENSOR_FIELDS),), dtype=np.float32)
+    values *= SENSOR_STDS
+    values += SENSOR_MEANS + bias + drift * elapsed_days
+    usage = rng.random(shape, dtype=np.float32) * 100 + bias[:, 3] + drift[:, 3] * elapsed_days[:, :, 0]
+    values[..., 3] = np.clip(usage, 0, 100)
+
+    # Fault windows: +1 at onset and -1 at the end per (type, device), then a running sum
+    fault = np.zeros(shape, dtype=np.int8)
+    n_faults = rng.binomial(n_steps * n_devices, fault_rate)
+    if n_faults:
+        onset = rng.integers(0, n_steps, n_faults)
+        device = rng.integers(0, n_devices, n_faults)
+        kind = rng.integers(0, len(FAULT_TYPES), n_faults)
+        end = np.minimum(onset + rng.geometric(1.0 / fault_duration, n_faults), n_steps)
+        active = np.zeros((len(FAULT_TYPES), n_steps + 1, n_devices), dtype=np.int16)
+        np.add.at(active, (kind, onset, device), 1)
+        np.add.at(active, (kind, end, device), -1)
+        active = np.cumsum(active[:, :-1], axis=1, dtype=np.int16) > 0
+        for k, effect in enumerate(FAULT_EFFECTS):
+            values[active[k]] += effect
+            fault[active[k]] = k + 1
+        values[..., 3] = np.clip(values[..., 3], 0, 100)
+
+    # Same correlations as generate_synthetic_data()
+    values[..., 4] += values[..., 0] * 10
+    values[..., 2] += values[..., 3] * 0.05
+
+    columns = {
+        'timestamp': np.repeat(start_ns + (steps * (interval_s * 1e9)).astype(np.int64), n_devices),
+        'device_id': np.tile(np.arange(first_device, first_device + n_devices, dtype=np.int32), n_steps),
+    }
+    values = values.reshape(-1, len(SENSOR_FIELDS))
+    for i, name in enumerate(SENSOR_FIELDS):
+        columns[name] = values[:, i]
+    for name, labels in label_columns(columns).items():
+        columns[name] = labels.astype(np.int8)
+    columns['fault'] = fault.reshape(-1)
+    return columns
+
+
+def write_shard(columns, path, fmt='csv'):
+    """Write one chunk of columns to a CSV or Parquet file"""
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = {name: pa.array(values) for name, values in columns.items()}
+        arrays['timestamp'] = pa.array(columns['timestamp'], type=pa.timestamp('ns', tz='UTC'))
+        pq.write_table(pa.table(arrays), path, compression='zstd')
+    else:
+        frame = pd.DataFrame(columns, copy=False)
+        frame['timestamp'] = np.datetime_as_string(columns['timestamp'].view('M8[ns]'), unit='ms', timezone='UTC')
+        frame.to_csv(path, index=False, float_format='%.4f')
+
+
+def _write_chunk(task):
+    """Generate and write one chunk; returns a small summary so results stay cheap to collect"""
+    rng = np.random.default_rng(task['seed'])
+    columns = generate_chunk(rng, task['bias'], task['drift'], task['first_device'], task['first_step'],
+                             task['n_steps'], task['start_ns'], task['interval_s'], task['fault_rate'],
+                             task['fault_duration'])
+    n = len(columns['timestamp'])
+    shards = {'train': np.ones(n, dtype=bool)}
+    if task['test_fraction'] > 0:
+        is_test = rng.random(n) < task['test_fraction']
+        shards = {'train': ~is_test, 'test': is_test}
+
+    summary = {'rows': n, 'state_counts': np.bincount(columns['cpu_state'], minlength=3),
+               'fault_rows': int(np.count_nonzero(columns['fault']))}
+    for split, mask in shards.items():
+        part = columns if mask.all() else {name: values[mask] for name, values in columns.items()}
+        path = os.path.join(task['output_dir'], split, f"part-{task['index']:06d}.{task['fmt']}")
+        write_shard(part, path, task['fmt'])
+        summary[split] = int(mask.sum())
+    return summary
+
+
+def chunk_layout(n_devices, n_steps, chunk_rows=CHUNK_ROWS):
+    """Split a devices x steps grid into (first_device, n_devices, first_step, n_steps) blocks of ~chunk_rows"""
+    device_block = min(n_devices, chunk_rows)
+    step_block = max(1, chunk_rows // device_block)
+    return [(d, min(device_block, n_devices - d), s, min(step_block, n_steps - s))
+            for s in range(0, n_steps, step_block)
+            for d in range(0, n_devices, device_block)]
+
+
+def generate_fleet(output_dir, n_devices, n_steps, fmt='csv', chunk_rows=CHUNK_ROWS, workers=None, seed=42,
+                   start=None, interval_s=1.0, drift_per_day=0.1, fault_rate=1e-4, fault_duration=60,
+                   test_fraction=0.3):
+    """
+    Generate `n_steps` timestamped readings for each of `n_devices` devices,
+    streamed to train/ (and test/) shards under `output_dir`.
+
+    Every chunk is generated from its own child of one SeedSequence, so the
+    output is identical for a given seed whatever the number of workers.
+    Workers write their own shards and return only summaries, and at most
+    two chunks per worker are queued at once, so memory stays flat no matter
+    how many rows are generated.
+
+    Returns:
+    dict: total rows, rows per split, CPU state counts and rows under a fault
+    """
+    start = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    start_ns = int(start.timestamp() * 1e9)
+    root = np.random.SeedSequence(seed)
+    profile_seed, chunk_seed = root.spawn(2)
+    bias, drift = device_profiles(profile_seed, n_devices, drift_per_day)
+
+    layout = chunk_layout(n_devices, n_steps, chunk_rows)
+    seeds = chunk_seed.spawn(len(layout))
+    splits = ('train', 'test') if test_fraction > 0 else ('train',)
+    for split in splits:
+        os.makedirs(os.path.join(output_dir, split), exist_ok=True)
+
+    def tasks():
+        for index, ((first_device, devices, first_step, steps), child) in enumerate(zip(layout, seeds)):
+            yield {
+                'index': index, 'seed': child, 'output_dir': output_dir, 'fmt': fmt,
+                'bias': bias[first_device:first_device + devices], 'drift': drift[first_device:first_device + devices],
+                'first_device': first_device, 'first_step': first_step, 'n_steps': steps, 'start_ns': start_ns,
+                'interval_s': interval_s, 'fault_rate': fault_rate, 'fault_duration': fault_duration,
+                'test_fraction': test_fraction,
+            }
+
+    totals = {'rows': 0, 'state_counts': np.zeros(3, dtype=np.int64), 'fault_rows': 0, 'chunks': len(layout),
+              **{split: 0 for split in splits}}
+
+    def collect(summary):
+        for key in totals.keys() & summary.keys():
+            totals[key] += summary[key]
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        for task in tasks():
+            collect(_write_chunk(task))
+        return totals
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for task in tasks():
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future.result())
+            pending.add(pool.submit(_write_chunk, task))
+        for future in wait(pending).done:
+            collect(future.result())
+    return totals
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic CPU sensor data")
+    parser.add_argument('--devices', type=int, help="Generate a per-device time series fleet instead of the "
+                                                   "10,000-sample train/test CSVs")
+    parser.add_argument('--steps', type=int, default=1000, help="Readings per device")
+    parser.add_argument('--interval-s', type=float, default=1.0, help="Seconds between a device's readings")
+    parser.add_argument('--output', default='data/fleet')
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--drift-per-day', type=float, default=0.1, help="Sensor drift, standard deviations per day")
+    parser.add_argument('--fault-rate', type=float, default=1e-4, help="Probability a fault starts at a reading")
+    parser.add_argument('--fault-duration', type=float, default=60, help="Mean fault length in readings")
+    parser.add_argument('--test-fraction', type=float, default=0.3)
+    args = parser.parse_args()
+
+    if args.devices:
+        print(f"Generating {args.devices * args.steps:,} readings for {args.devices:,} devices...")
+        totals = generate_fleet(args.output, args.devices, args.steps, args.format, args.chunk_rows, args.workers,
+                                args.seed, interval_s=args.interval_s, drift_per_day=args.drift_per_day,
+                                fault_rate=args.fault_rate, fault_duration=args.fault_duration,
+                                test_fraction=args.test_fraction)
+        print(f"Wrote {totals['chunks']} chunks to {args.output}")
+        print("\nDataset Statistics:")
+        print(f"Total samples: {totals['rows']}")
+        print(f"Training samples: {totals['train']}")
+        if 'test' in totals:
+            print(f"Test samples: {totals['test']}")
+        print(f"Samples during a fault: {totals['fault_rows']}")
+        print("\nCPU State Distribution:")
+        for state, count in enumerate(totals['state_counts']):
+            print(f"{state}    {count}")
+        return
+
     # Create data directory if it doesn't exist
     # os.makedirs('../../data', exist_ok=True)
     
@@ -0,0 +1,217 @@
+from datetime import datetime
+
+import numpy as np
+from dateutil import tz
+
+from inference import CLASS_NAMES
+from serial_protocol import SENSOR_FIELDS
+
+NETWORK_TYPES = ('4G', '5G')
+# 'cache' / 'gate': answered by the prediction cache / change gate without a model call
+BACKENDS = ('remote', 'local', 'cache', 'gate')
+PROBABILITY_COLUMNS = tuple(f'prob_{name.lower()}' for name in CLASS_NAMES)
+
+# One typed array per column; categorical columns hold codes into the tuples above
+HISTORY_COLUMNS = {
+    'timestamp': np.int64,           # UNIX time in nanoseconds
+    **{name: np.float32 for name in SENSOR_FIELDS},
+    **{name: np.float32 for name in PROBABILITY_COLUMNS},
+    'prediction': np.int8,           # index into CLASS_NAMES
+    'latency': np.float32,           # round-trip (or local scoring) latency, ms
+    'amortized_latency': np.float32, # latency / batch_size, ms
+    'batch_size': np.int32,
+    'network_type': np.int8,         # index into NETWORK_TYPES
+    'backend': np.int8,              # index into BACKENDS
+}
+CATEGORICAL_COLUMNS = {
+    'prediction': CLASS_NAMES,
+    'network_type': NETWORK_TYPES,
+    'backend': BACKENDS,
+}
+
+# Packed fixed-width record with the same fields, used for on-disk storage
+RECORD_DTYPE = np.dtype(list(HISTORY_COLUMNS.items()))
+
+# The system timezone with its DST rules (TZ, else /etc/localtime)
+LOCAL_TIMEZONE = tz.gettz() or tz.tzlocal()
+DAY_NS = 86_400 * 1_000_000_000
+
+
+def _offset_ns(timestamp):
+    offset = datetime.fromtimestamp(timestamp // 1_000_000_000, LOCAL_TIMEZONE).utcoffset()
+    return int(offset.total_seconds()) * 1_000_000_000
+
+
+def local_offsets_ns(timestamps):
+    """Offset that turns each UNIX-ns timestamp into local wall-clock ns, following DST changes"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not len(timestamps):
+        return np.zeros(0, dtype=np.int64)
+    first, last = int(timestamps.min()), int(timestamps.max())
+    if last - first < DAY_NS:
+        # Offsets change at most once a day, so equal ends mean no change in between
+        offset = _offset_ns(first)
+        if offset == _offset_ns(last):
+            return np.full(len(timestamps), offset, dtype=np.int64)
+    import pandas as pd
+
+    utc = pd.DatetimeIndex(timestamps.view('M8[ns]'))
+    return utc.tz_localize('UTC').tz_convert(LOCAL_TIMEZONE).tz_localize(None).asi8 - utc.asi8
+
+
+def from_local_ns(wall):
+    """
+    UNIX ns for local wall-clock ns. Repeated times when clocks go back are
+    resolved by their order where possible (else as the first, DST, pass),
+    and skipped times when they go forward are moved past the gap.
+    """
+    import pandas as pd
+
+    local = pd.DatetimeIndex(np.asarray(wall, dtype=np.int64).view('M8[ns]'))
+    try:
+        utc = local.tz_localize(LOCAL_TIMEZONE, ambiguous='infer', nonexistent='shift_forward')
+    except ValueError:
+        utc = local.tz_localize(LOCAL_TIMEZONE, ambiguous=np.ones(len(local), dtype=bool),
+                                nonexistent='shift_forward')
+    return utc.tz_convert('UTC').tz_localize(None).asi8
+
+
+def columns_to_frame(columns):
+    """
+    Build a DataFrame from a mapping of history columns (dict of arrays or a
+    RECORD_DTYPE array). Timestamps become tz-aware local datetimes and coded
+    columns become Categoricals; numeric arrays are used without copying.
+    """
+    import pandas as pd
+
+    data = {}
+    for name in HISTORY_COLUMNS:
+        values = columns[name]
+        if name == 'timestamp':
+            values = pd.DatetimeIndex(values.view('M8[ns]')).tz_localize('UTC').tz_convert(LOCAL_TIMEZONE)
+        elif name in CATEGORICAL_COLUMNS:
+            values = pd.Categorical.from_codes(values, categories=CATEGORICAL_COLUMNS[name])
+        data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+
+class HistoryStore:
+    """
+    Bounded, columnar history of predictions.
+
+    Each column is a preallocated NumPy array. Live rows always sit in one
+    contiguous slice `[start, end)`, so column reads and DataFrame views are
+    zero-copy. Capacity doubles until it reaches twice the retention cap; after
+    that, a full buffer is compacted by moving the newest `retention` rows to
+    the front, which keeps appends amortized O(1) while memory stays bounded.
+    """
+
+    def __init__(self, retention=100_000, initial_capacity=1024):
+        self.retention = retention
+        capacity = min(initial_capacity, 2 * retention)
+        self._columns = {name: np.zeros(capacity, dtype) for name, dtype in HISTORY_COLUMNS.items()}
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _reserve(self, n):
+        """Make room for `n` more rows at the end of the buffers"""
+        capacity = len(self._columns['timestamp'])
+        if self._end + n <= capacity:
+            return
+
+        keep = min(len(self), self.retention)
+        needed = keep + n
+        if capacity < 2 * self.retention:
+            new_capacity = max(min(2 * capacity, 2 * self.retention), needed)
+        else:
+            new_capacity = capacity  # at the ceiling: compact in place
+
+        src = slice(self._end - keep, self._end)
+        for name, column in self._columns.items():
+            if new_capacity != capacity:
+                resized = np.zeros(new_capacity, column.dtype)
+                resized[:keep] = column[src]
+                self._columns[name] = resized
+            else:
+                column[:keep] = column[src]
+        self._start, self._end = 0, keep
+
+    def _trim(self):
+        """Drop the oldest rows beyond the retention cap"""
+        if len(self) > self.retention:
+            self._start = self._end - self.retention
+
+    def append(self, timestamp, sensor_data, probabilities, latency, amortized_latency=None,
+               batch_size=1, network_type='4G', backend='remote'):
+        """Record one prediction; `timestamp` is a datetime or UNIX seconds"""
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        self._reserve(1)
+        i = self._end
+        cols = self._columns
+        cols['timestamp'][i] = int(timestamp * 1e9)
+        for name in SENSOR_FIELDS:
+            cols[name][i] = sensor_data[name]
+        probs = [probabilities[state] for state in CLASS_NAMES]
+        for name, p in zip(PROBABILITY_COLUMNS, probs):
+            cols[name][i] = p
+        cols['prediction'][i] = int(np.argmax(probs))
+        cols['latency'][i] = latency
+        cols['amortized_latency'][i] = latency if amortized_latency is None else amortized_latency
+        cols['batch_size'][i] = batch_size
+        cols['network_type'][i] = NETWORK_TYPES.index(network_type)
+        cols['backend'][i] = BACKENDS.index(backend)
+        self._end += 1
+        self._trim()
+
+    def extend(self, columns):
+        """Bulk-append rows given as a dict of equal-length arrays (codes for categoricals)"""
+        n = len(columns['timestamp'])
+        if n > self.retention:
+            columns = {name: values[-self.retention:] for name, values in columns.items()}
+            n = self.retention
+        self._reserve(n)
+        for name, column in self._columns.items():
+            column[self._end:self._end + n] = columns[name] if name in columns else 0
+        self._end += n
+        self._trim()
+
+    def column(self, name, start=0, stop=None):
+        """Zero-copy view of one column, rows [start, stop) relative to the oldest kept row"""
+        stop = len(self) if stop is None else stop
+        return self._columns[name][self._start + start:self._start + stop]
+
+    def time_slice(self, start_ns=None, end_ns=None):
+        """Row range (start, stop) covering timestamps in [start_ns, end_ns)"""
+        timestamps = self.column('timestamp')
+        start = 0 if start_ns is None else int(np.searchsorted(timestamps, start_ns, 'left'))
+        stop = len(timestamps) if end_ns is None else int(np.searchsorted(timestamps, end_ns, 'left'))
+        return start, stop
+
+    def first_timestamp(self):
+        """Oldest kept timestamp (UNIX ns), or None if empty, as TimeSeriesLog.first_timestamp"""
+        return int(self.column('timestamp')[0]) if len(self) else None
+
+    def last_timestamp(self):
+        """Newest timestamp (UNIX ns), or None if empty"""
+        return int(self.column('timestamp')[-1]) if len(self) else None
+
+    def records(self, start=0, stop=None):
+        """Copy rows [start, stop) into a RECORD_DTYPE array"""
+        stop = len(self) if stop is None else stop
+        out = np.empty(stop - start, dtype=RECORD_DTYPE)
+        for name in HISTORY_COLUMNS:
+            out[name] = self.column(name, start, stop)
+        return out
+
+    def iter_records(self, chunk_rows=65_536):
+        """Yield every kept row as RECORD_DTYPE chunks"""
+        for start in range(0, len(self), chunk_rows):
+            yield self.records(start, min(start + chunk_rows, len(self)))
+
+    def to_frame(self, start=0, stop=None):
+        """DataFrame over rows [start, stop); numeric columns are views of the store's arrays"""
+        return columns_to_frame({name: self.column(name, start, stop) for name in HISTORY_COLUMNS})
@@ -0,0 +1,373 @@
+import io
+import json
+import os
+import queue
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from sensor_states import classify_readings
+
+CLASS_NAMES = ('Normal', 'Warning', 'Critical')
+
+
+# Per-thread scratch buffer for encoding NumPy batches (dispatcher workers encode concurrently)
+_csv_buffers = threading.local()
+
+
+def encode_csv_rows(rows):
+    """
+    Encode a sequence of feature rows as a multi-row CSV body.
+
+    A 2-D NumPy array is formatted by np.savetxt into a reused buffer, with
+    enough digits to round-trip float32 exactly; other sequences (the live
+    single-row path) are joined directly.
+    """
+    if isinstance(rows, np.ndarray) and rows.ndim == 2:
+        buffer = getattr(_csv_buffers, 'buffer', None)
+        if buffer is None:
+            buffer = _csv_buffers.buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+        np.savetxt(buffer, rows, fmt='%.9g', delimiter=',')
+        return buffer.getvalue()[:-1].decode()   # without the trailing newline
+    return '\n'.join(','.join(map(str, row)) for row in rows)
+
+
+def parse_probabilities(body, n_rows):
+    """
+    Parse an endpoint response into an (n_rows, n_classes) probability array.
+
+    Handles the JSON format ({"predictions": [{"score": [...]}, ...]}) used by
+    the notebook's predictor as well as CSV output, one row per line or flat.
+    """
+    text = body.strip()
+    if text.startswith('{'):
+        scores = [p['score'] for p in json.loads(text)['predictions']]
+        return np.asarray(scores, dtype=np.float64).reshape(n_rows, -1)
+
+    values = text.replace('[', '').replace(']', '').replace('\n', ',').split(',')
+    return np.array([float(v) for v in values if v.strip()]).reshape(n_rows, -1)
+
+
+def format_result(probabilities):
+    """Turn one probability row into the prediction dict used by the dashboard"""
+    return {
+        'probabilities': dict(zip(CLASS_NAMES, map(float, probabilities))),
+        'prediction': CLASS_NAMES[int(np.argmax(probabilities))],
+    }
+
+
+class RemoteBackend:
+    """Scores rows on the deployed SageMaker endpoint"""
+
+    name = 'remote'
+
+    def __init__(self, client, endpoint_name):
+        self.client = client
+        self.endpoint_name = endpoint_name
+
+    def predict_batch(self, rows, timings=None):
+        """
+        Return (probabilities array, round-trip latency in ms) for a batch of rows.
+        A `timings` dict receives the serialize/network/response_parse durations in ns.
+        """
+        start = time.perf_counter_ns()
+        body = encode_csv_rows(rows)
+        sent = time.perf_counter_ns()
+        response = self.client.invoke_endpoint(
+            EndpointName=self.endpoint_name,
+            ContentType='text/csv',
+            Body=body
+        )
+        payload = response['Body'].read().decode()
+        received = time.perf_counter_ns()
+        probabilities = parse_probabilities(payload, len(rows))
+        if timings is not None:
+            timings.update(serialize=sent - start, network=received - sent,
+                           response_parse=time.perf_counter_ns() - received)
+        return probabilities, (received - sent) / 1e6
+
+
+class PredictorBackend:
+    """
+    Scores rows through a SageMaker Python SDK Predictor, such as the one the
+    notebook gets from `xgb.deploy()` (CSV serializer, JSON or CSV deserializer)
+    """
+
+    name = 'remote'
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def predict_batch(self, rows, timings=None):
+        """Return (probabilities array, round-trip latency in ms) for a batch of rows"""
+        start = time.perf_counter_ns()
+        body = encode_csv_rows(rows)
+        sent = time.perf_counter_ns()
+        result = self.predictor.predict(body)   # the SDK also deserializes the response
+        received = time.perf_counter_ns()
+        if isinstance(result, dict):
+            scores = [p['score'] for p in result['predictions']]
+            probabilities = np.asarray(scores, dtype=np.float64).reshape(len(rows), -1)
+        elif isinstance(result, (list, tuple)):
+            probabilities = np.asarray(result, dtype=np.float64).reshape(len(rows), -1)
+        else:
+            if isinstance(result, bytes):
+                result = result.decode()
+            probabilities = parse_probabilities(result, len(rows))
+        if timings is not None:
+            timings.update(serialize=sent - start, network=received - sent,
+                           response_parse=time.perf_counter_ns() - received)
+        return probabilities, (received - sent) / 1e6
+
+
+class LocalBackend:
+    """
+    Scores rows in-process with the trained XGBoost booster.
+
+    `model_path` is either the SageMaker training artifact (model.tar.gz,
+    containing `xgboost-model`) or a booster file saved with `save_model`.
+    """
+
+    name = 'local'
+
+    def __init__(self, model_path):
+        import xgboost as xgb
+
+        self.model_path = model_path
+        self.booster = xgb.Booster()
+        if tarfile.is_tarfile(model_path):
+            with tarfile.open(model_path) as archive, tempfile.TemporaryDirectory() as tmp:
+                archive.extract('xgboost-model', tmp)
+                self.booster.load_model(os.path.join(tmp, 'xgboost-model'))
+        else:
+            self.booster.load_model(model_path)
+
+    def predict_batch(self, rows, timings=None):
+        """Return (probabilities array, inference latency in ms) for a batch of rows"""
+        start = time.perf_counter_ns()
+        features = np.asarray(rows, dtype=np.float32)
+        converted = time.perf_counter_ns()
+        probabilities = self.booster.inplace_predict(features)
+        scored = time.perf_counter_ns()
+        if timings is not None:
+            timings.update(serialize=converted - start, inference=scored - converted)
+        return np.asarray(probabilities).reshape(len(features), -1), (scored - converted) / 1e6
+
+
+def predict_rows(backend, rows):
+    """Score a batch of rows on `backend` and return one result dict per row"""
+    timings = {}
+    probabilities, latency = backend.predict_batch(rows, timings)
+    results = []
+    for row_probs in probabilities:
+        result = format_result(row_probs)
+        result.update({
+            'latency': latency,
+            'amortized_latency': latency / len(rows),
+            'batch_size': len(rows),
+            'backend': backend.name,
+            'timings': timings,   # per-stage ns for the whole batch, shared by its rows
+        })
+        results.append(result)
+    return results
+
+
+def make_features(values, pipeline=None, states=None):
+    """
+    Model input row for one reading (five values in SENSOR_FIELDS order):
+    the fitted FeaturePipeline's features, or without one the legacy ten
+    values (readings plus their Normal/Warning/Critical states, computed
+    unless given as `states`)
+    """
+    if pipeline is not None:
+        return pipeline.transform_one(values)
+    return list(values) + (classify_readings(values).tolist() if states is None else list(states))
+
+
+def predict_reading(values, predict, pipeline=None, cache=None, model_tag=None, instrumentation=None,
+                    network='all'):
+    """
+    The live prediction path for one reading, shared by the dashboard and benchmarks.
+
+    Parameters:
+    values (list): five readings in SENSOR_FIELDS order
+    predict (callable): feature row -> result dict (e.g. BatchingPredictor.predict)
+    pipeline (FeaturePipeline): fitted features, or None for the legacy ten values
+    cache (PredictionCache): optional; hits skip `predict` and report backend 'cache'
+    instrumentation (Instrumentation): optional; receives the per-row features/prediction timings under
+        `network`. The batch stages (serialize, network, ...) are recorded once per batch by the
+        predictor, so bind `route` on its predict to label them
+
+    Returns:
+    dict: input_data, probabilities, prediction, latency, amortized_latency, batch_size, backend
+    """
+    start = time.perf_counter_ns()
+    features = make_features(values, pipeline)
+    csv_data = ','.join(map(str, features))
+    built = time.perf_counter_ns()
+    if instrumentation is not None:
+        instrumentation.record('features', built - start, network)
+
+    # Readings that quantize to a recently scored vector reuse its prediction
+    if cache is not None:
+        cached = cache.get(values, model_tag)
+        if cached is not None:
+            lookup_latency = (time.perf_counter_ns() - built) / 1e6
+            return {
+                'input_data': csv_data,
+                'probabilities': cached['probabilities'],
+                'prediction': cached['prediction'],
+                'latency': lookup_latency,
+                'amortized_latency': lookup_latency,
+                'batch_size': 1,
+                'backend': 'cache'
+            }
+
+    result = predict(features)
+    prediction = {
+        'input_data': csv_data,
+        'probabilities': result['probabilities'],
+        'prediction': result['prediction'],
+        'latency': result['latency'],
+        'amortized_latency': result['amortized_latency'],
+        'batch_size': result['batch_size'],
+        'backend': result['backend']
+    }
+    if instrumentation is not None:
+        instrumentation.record('prediction', time.perf_counter_ns() - start, network)
+    if cache is not None:
+        cache.put(values, model_tag, prediction)
+    return prediction
+
+
+class BatchingPredictor:
+    """
+    Micro-batches single-row predictions into multi-row endpoint requests.
+
+    Callers submit one feature row and get a Future back. A worker thread
+    collects rows until `max_batch_size` rows are queued or `max_wait_ms` has
+    passed since the first one arrived, scores them with a single
+    `backend.predict_batch` call and resolves every caller's future with its
+    own probabilities plus the batch latency. With a `dispatcher`, batches are
+    handed to it instead so several can be in flight at once.
+
+    With `instrumentation`, a scored batch's stage timings are recorded once
+    per batch under the `route` its rows were submitted with (once per
+    distinct route in a mixed batch); rows submitted without a route are
+    not recorded.
+    """
+
+    def __init__(self, backend, max_batch_size=16, max_wait_ms=20, dispatcher=None, instrumentation=None):
+        self.backend = backend
+        self.dispatcher = dispatcher
+        self.instrumentation = instrumentation
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000)
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._submit_lock = threading.Lock()   # no row can be queued after close() lets the worker exit
+        self._worker = threading.Thread(target=self._run, name='batching-predictor', daemon=True)
+        self._worker.start()
+
+    def submit(self, features, route=None):
+        """Queue one feature row for prediction and return a Future"""
+        future = Future()
+        with self._submit_lock:
+            if self._closed.is_set():
+                raise RuntimeError("BatchingPredictor is closed")
+            self._queue.put((features, future, route))
+        return future
+
+    def predict(self, features, timeout=None, route=None):
+        """Blocking single-row prediction"""
+        return self.submit(features, route).result(timeout)
+
+    def close(self, timeout=None):
+        """Flush queued rows and stop the worker"""
+        with self._submit_lock:
+            self._closed.set()
+        self._worker.join(timeout)
+
+    def _collect(self):
+        """Block for the first row, then gather more until the batch is full or the window closes"""
+        while True:
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+                break
+            except queue.Empty:
+                if self._closed.is_set():
+                    return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            # Skip rows whose callers already cancelled
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            rows = [features for features, _, _ in batch]
+            futures = [future for _, future, _ in batch]
+            routes = {route for _, _, route in batch if route is not None}
+
+            if self.dispatcher is not None:
+                # Blocks while the dispatcher is saturated, which backs up our queue
+                try:
+                    batch_future = self.dispatcher.submit(rows)
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+                batch_future.add_done_callback(
+                    lambda f, futures=futures, routes=routes: self._resolve(futures, routes, f))
+                continue
+
+            try:
+                results = predict_rows(self.backend, rows)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self._record(routes, results)
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def _resolve(self, futures, routes, batch_future):
+        """Fan a finished batch future out to the per-row futures"""
+        exc = batch_future.exception()
+        if exc is not None:
+            for future in futures:
+                future.set_exception(exc)
+            return
+        results = batch_future.result()
+        self._record(routes, results)
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+    def _record(self, routes, results):
+        """One sample per batch stage; the timings dict is shared by every row of the batch"""
+        if self.instrumentation is None or not results:
+            return
+        for route in routes:
+            for stage, duration in results[0].get('timings', {}).items():
+                self.instrumentation.record(stage, duration, route)
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Pipeline stages, in the order a reading passes through them
+STAGES = ('serial_read', 'parse', 'features', 'serialize', 'network', 'response_parse', 'inference',
+          'prediction', 'render')
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory log-linear histogram of nanosecond durations (HDR-style).
+
+    Values below 2**(sub_bucket_bits + 1) ns are counted exactly; above that
+    every power-of-two range is split into 2**sub_bucket_bits equal buckets,
+    so any recorded value is reported to within 1 / 2**sub_bucket_bits
+    (0.8% with the default 7 bits). Memory is one int64 per bucket, about
+    30 KB for the default 0..60 s range, however many values are recorded.
+    """
+
+    def __init__(self, highest_ns=60_000_000_000, sub_bucket_bits=7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self._sub_buckets = 1 << sub_bucket_bits
+        self.highest_ns = highest_ns
+        self.counts = np.zeros(self._index(highest_ns) + 1, dtype=np.int64)
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def _index(self, value):
+        shift = value.bit_length() - self.sub_bucket_bits - 1
+        if shift <= 0:
+            return value
+        return shift * self._sub_buckets + (value >> shift)
+
+    def _value_at(self, index):
+        """Highest value that lands in bucket `index`"""
+        if index < 2 * self._sub_buckets:
+            return index
+        shift = index // self._sub_buckets - 1
+        return ((index - shift * self._sub_buckets + 1) << shift) - 1
+
+    def record(self, value_ns):
+        value_ns = min(max(int(value_ns), 0), self.highest_ns)
+        self.counts[self._index(value_ns)] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        self.min_ns = value_ns if self.min_ns is None else min(self.min_ns, value_ns)
+        self.max_ns = value_ns if self.max_ns is None else max(self.max_ns, value_ns)
+
+    def record_many(self, values_ns):
+        """Vectorized `record` for an array of durations"""
+        values = np.clip(np.asarray(values_ns, dtype=np.int64), 0, self.highest_ns)
+        if not len(values):
+            return
+        # frexp's exponent is the bit length for integers below 2**53
+        shift = np.frexp(values.astype(np.float64))[1] - self.sub_bucket_bits - 1
+        shift = np.maximum(shift, 0)
+        index = np.where(shift > 0, shift * self._sub_buckets + (values >> shift), values)
+        self.counts += np.bincount(index, minlength=len(self.counts))
+        self.count += len(values)
+        self.total_ns += int(values.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min_ns = low if self.min_ns is None else min(self.min_ns, low)
+        self.max_ns = high if self.max_ns is None else max(self.max_ns, high)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.count += other.count
+        self.total_ns += other.total_ns
+        for bound, pick in (('min_ns', min), ('max_ns', max)):
+            values = [v for v in (getattr(self, bound), getattr(other, bound)) if v is not None]
+            setattr(self, bound, pick(values) if values else None)
+
+    def percentile(self, q):
+        """Duration (ns) at or below which `q` percent of recorded values fall"""
+        if not self.count:
+            return None
+        rank = max(1, int(np.ceil(q / 100 * self.count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._value_at(index), self.max_ns)
+
+    @property
+    def mean_ns(self):
+        return self.total_ns / self.count if self.count else None
+
+    def summary(self, percentiles=PERCENTILES):
+        """Count plus mean/min/max/percentiles in milliseconds"""
+        to_ms = lambda ns: None if ns is None else ns / 1e6
+        summary = {'count': self.count, 'mean_ms': to_ms(self.mean_ns), 'min_ms': to_ms(self.min_ns),
+                   'max_ms': to_ms(self.max_ns)}
+        for q in percentiles:
+            summary[f'p{q:g}_ms'.replace('.', '_')] = to_ms(self.percentile(q))
+        return summary
+
+
+class Instrumentation:
+    """
+    Per-stage, per-network latency histograms for the prediction pipeline.
+
+    Durations are measured with time.perf_counter_ns and recorded under a
+    (stage, network) pair; `span` times a block. Exports a summary table,
+    JSON and the Prometheus text format.
+    """
+
+    def __init__(self, highest_ns=60_000_000_000):
+        self.highest_ns = highest_ns
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration_ns, network='all'):
+        with self._lock:
+            histogram = self._histograms.get((stage, network))
+            if histogram is None:
+                histogram = self._histograms[(stage, network)] = LatencyHistogram(self.highest_ns)
+            histogram.record(duration_ns)
+
+    @contextmanager
+    def span(self, stage, network='all'):
+        """Time the enclosed block as one `stage` duration"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter_ns() - start, network)
+
+    def histogram(self, stage, network='all'):
+        return self._histograms.get((stage, network))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def summary(self):
+        """One dict per (stage, network), in STAGES order"""
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        with self._lock:
+            keys = sorted(self._histograms, key=lambda key: (order.get(key[0], len(order)), key))
+            return [{'stage': stage, 'network': network, **self._histograms[(stage, network)].summary()}
+                    for stage, network in keys]
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self, metric='pipeline_stage_duration_seconds'):
+        """Prometheus text exposition format, one summary per stage and network"""
+        lines = [f'# HELP {metric} Time spent in each prediction pipeline stage',
+                 f'# TYPE {metric} summary']
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (stage, network), histogram in items:
+                labels = f'stage="{stage}",network="{network}"'
+                for q in PERCENTILES:
+                    lines.append(f'{metric}{{{labels},quantile="{q / 100:g}"}} {histogram.percentile(q) / 1e9:.9f}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.total_ns / 1e9:.9f}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
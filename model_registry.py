@@ -0,0 +1,382 @@
+import json
+import os
+import threading
+import time
+
+from dispatcher import InferenceDispatcher
+from inference import BatchingPredictor, LocalBackend, RemoteBackend
+from instrumentation import LatencyHistogram
+
+REGISTRY_FILE = 'model_registry.json'
+WATCH_INTERVAL_S = 2.0
+MAX_SHADOW_PENDING = 256   # shadow rows outstanding before more are skipped
+
+
+def spec_name(spec):
+    """Endpoint name or model path of a spec ({'endpoint': name} or {'model': path})"""
+    return spec.get('endpoint') or spec['model']
+
+
+def load_specs(path=REGISTRY_FILE):
+    """
+    The registry file: {"active": spec, "candidate": spec or null, "shadow_fraction": float}.
+    The notebook rewrites "active" after a redeploy.
+    """
+    with open(path) as f:
+        entry = json.load(f)
+    for key in ('active', 'candidate'):
+        spec = entry.get(key)
+        if spec is not None and ('endpoint' in spec) == ('model' in spec):
+            raise ValueError(f"{path}: '{key}' needs exactly one of 'endpoint' or 'model'")
+    if entry.get('active') is None:
+        raise ValueError(f"{path}: no active model")
+    return entry
+
+
+class ModelVersion:
+    """
+    One deployed model: its backend and the batching predictor (and, for
+    endpoints, the dispatcher) that feed it. Each version has its own, so
+    retiring one drains exactly the rows that were sent to it.
+    """
+
+    def __init__(self, spec, backend, max_batch_size=16, max_wait_ms=20, max_in_flight=8, instrumentation=None):
+        self.spec = dict(spec)
+        self.name = spec_name(spec)
+        self.kind = backend.name
+        self.backend = backend
+        self.loaded_at = time.time()
+        version = os.path.getmtime(self.name) if self.kind == 'local' and os.path.exists(self.name) else None
+        self.tag = (self.kind, self.name, version)   # prediction cache key component
+        self.dispatcher = None
+        if self.kind == 'local':
+            max_wait_ms = 0   # in-process scoring gains nothing from waiting for more rows
+        else:
+            self.dispatcher = InferenceDispatcher(backend, max_in_flight=max_in_flight)
+        self.predictor = BatchingPredictor(backend, max_batch_size, max_wait_ms, dispatcher=self.dispatcher,
+                                           instrumentation=instrumentation)
+
+    def submit(self, features, route=None):
+        return self.predictor.submit(features, route)
+
+    def close(self):
+        """Score every row already queued or in flight, then release the workers"""
+        self.predictor.close()
+        if self.dispatcher is not None:
+            self.dispatcher.close(wait=True)
+
+    def describe(self):
+        return {'kind': self.kind, 'name': self.name, 'spec': self.spec, 'loaded_at': self.loaded_at}
+
+
+class ShadowStats:
+    """Latency and agreement of a candidate model against the active one on the same rows"""
+
+    def __init__(self):
+        self.latency = {'active': LatencyHistogram(), 'candidate': LatencyHistogram()}
+        self.compared = 0
+        self.agreed = 0
+        self.candidate_errors = 0
+        self.skipped = 0   # sampled rows not shadowed because too many were outstanding
+        self._lock = threading.Lock()
+
+    def record(self, active, candidate):
+        """`active`/`candidate`: (future, end-to-end ns) of the same row on each model"""
+        (active_future, active_ns), (candidate_future, candidate_ns) = active, candidate
+        with self._lock:
+            if candidate_future.exception() is not None:
+                self.candidate_errors += 1
+                return
+            if active_future.exception() is not None:
+                return
+            self.latency['active'].record(active_ns)
+            self.latency['candidate'].record(candidate_ns)
+            self.compared += 1
+            self.agreed += active_future.result()['prediction'] == candidate_future.result()['prediction']
+
+    def summary(self):
+        with self._lock:
+            return {
+                'compared': self.compared,
+                'agreement': self.agreed / self.compared if self.compared else None,
+                'candidate_errors': self.candidate_errors,
+                'skipped': self.skipped,
+                'latency': {side: histogram.summary() for side, histogram in self.latency.items()},
+            }
+
+
+class ModelRegistry:
+    """
+    The model answering predictions, swappable at runtime.
+
+    Drop-in for a BatchingPredictor (`submit`/`predict`/`close`). The active
+    version can be replaced with `activate`: the new version is built (and,
+    with a `probe` row, asked for one prediction) before it takes traffic,
+    the switch happens under the lock every submit takes, and the old
+    version finishes its queued and in-flight rows in the background, so no
+    reading is dropped or scored twice. With a candidate set by `shadow`,
+    `shadow_fraction` of rows are also scored by the candidate on its own
+    predictor; callers only ever see the active model's answer, and
+    ShadowStats compares the two. Shadow rows beyond `max_shadow_pending`
+    are skipped rather than queued, so a slow candidate can't hold up
+    live traffic. With a `path`, changes are saved to the registry file and
+    `watch` picks up edits to it (e.g. a redeploy from the notebook).
+
+    Parameters:
+    active (dict): {'endpoint': name} or {'model': path}
+    client_factory (callable): returns the SageMaker runtime client, called when an endpoint is first needed
+    probe (list): feature row used to check a new version answers before it takes traffic, or None
+    instrumentation (Instrumentation): optional; receives the active model's batch stage timings under
+        the `route` rows are submitted with
+    """
+
+    def __init__(self, active, client_factory=None, max_batch_size=16, max_wait_ms=20, max_in_flight=8,
+                 probe=None, path=None, max_shadow_pending=MAX_SHADOW_PENDING, instrumentation=None):
+        self.client_factory = client_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_in_flight = max_in_flight
+        self.probe = probe
+        self.path = path
+        self.max_shadow_pending = max_shadow_pending
+        self.instrumentation = instrumentation
+        self.candidate = None
+        self.shadow_fraction = 0.0
+        self.shadow_stats = ShadowStats()
+        self.draining = []   # retired versions still finishing their rows
+        self.swaps = 0
+        self.error = None    # last error raised while reloading the registry file
+        self._client = None
+        self._credit = 0.0
+        self._shadow_pending = 0
+        self._lock = threading.Lock()
+        self._file_mtime = None
+        self._watcher = None
+        self._stop_event = threading.Event()
+        self.active = self._build(active)
+
+    @classmethod
+    def from_file(cls, path=REGISTRY_FILE, default=None, **options):
+        """Registry for the specs in `path`, or for `default` until that file is written"""
+        entry = load_specs(path) if os.path.exists(path) else {'active': default}
+        registry = cls(entry['active'], path=path, **options)
+        if entry.get('candidate'):
+            registry.shadow(entry['candidate'], entry.get('shadow_fraction', 0.0), save=False)
+        registry._file_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        return registry
+
+    def _build(self, spec):
+        if 'model' in spec:
+            backend = LocalBackend(spec['model'])
+        else:
+            if self._client is None:
+                self._client = self.client_factory()
+            backend = RemoteBackend(self._client, spec['endpoint'])
+        return ModelVersion(spec, backend, self.max_batch_size, self.max_wait_ms, self.max_in_flight,
+                            self.instrumentation)
+
+    def _build_checked(self, spec):
+        """Build a version for a rollout, making sure it answers the probe row first"""
+        version = self._build(spec)
+        if self.probe is not None:
+            try:
+                version.predictor.predict(self.probe, timeout=30)
+            except Exception:
+                version.close()
+                raise
+        return version
+
+    # Prediction path
+
+    def submit(self, features, route=None):
+        """Queue one feature row on the active model (and maybe the candidate); returns the active Future"""
+        start = time.perf_counter_ns()
+        with self._lock:
+            future = self.active.submit(features, route)
+            candidate = self.candidate
+            if candidate is not None:
+                self._credit += self.shadow_fraction
+                if self._credit >= 1.0:
+                    self._credit -= 1.0
+                    if self._shadow_pending >= self.max_shadow_pending:
+                        self.shadow_stats.skipped += 1
+                        candidate = None
+                    else:
+                        self._shadow_pending += 1
+                        shadow_future = candidate.submit(features)
+                else:
+                    candidate = None
+        if candidate is not None:
+            self._compare(start, future, shadow_future)
+        return future
+
+    def predict(self, features, timeout=None, route=None):
+        """Blocking single-row prediction on the active model"""
+        return self.submit(features, route).result(timeout)
+
+    def _compare(self, start, future, shadow_future):
+        done = {}
+        lock = threading.Lock()
+        stats = self.shadow_stats
+
+        def finished(side, f):
+            elapsed = time.perf_counter_ns() - start
+            with lock:
+                done[side] = (f, elapsed)
+                complete = len(done) == 2
+            if side == 'candidate':
+                with self._lock:
+                    self._shadow_pending -= 1
+            if complete:
+                stats.record(done['active'], done['candidate'])
+
+        future.add_done_callback(lambda f: finished('active', f))
+        shadow_future.add_done_callback(lambda f: finished('candidate', f))
+
+    # Rollout
+
+    def activate(self, spec, save=True):
+        """Build `spec` and make it the active version; the old one drains in the background"""
+        version = self._build_checked(spec)
+        with self._lock:
+            old, self.active = self.active, version
+            self.swaps += 1
+        self._retire(old)
+        if save:
+            self.save()
+        return version
+
+    def shadow(self, spec, fraction, save=True):
+        """Score `fraction` (0..1) of rows on a candidate built from `spec` as well, for comparison"""
+        version = self._build_checked(spec)
+        with self._lock:
+            old, self.candidate = self.candidate, version
+            self.shadow_fraction = min(max(float(fraction), 0.0), 1.0)
+            self.shadow_stats = ShadowStats()
+            self._credit = 0.0
+        if old is not None:
+            self._retire(old)
+        if save:
+            self.save()
+        return version
+
+    def stop_shadow(self, save=True):
+        with self._lock:
+            old, self.candidate = self.candidate, None
+            self.shadow_fraction = 0.0
+        if old is not None:
+            self._retire(old)
+        if save:
+            self.save()
+
+    def promote(self, save=True):
+        """Make the shadowed candidate the active version, without rebuilding it"""
+        with self._lock:
+            if self.candidate is None:
+                raise RuntimeError("No candidate model to promote")
+            old, self.active, self.candidate = self.active, self.candidate, None
+            self.shadow_fraction = 0.0
+            self.swaps += 1
+        self._retire(old)
+        if save:
+            self.save()
+
+    def set_batching(self, max_batch_size, max_wait_ms):
+        """Apply new batching settings to the live predictors and future versions"""
+        self.max_batch_size, self.max_wait_ms = max_batch_size, max_wait_ms
+        with self._lock:
+            versions = [v for v in (self.active, self.candidate) if v is not None]
+        for version in versions:
+            version.predictor.max_batch_size = max(1, int(max_batch_size))
+            if version.kind != 'local':
+                version.predictor.max_wait = max(0.0, max_wait_ms / 1000)
+
+    def _retire(self, version):
+        with self._lock:
+            self.draining.append(version)
+
+        def drain():
+            version.close()
+            with self._lock:
+                self.draining.remove(version)
+
+        threading.Thread(target=drain, name='model-drain', daemon=True).start()
+
+    def status(self):
+        with self._lock:
+            active, candidate = self.active, self.candidate
+            status = {
+                'active': active.describe(),
+                'candidate': candidate.describe() if candidate is not None else None,
+                'shadow_fraction': self.shadow_fraction,
+                'draining': [v.describe() for v in self.draining],
+                'swaps': self.swaps,
+                'last_error': None if self.error is None else str(self.error),
+            }
+        if candidate is not None:
+            status['shadow'] = self.shadow_stats.summary()
+        return status
+
+    # Registry file
+
+    def save(self):
+        """Write the current specs to the registry file (atomically), if there is one"""
+        if self.path is None:
+            return
+        with self._lock:
+            entry = {'active': self.active.spec,
+                     'candidate': self.candidate.spec if self.candidate is not None else None,
+                     'shadow_fraction': self.shadow_fraction}
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp, self.path)
+        self._file_mtime = os.path.getmtime(self.path)
+
+    def reload(self):
+        """
+        Apply the registry file if it changed since it was last read or
+        written; returns whether it did. The file only counts as read once
+        it has been applied, so a rollout that fails is retried on the next
+        call.
+        """
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime is None or mtime == self._file_mtime:
+            return False
+        entry = load_specs(self.path)
+        if entry['active'] != self.active.spec:
+            self.activate(entry['active'], save=False)
+        candidate = entry.get('candidate')
+        if candidate is None:
+            if self.candidate is not None:
+                self.stop_shadow(save=False)
+        elif self.candidate is None or candidate != self.candidate.spec:
+            self.shadow(candidate, entry.get('shadow_fraction', 0.0), save=False)
+        else:
+            self.shadow_fraction = min(max(float(entry.get('shadow_fraction', 0.0)), 0.0), 1.0)
+        self._file_mtime = mtime
+        return True
+
+    def watch(self, interval_s=WATCH_INTERVAL_S):
+        """Poll the registry file from a background thread and apply changes as they appear"""
+        def run():
+            while not self._stop_event.wait(interval_s):
+                try:
+                    # The last error stays visible until a change is actually applied
+                    if self.reload():
+                        self.error = None
+                except Exception as e:
+                    self.error = e
+
+        if self._watcher is None and self.path is not None:
+            self._watcher = threading.Thread(target=run, name='model-registry-watch', daemon=True)
+            self._watcher.start()
+        return self
+
+    def close(self):
+        """Stop watching and drain every version"""
+        self._stop_event.set()
+        with self._lock:
+            versions = [v for v in (self.active, self.candidate) if v is not None]
+        for version in versions:
+            version.close()
@@ -0,0 +1,130 @@
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+from aggregation import WINDOW_DTYPE
+from history_store import RECORD_DTYPE, HistoryStore
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+PAGE_ROWS = 100_000   # matches the service's HISTORY_LIMIT
+
+
+class MonitorClient:
+    """Thin client for the monitor_service.py query API"""
+
+    def __init__(self, url=DEFAULT_URL, timeout=5.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _get(self, endpoint, headers=False, **params):
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        try:
+            with urllib.request.urlopen(f'{self.url}/{endpoint}?{query}', timeout=self.timeout) as response:
+                return (response.read(), response.headers) if headers else response.read()
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())['error']
+            except (ValueError, KeyError):
+                message = e.reason
+            raise RuntimeError(f"Monitor service /{endpoint}: {message}") from e
+
+    def _json(self, endpoint, **params):
+        return json.loads(self._get(endpoint, **params))
+
+    def health(self):
+        return self._json('health')
+
+    def devices(self):
+        return self._json('devices')
+
+    def readings(self, device, since=0):
+        """Raw readings after ring-buffer cursor `since`: (N x 6 array of timestamp + sensors, next cursor, lost)"""
+        reply = self._json('readings', device=device, since=since)
+        rows = np.asarray(reply['rows'], dtype=np.float64).reshape(-1, len(reply['columns']))
+        return rows, reply['cursor'], reply['lost']
+
+    def history(self, device, since_ns=None, skip=None, start_ns=None, end_ns=None, limit=None):
+        """
+        Prediction records as a RECORD_DTYPE array, oldest first. `since_ns`
+        is inclusive; `skip` leaves out that many records from it.
+        """
+        body = self._get('history', device=device, since_ns=since_ns, skip=skip, start_ns=start_ns, end_ns=end_ns,
+                         limit=limit)
+        return np.frombuffer(body, dtype=RECORD_DTYPE)
+
+    def latency(self, device=None):
+        return self._json('latency', device=device)
+
+    def aggregates(self, device, start_ns=None, end_ns=None, max_points=None):
+        """
+        (resolution_s, WINDOW_DTYPE array) summarizing the range in at most
+        `max_points` windows, or (None, None) if its raw records fit
+        """
+        body, headers = self._get('aggregates', headers=True, device=device, start_ns=start_ns, end_ns=end_ns,
+                                  max_points=max_points)
+        resolution = headers.get('X-Resolution-S', 'raw')
+        if resolution == 'raw':
+            return None, None
+        return int(resolution), np.frombuffer(body, dtype=WINDOW_DTYPE)
+
+    def stages(self):
+        return self._json('stages')
+
+    def model(self):
+        return self._json('model')
+
+    def metrics(self):
+        return self._get('metrics').decode()
+
+
+class RemoteHistory:
+    """
+    Local mirror of one device's prediction history on a monitor service.
+
+    Records live in a HistoryStore; `refresh` only fetches records past the
+    last one mirrored, so calling it on every dashboard rerun costs one
+    small request. Rows of one decoded chunk share a timestamp, so the
+    cursor is the last timestamp plus how many rows with it are mirrored. Offers the TimeSeriesLog read methods the dashboard
+    uses (first/last_timestamp, query, iter_range).
+    """
+
+    def __init__(self, client, device, retention=100_000):
+        self.client = client
+        self.device = device
+        self.store = HistoryStore(retention)
+
+    def __len__(self):
+        return len(self.store)
+
+    def refresh(self):
+        """Pull new records; returns how many arrived"""
+        received = 0
+        while True:
+            since = skip = None
+            if len(self.store):
+                timestamps = self.store.column('timestamp')
+                since = int(timestamps[-1])
+                skip = len(timestamps) - int(np.searchsorted(timestamps, since, 'left'))
+            records = self.client.history(self.device, since_ns=since, skip=skip, limit=PAGE_ROWS)
+            if len(records):
+                self.store.extend({name: records[name] for name in RECORD_DTYPE.names})
+                received += len(records)
+            if len(records) < PAGE_ROWS:
+                return received
+
+    def first_timestamp(self):
+        return self.store.first_timestamp()
+
+    def last_timestamp(self):
+        return self.store.last_timestamp()
+
+    def query(self, start_ns=None, end_ns=None):
+        return self.store.records(*self.store.time_slice(start_ns, end_ns))
+
+    def iter_range(self, start_ns=None, end_ns=None, chunk_rows=65_536):
+        start, stop = self.store.time_slice(start_ns, end_ns)
+        for i in range(start, stop, chunk_rows):
+            yield self.store.records(i, min(i + chunk_rows, stop))
@@ -0,0 +1,355 @@
+"""
+Headless monitoring service: ingestion, inference and storage without a browser.
+
+Runs a FleetIngestor over the configured serial ports and/or MQTT broker,
+scores readings on the SageMaker endpoint or a local model, persists every
+prediction to a per-device telemetry log and answers queries over a local
+HTTP API (see monitor_client.py; the dashboard uses it in client mode), e.g.:
+
+    python monitor_service.py --serial /dev/ttyACM0=bench-1 --endpoint cpu-state-xgboost-endpoint-improved-1744570066
+    python monitor_service.py --mqtt-host localhost --model model.tar.gz --network 5G
+    python monitor_service.py --serial /dev/ttyACM0 --registry model_registry.json
+
+With --registry the model is read from the registry file and swapped, or
+shadow-tested, whenever the file changes, without stopping ingestion.
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from dispatcher import make_sagemaker_client
+from fleet import FleetIngestor, MqttSource, SerialSource
+from history_store import BACKENDS, NETWORK_TYPES, RECORD_DTYPE
+from inference import make_features
+from instrumentation import Instrumentation
+from model_registry import ModelRegistry
+from sensor_states import STATE_THRESHOLDS
+from serial_protocol import SENSOR_FIELDS
+from timeseries_log import TimeSeriesLog
+
+DEFAULT_PORT = 8765
+TELEMETRY_DIR = 'telemetry'
+HISTORY_LIMIT = 100_000          # most rows returned by one /history request
+AGGREGATE_POINTS = 1000          # default /aggregates point budget, as charts.POINT_BUDGET
+LATENCY_PERCENTILES = (50, 95, 99)
+UNSAFE_PATH_CHARS = re.compile(r'[^\w.-]')   # device IDs name their telemetry directories
+
+
+def route_labels(records):
+    """Route of each record as in the dashboard: network type, or Edge / Cache / Gated"""
+    labels = np.asarray(NETWORK_TYPES, dtype=object)[records['network_type']]
+    backends = np.asarray(BACKENDS, dtype=object)[records['backend']]
+    for backend, label in (('local', 'Edge'), ('cache', 'Cache'), ('gate', 'Gated')):
+        labels[backends == backend] = label
+    return labels
+
+
+def latency_summary(records, percentiles=LATENCY_PERCENTILES):
+    """Latency statistics (ms) per route for a RECORD_DTYPE array"""
+    summary = {}
+    routes = route_labels(records)
+    for route in dict.fromkeys(routes):
+        latency = records['latency'][routes == route].astype(np.float64)
+        summary[route] = {
+            'count': int(len(latency)),
+            'mean_ms': float(latency.mean()),
+            'min_ms': float(latency.min()),
+            'max_ms': float(latency.max()),
+            'std_ms': float(latency.std(ddof=1)) if len(latency) > 1 else None,
+            'amortized_ms': float(records['amortized_latency'][routes == route].mean()),
+            **{f'p{q:g}_ms': float(v) for q, v in zip(percentiles, np.percentile(latency, percentiles))},
+        }
+    return summary
+
+
+class MonitorService:
+    """
+    Owns a FleetIngestor and its predictor and serves a read-only query API.
+
+    Endpoints (GET, JSON unless noted):
+    /health                     ingestion counters and uptime
+    /devices                    one summary per device
+    /readings?device&since      raw readings after ring-buffer cursor `since`
+    /history?device&since_ns&skip&start_ns&end_ns&limit&format
+                                prediction records; RECORD_DTYPE bytes by default, or format=json.
+                                since_ns is inclusive and the first `skip` records from it are left
+                                out (the ones the caller already has), since records can share a
+                                timestamp
+    /latency?device             latency statistics per route
+    /aggregates?device&start_ns&end_ns&max_points
+                                WINDOW_DTYPE bytes at the finest resolution with at most
+                                max_points windows (X-Resolution-S header), or no body and
+                                X-Resolution-S: raw when the raw records fit
+    /stages                     per-stage latency percentiles
+    /model                      active model, shadow candidate and shadow comparison
+    /metrics                    Prometheus text format
+    """
+
+    def __init__(self, ingestor, instrumentation=None, host='127.0.0.1', port=DEFAULT_PORT, registry=None):
+        self.ingestor = ingestor
+        self.instrumentation = instrumentation
+        self.registry = registry
+        self.started = time.time()
+        self._server = ThreadingHTTPServer((host, port), _QueryHandler)
+        self._server.daemon_threads = True
+        self._server.service = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.ingestor.start()
+        self._thread = threading.Thread(target=self._server.serve_forever, name='monitor-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.ingestor.stop(timeout=5)
+
+    def _device(self, params, required=True):
+        device_id = params.get('device')
+        if device_id is None:
+            if required:
+                raise LookupError("missing 'device' parameter")
+            return None
+        state = self.ingestor.devices.get(device_id)
+        if state is None:
+            raise LookupError(f"unknown device {device_id!r}")
+        return state
+
+    def records(self, state, start_ns=None, end_ns=None, limit=None):
+        """Prediction records of one device in [start_ns, end_ns), from its log when it has one"""
+        if state.log is None:
+            with state._lock:
+                start, stop = state.history.time_slice(start_ns, end_ns)
+                return state.history.records(start, stop if limit is None else min(stop, start + limit))
+        # Only copy as many memory-mapped chunks as the limit needs
+        chunks, n = [], 0
+        for chunk in state.log.iter_range(start_ns, end_ns):
+            chunks.append(chunk if limit is None else chunk[:limit - n])
+            n += len(chunks[-1])
+            if limit is not None and n >= limit:
+                break
+        return np.concatenate(chunks) if chunks else np.empty(0, RECORD_DTYPE)
+
+    def health(self, params):
+        return {'status': 'ok' if self.ingestor.error is None else 'degraded',
+                'uptime_s': time.time() - self.started,
+                'devices': len(self.ingestor.devices),
+                'network_type': self.ingestor.network_type,
+                'stats': dict(self.ingestor.stats),
+                'source_errors': self.ingestor.source_errors,
+                'last_error': None if self.ingestor.error is None else str(self.ingestor.error)}
+
+    def devices(self, params):
+        return self.ingestor.snapshot()
+
+    def readings(self, params):
+        state = self._device(params)
+        rows, cursor, lost = state.readings.since(int(params.get('since', 0)))
+        return {'columns': ['timestamp', *SENSOR_FIELDS], 'rows': rows.tolist(), 'cursor': cursor, 'lost': lost}
+
+    def history(self, params):
+        state = self._device(params)
+        start_ns = _int(params, 'start_ns')
+        skip = 0
+        if 'since_ns' in params:
+            since_ns = int(params['since_ns'])
+            if start_ns is None or start_ns <= since_ns:
+                start_ns, skip = since_ns, _int(params, 'skip') or 0
+        limit = min(_int(params, 'limit') or HISTORY_LIMIT, HISTORY_LIMIT)
+        return self.records(state, start_ns, _int(params, 'end_ns'), limit + skip)[skip:]
+
+    def latency(self, params):
+        state = self._device(params, required=False)
+        states = [state] if state is not None else list(self.ingestor.devices.values())
+        records = [self.records(s) for s in states]
+        records = np.concatenate(records) if records else np.empty(0, RECORD_DTYPE)
+        return latency_summary(records)
+
+    def aggregates(self, params):
+        state = self._device(params)
+        max_points = _int(params, 'max_points') or AGGREGATE_POINTS
+        return state.aggregates.query(_int(params, 'start_ns'), _int(params, 'end_ns'), max_points)
+
+    def stages(self, params):
+        return self.instrumentation.summary() if self.instrumentation is not None else []
+
+    def model(self, params):
+        return self.registry.status() if self.registry is not None else {}
+
+    def metrics(self, params):
+        lines = []
+        if self.instrumentation is not None:
+            lines.append(self.instrumentation.to_prometheus().rstrip('\n'))
+        lines += ['# HELP fleet_readings_total Readings ingested, by outcome', '# TYPE fleet_readings_total counter']
+        for key, value in self.ingestor.stats.items():
+            lines.append(f'fleet_readings_total{{outcome="{key}"}} {value}')
+        lines += ['# HELP fleet_devices Devices seen', '# TYPE fleet_devices gauge',
+                  f'fleet_devices {len(self.ingestor.devices)}']
+        return '\n'.join(lines) + '\n'
+
+
+def _int(params, name):
+    return int(params[name]) if params.get(name) not in (None, '') else None
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """Routes GET /<endpoint> to the MonitorService method of the same name"""
+
+    protocol_version = 'HTTP/1.1'
+    ROUTES = ('health', 'devices', 'readings', 'history', 'latency', 'aggregates', 'stages', 'model', 'metrics')
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = url.path.strip('/')
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if name not in self.ROUTES:
+            self._reply(404, {'error': f"unknown endpoint {url.path!r}"})
+            return
+        try:
+            result = getattr(self.server.service, name)(params)
+        except LookupError as e:
+            self._reply(404, {'error': str(e)})
+            return
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+
+        if name == 'metrics':
+            self._send(200, result.encode(), 'text/plain; version=0.0.4')
+        elif name == 'history' and params.get('format', 'records') == 'records':
+            # Raw fixed-width records: the client maps them straight back with np.frombuffer
+            self._send(200, np.ascontiguousarray(result).tobytes(), 'application/octet-stream',
+                       {'X-Record-Dtype': json.dumps(RECORD_DTYPE.descr)})
+        elif name == 'history':
+            self._reply(200, {field: result[field].tolist() for field in RECORD_DTYPE.names})
+        elif name == 'aggregates':
+            resolution, windows = result
+            body = b'' if windows is None else np.ascontiguousarray(windows).tobytes()
+            self._send(200, body, 'application/octet-stream',
+                       {'X-Resolution-S': 'raw' if resolution is None else str(resolution)})
+        else:
+            self._reply(200, result)
+
+    def _reply(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_registry(args, pipeline=None, instrumentation=None):
+    """Model registry shared by every device: from --registry (watched) or fixed to --endpoint / --model"""
+    target = {'model': args.model} if args.model else {'endpoint': args.endpoint} if args.endpoint else None
+    options = dict(
+        client_factory=lambda: make_sagemaker_client(args.region, max_pool_connections=args.in_flight,
+                                                     endpoint_url=args.endpoint_url),
+        max_batch_size=args.batch_size,
+        max_wait_ms=args.batch_window_ms,
+        max_in_flight=args.in_flight,
+        probe=make_features(STATE_THRESHOLDS[:, :2].mean(axis=1).tolist(), pipeline),
+        instrumentation=instrumentation
+    )
+    if args.registry:
+        return ModelRegistry.from_file(args.registry, default=target, **options).watch()
+    return ModelRegistry(target, **options)
+
+
+def parse_serial(spec, index):
+    """PORT or PORT=DEVICE_ID"""
+    port, _, device_id = spec.partition('=')
+    return port, device_id or f'serial-{index}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serial', action='append', default=[], metavar='PORT[=DEVICE]',
+                        help="Serial port to ingest, optionally with a device ID (repeatable)")
+    parser.add_argument('--protocol', choices=['text', 'binary'], default='text')
+    parser.add_argument('--mqtt-host', help="Also subscribe to readings on this MQTT broker")
+    parser.add_argument('--mqtt-port', type=int, default=1883)
+    parser.add_argument('--mqtt-topic', default='sensors/+/readings')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--endpoint', help="Score on this SageMaker endpoint")
+    target.add_argument('--model', help="Score locally with this model artifact")
+    parser.add_argument('--registry', help="Model registry file to follow (--endpoint/--model are the default)")
+    parser.add_argument('--endpoint-url', help="Override the runtime URL (e.g. a stub endpoint)")
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--network', choices=list(NETWORK_TYPES), default='4G', help="Network the readings travel over")
+    parser.add_argument('--pipeline', help="feature_pipeline.json (default: the legacy ten features)")
+    parser.add_argument('--no-gate', action='store_true', help="Score every reading (no change detection)")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-window-ms', type=float, default=20)
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--retention', type=int, default=100_000, help="Predictions kept in memory per device")
+    parser.add_argument('--telemetry-dir', default=TELEMETRY_DIR, help="Per-device telemetry logs ('' to disable)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    if not args.serial and not args.mqtt_host:
+        parser.error("nothing to ingest: give --serial and/or --mqtt-host")
+    if not (args.endpoint or args.model or (args.registry and os.path.exists(args.registry))):
+        parser.error("no model: give --endpoint, --model or an existing --registry file")
+
+    pipeline = None
+    if args.pipeline:
+        from features import FeaturePipeline
+        pipeline = FeaturePipeline.load(args.pipeline)
+
+    def open_log(device_id):
+        if not args.telemetry_dir:
+            return None
+        return TimeSeriesLog(os.path.join(args.telemetry_dir, UNSAFE_PATH_CHARS.sub('_', device_id)))
+
+    instrumentation = Instrumentation()
+    registry = build_registry(args, pipeline, instrumentation)
+    ingestor = FleetIngestor(registry, pipeline, network_type=args.network, change_detection=not args.no_gate,
+                             retention=args.retention, log_factory=open_log, instrumentation=instrumentation)
+
+    import serial
+    baud_rate = 115200 if args.protocol == 'binary' else 9600
+    for i, spec in enumerate(args.serial):
+        port, device_id = parse_serial(spec, i)
+        ingestor.add_source(SerialSource(device_id, serial.Serial(port, baud_rate, timeout=0), args.protocol))
+    if args.mqtt_host:
+        ingestor.add_source(MqttSource(args.mqtt_host, args.mqtt_port, args.mqtt_topic))
+
+    service = MonitorService(ingestor, instrumentation, args.host, args.port, registry).start()
+    print(f"Monitoring {len(args.serial)} serial port(s){' and MQTT' if args.mqtt_host else ''}; "
+          f"query API on {service.url}")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    service.stop()
+    registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from serial_protocol import SENSOR_FIELDS
+
+# One Arduino ADC step (5 V / 1023) in each sensor's units, per the scaling in arduino_code.ino
+ADC_STEP = 5.0 / 1023.0
+SENSOR_RESOLUTION = {
+    'temperature': ADC_STEP * 100,   # °C
+    'voltage': ADC_STEP,             # V
+    'current': ADC_STEP,             # A
+    'cpu_usage': ADC_STEP * 20,      # %
+    'fan_speed': ADC_STEP * 1000,    # RPM
+}
+
+
+class PredictionCache:
+    """
+    LRU + TTL cache of prediction results keyed on quantized sensor readings.
+
+    Readings are rounded to a per-sensor `resolution` (default: one ADC
+    step), so consecutive readings that differ only by noise below that
+    resolution share an entry. Entries expire `ttl_s` seconds after they
+    were stored and the least recently used one is evicted beyond
+    `capacity`. Lookups carry a `model_tag` identifying the endpoint or
+    model; a different tag than the cached entries were made with clears
+    the cache.
+    """
+
+    def __init__(self, resolution=None, capacity=4096, ttl_s=30.0, clock=time.monotonic):
+        resolution = {**SENSOR_RESOLUTION, **(resolution or {})}
+        self._steps = [resolution[name] for name in SENSOR_FIELDS]
+        self.capacity = capacity
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires_at, result)
+        self._model_tag = None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'invalidations': 0,
+                      'saved_latency_ms': 0.0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, values):
+        """Quantized key for five readings in SENSOR_FIELDS order, or None if any is not finite"""
+        key = []
+        for value, step in zip(values, self._steps):
+            value = float(value)
+            if not math.isfinite(value):
+                return None
+            key.append(round(value / step))
+        return tuple(key)
+
+    def _check_model(self, model_tag):
+        if model_tag != self._model_tag:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self._model_tag = model_tag
+
+    def get(self, values, model_tag):
+        """Cached result for these readings under `model_tag`, or None"""
+        key = self.key(values)
+        with self._lock:
+            self._check_model(model_tag)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self.stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['saved_latency_ms'] += entry[1]['latency']
+            return entry[1]
+
+    def put(self, values, model_tag, result):
+        """Store a result dict (with a 'latency' entry) for these readings"""
+        key = self.key(values)
+        if key is None:
+            return
+        with self._lock:
+            self._check_model(model_tag)
+            self._entries[key] = (self._clock() + self.ttl_s, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
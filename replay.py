@@ -0,0 +1,360 @@
+"""
+Replay recorded sensor histories through the prediction pipeline.
+
+Streams a recorded file in chunks: a CSV with the five sensor columns (the
+dashboard's sensor_history export, the generator's test_data.csv or a fleet
+shard) or a raw serial capture in the Arduino's text or binary format. Each
+chunk is parsed with the dashboard's rules (readings missing a sensor value
+are dropped), labelled and turned into model features as whole arrays, and
+scored in batches through the local model or an endpoint with several
+requests in flight. Results are streamed to a CSV/Parquet export or a
+telemetry log as fast as the backend answers, or paced at --speed times
+real time, e.g.:
+
+    python replay.py --data exports/sensor_history.csv --model model.tar.gz --output rescored.parquet
+    python replay.py --data data/test_data.csv --endpoint cpu-state-xgboost-endpoint-improved-1744570066
+    python replay.py --data capture.txt --model model.tar.gz --speed 60 --log telemetry
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from dispatcher import InferenceDispatcher, make_sagemaker_client
+from evaluation import MAX_PAYLOAD_BYTES, StreamingMetrics, plan_batch_rows
+from history_store import BACKENDS, NETWORK_TYPES, PROBABILITY_COLUMNS, RECORD_DTYPE, from_local_ns
+from inference import CLASS_NAMES, LocalBackend, RemoteBackend
+from sensor_states import classify_readings
+from serial_protocol import DECODERS, SENSOR_FIELDS
+
+CHUNK_ROWS = 65_536        # rows parsed, featurized and written per chunk
+CAPTURE_READ_BYTES = 1 << 20
+DEFAULT_INTERVAL_S = 1.0   # spacing given to readings recorded without timestamps
+
+
+class Chunk:
+    """
+    One block of recorded readings.
+
+    timestamps: int64 UNIX ns; values: N x 5 float64 readings in SENSOR_FIELDS
+    order; reference: N class indices to compare the new predictions with (the
+    cpu_state label or the recorded prediction), or None
+    """
+
+    def __init__(self, timestamps, values, reference=None):
+        self.timestamps = timestamps
+        self.values = values
+        self.reference = reference
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _Clock:
+    """Timestamps for readings recorded without one, continuing across chunks"""
+
+    def __init__(self, start_ns=None, interval_s=DEFAULT_INTERVAL_S):
+        self.next_ns = time.time_ns() if start_ns is None else start_ns
+        self.interval_ns = int(interval_s * 1e9)
+
+    def take(self, n):
+        timestamps = self.next_ns + np.arange(n, dtype=np.int64) * self.interval_ns
+        self.next_ns += n * self.interval_ns
+        return timestamps
+
+
+def _parse_timestamps(column):
+    """UNIX ns from ISO strings; naive times (dashboard exports) are local, others keep their zone"""
+    import pandas as pd
+
+    parsed = pd.to_datetime(column, format='ISO8601')
+    if parsed.dt.tz is None:
+        return from_local_ns(parsed.to_numpy('M8[ns]').view(np.int64))
+    return parsed.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy('M8[ns]').view(np.int64)
+
+
+def read_csv_chunks(path, chunk_rows=CHUNK_ROWS, clock=None, stats=None):
+    """
+    Yield Chunks from a CSV with the five sensor columns.
+
+    Values that don't parse as numbers make their row invalid and it is
+    dropped, as read_sensor_data's incomplete lines are; `stats['dropped']`
+    counts them. A `timestamp` column is used when present; otherwise
+    `clock` numbers the readings.
+    """
+    import pandas as pd
+
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [name for name in SENSOR_FIELDS if name not in header]
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column(s)")
+    extra = [name for name in ('timestamp', 'cpu_state', 'prediction') if name in header]
+    clock = clock or _Clock()
+
+    for frame in pd.read_csv(path, usecols=list(SENSOR_FIELDS) + extra, chunksize=chunk_rows):
+        values = frame[list(SENSOR_FIELDS)]
+        if not all(dtype.kind in 'fi' for dtype in values.dtypes):
+            values = values.apply(pd.to_numeric, errors='coerce')
+        values = values.to_numpy(np.float64)
+        valid = ~np.isnan(values).any(axis=1)
+        if stats is not None:
+            stats['dropped'] = stats.get('dropped', 0) + int(len(valid) - valid.sum())
+        if not valid.all():
+            frame, values = frame[valid], values[valid]
+        if not len(values):
+            continue
+
+        timestamps = _parse_timestamps(frame['timestamp']) if 'timestamp' in frame else clock.take(len(values))
+        if 'cpu_state' in frame:
+            reference = frame['cpu_state'].to_numpy(np.int8)
+        elif 'prediction' in frame:
+            codes = pd.Categorical(frame['prediction'], categories=CLASS_NAMES).codes
+            reference = codes.astype(np.int8) if (codes >= 0).all() else None
+        else:
+            reference = None
+        yield Chunk(timestamps, values, reference)
+
+
+def read_capture_chunks(path, protocol='text', chunk_rows=CHUNK_ROWS, clock=None, stats=None):
+    """
+    Yield Chunks from a raw serial capture, decoded with the live decoders
+    (parse_sensor_line for text lines). Captures carry no timestamps, so
+    `clock` numbers the readings.
+    """
+    decoder = DECODERS[protocol](max_readings=chunk_rows)
+    clock = clock or _Clock()
+    parts, rows = [], 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(CAPTURE_READ_BYTES)
+            n = decoder.feed(data)
+            while n:
+                parts.append(decoder.values[:n].copy())
+                rows += n
+                if rows >= chunk_rows:
+                    values = np.concatenate(parts)
+                    parts, rows = [], 0
+                    yield Chunk(clock.take(len(values)), values)
+                n = decoder.feed(b'')   # drain what the decoder still holds
+            if not data:
+                break
+    if parts:
+        values = np.concatenate(parts)
+        yield Chunk(clock.take(len(values)), values)
+    if stats is not None:
+        stats['dropped'] = stats.get('dropped', 0) + decoder.errors
+
+
+def build_features(values, pipeline=None):
+    """
+    Model inputs for N readings: the FeaturePipeline's 16 features, or without
+    one the legacy ten values (readings plus their states), as make_features
+    builds for a single reading
+    """
+    if pipeline is not None:
+        return pipeline.transform(values)
+    features = np.empty((len(values), 2 * len(SENSOR_FIELDS)), dtype=np.float32)
+    features[:, :len(SENSOR_FIELDS)] = values
+    features[:, len(SENSOR_FIELDS):] = classify_readings(values)
+    return features
+
+
+def _records(chunk, probabilities, latencies, batch_sizes, network_type, backend_name):
+    records = np.empty(len(chunk), dtype=RECORD_DTYPE)
+    records['timestamp'] = chunk.timestamps
+    for i, name in enumerate(SENSOR_FIELDS):
+        records[name] = chunk.values[:, i]
+    for i, name in enumerate(PROBABILITY_COLUMNS):
+        records[name] = probabilities[:, i]
+    records['prediction'] = np.argmax(probabilities, axis=1)
+    records['latency'] = latencies
+    records['amortized_latency'] = latencies / batch_sizes
+    records['batch_size'] = batch_sizes
+    records['network_type'] = NETWORK_TYPES.index(network_type)
+    records['backend'] = BACKENDS.index(backend_name)
+    return records
+
+
+def replay(chunks, backend, pipeline=None, speed=None, batch_rows=None, max_in_flight=8,
+           payload_limit=MAX_PAYLOAD_BYTES, network_type='4G', metrics=None, stats=None):
+    """
+    Score recorded readings and yield one RECORD_DTYPE array per input chunk, in order.
+
+    Chunks are featurized as whole arrays and split into batches sized by
+    the request payload limit (or `batch_rows`); up to `max_in_flight`
+    batches are scored at once, and the next chunk is prepared while the
+    previous one is still being scored.
+
+    Parameters:
+    chunks (iterable): Chunk objects, e.g. from read_csv_chunks
+    backend: RemoteBackend, PredictorBackend or LocalBackend
+    pipeline (FeaturePipeline): feature pipeline, or None for the legacy ten values
+    speed (float): submit each batch no earlier than its recorded time / `speed`
+        after the first reading (e.g. 60: an hour per minute); None replays
+        as fast as the backend allows
+    metrics (StreamingMetrics): optional; updated with reference vs new predictions
+    stats (dict): optional; receives rows, batches, per-class prediction counts and mean batch latency
+    """
+    limit = None if backend.name == 'local' else payload_limit
+    dispatcher = InferenceDispatcher(backend, max_in_flight=max_in_flight, max_queue=max_in_flight)
+    stats = {} if stats is None else stats
+    stats.update(rows=0, batches=0, latency_ms_total=0.0, predictions=np.zeros(len(CLASS_NAMES), dtype=np.int64))
+    first_recorded = wall_start = None
+    pending = deque()
+
+    def finish(chunk, batches):
+        probabilities = np.empty((len(chunk), len(CLASS_NAMES)), dtype=np.float32)
+        latencies = np.empty(len(chunk), dtype=np.float32)
+        batch_sizes = np.empty(len(chunk), dtype=np.int32)
+        for start, stop, future in batches:
+            probs, latency = future.result()
+            probabilities[start:stop] = probs
+            latencies[start:stop] = latency
+            batch_sizes[start:stop] = stop - start
+            stats['latency_ms_total'] += latency
+        records = _records(chunk, probabilities, latencies, batch_sizes, network_type, backend.name)
+        if metrics is not None and chunk.reference is not None:
+            metrics.update(chunk.reference, records['prediction'])
+        stats['rows'] += len(chunk)
+        stats['predictions'] += np.bincount(records['prediction'], minlength=len(CLASS_NAMES))
+        stats['batches'] += len(batches)
+        return records
+
+    try:
+        for chunk in chunks:
+            features = build_features(chunk.values, pipeline)
+            rows = batch_rows or plan_batch_rows(features, limit)
+            if first_recorded is None:
+                first_recorded, wall_start = int(chunk.timestamps[0]), time.perf_counter()
+            batches = []
+            for start in range(0, len(chunk), rows):
+                stop = min(start + rows, len(chunk))
+                if speed:
+                    due = wall_start + (int(chunk.timestamps[start]) - first_recorded) / 1e9 / speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                batches.append((start, stop, dispatcher.submit(features[start:stop], raw=True)))
+            pending.append((chunk, batches))
+            if len(pending) > 1:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        dispatcher.close(wait=not pending)
+        stats['mean_batch_latency_ms'] = stats['latency_ms_total'] / max(stats['batches'], 1)
+        stats['retries'] = dispatcher.stats['retries']
+
+
+def read_chunks(path, fmt=None, chunk_rows=CHUNK_ROWS, clock=None, stats=None):
+    """Chunks of a recorded file; `fmt` is csv, text or binary (by default csv unless the file is a capture)"""
+    if fmt is None:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'text'
+    if fmt == 'csv':
+        return read_csv_chunks(path, chunk_rows, clock, stats)
+    return read_capture_chunks(path, fmt, chunk_rows, clock, stats)
+
+
+def main():
+    from export import WRITERS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data', required=True, help="Recorded CSV or serial capture")
+    parser.add_argument('--format', choices=['csv', 'text', 'binary'],
+                        help="Input format (default: csv for .csv files, else a text capture)")
+    parser.add_argument('--pipeline', help="feature_pipeline.json to build the 16 model features")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--model', help="Score locally with this model artifact")
+    target.add_argument('--endpoint', help="Score on this SageMaker endpoint")
+    parser.add_argument('--endpoint-url', help="Override the runtime URL (e.g. a stub endpoint)")
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--network', choices=NETWORK_TYPES, default='4G', help="Network type to record")
+    parser.add_argument('--speed', type=float, help="Replay at this multiple of real time (default: flat out)")
+    parser.add_argument('--start', help="ISO start time for readings without timestamps (default: now)")
+    parser.add_argument('--interval-s', type=float, default=DEFAULT_INTERVAL_S,
+                        help="Spacing of readings without timestamps")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--batch-rows', type=int, help="Rows per request (default: sized by the payload limit)")
+    parser.add_argument('--in-flight', type=int, default=8)
+    parser.add_argument('--output', help="Write results to this .csv or .parquet file")
+    parser.add_argument('--log', help="Append results to the telemetry log in this directory")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.model:
+        backend = LocalBackend(args.model)
+    else:
+        client = make_sagemaker_client(args.region, max_pool_connections=args.in_flight,
+                                       endpoint_url=args.endpoint_url)
+        backend = RemoteBackend(client, args.endpoint)
+    pipeline = None
+    if args.pipeline:
+        from features import FeaturePipeline
+        pipeline = FeaturePipeline.load(args.pipeline)
+
+    start_ns = int(datetime.fromisoformat(args.start).timestamp() * 1e9) if args.start else None
+    stats, metrics = {}, StreamingMetrics()
+    chunks = read_chunks(args.data, args.format, args.chunk_rows, _Clock(start_ns, args.interval_s), stats)
+    results = replay(chunks, backend, pipeline, args.speed, args.batch_rows, args.in_flight,
+                     network_type=args.network, metrics=metrics, stats=stats)
+
+    log = None
+    if args.log:
+        from timeseries_log import TimeSeriesLog
+        log = TimeSeriesLog(args.log)
+
+    def logged(parts):
+        for part in parts:
+            if log is not None:
+                log.append(part)
+            yield part
+
+    start_time = time.perf_counter()
+    try:
+        if args.output:
+            fmt = os.path.splitext(args.output)[1].lstrip('.').lower()
+            if fmt not in WRITERS:
+                parser.error(f"--output must end in {' or '.join('.' + f for f in WRITERS)}")
+            WRITERS[fmt](logged(results), args.output)
+        else:
+            for _ in logged(results):
+                pass
+    finally:
+        if log is not None:
+            log.close()
+    elapsed = time.perf_counter() - start_time
+
+    summary = {
+        'rows': stats['rows'],
+        'dropped': stats.get('dropped', 0),
+        'batches': stats['batches'],
+        'seconds': elapsed,
+        'rows_per_s': stats['rows'] / elapsed if elapsed else float('inf'),
+        'mean_batch_latency_ms': stats['mean_batch_latency_ms'],
+        'retries': stats['retries'],
+        'predictions': dict(zip(CLASS_NAMES, stats['predictions'].tolist())),
+        'agreement': metrics.accuracy if metrics.rows else None,
+    }
+    if args.json:
+        summary['confusion_matrix'] = metrics.confusion.tolist() if metrics.rows else None
+        print(json.dumps(summary, indent=2, default=float))
+        return
+
+    print(f"Replayed {summary['rows']} readings in {summary['batches']} batches "
+          f"({summary['seconds']:.2f}s, {summary['rows_per_s']:.0f} readings/s, {summary['dropped']} dropped, "
+          f"{summary['retries']} retries)")
+    print("Predictions: " + ", ".join(f"{name} {count}" for name, count in summary['predictions'].items()))
+    if metrics.rows:
+        print(f"Agreement with the recorded labels/predictions: {metrics.accuracy * 100:.2f}% "
+              f"over {metrics.rows} rows")
+        print(metrics.confusion)
+    if args.output:
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from serial_protocol import SENSOR_FIELDS
+
+STATE_NAMES = ('Normal', 'Warning', 'Critical')
+
+# One row per sensor, in SENSOR_FIELDS order:
+#   normal low, normal high, warning low, warning high (all bounds inclusive)
+# A reading inside the normal band is 0, inside the warning band 1, otherwise 2.
+STATE_THRESHOLDS = np.array([
+    [0.0, 70.0, 70.0, 85.0],            # temperature (°C)
+    [3.0, 3.6, 2.7, 3.0],               # voltage (V)
+    [0.0, 2.0, 2.0, 2.5],               # current (A)
+    [0.0, 70.0, 70.0, 85.0],            # cpu_usage (%)
+    [1000.0, 2500.0, 2500.0, 3000.0],   # fan_speed (RPM)
+])
+STATE_THRESHOLDS.flags.writeable = False
+
+SENSOR_INDEX = {name: i for i, name in enumerate(SENSOR_FIELDS)}
+
+
+def classify_readings(readings, thresholds=STATE_THRESHOLDS):
+    """
+    Vectorized sensor state labelling.
+
+    Parameters:
+    readings (array-like): N x 5 readings in SENSOR_FIELDS order (or any shape
+        whose last axis lines up with the rows of `thresholds`)
+
+    Returns:
+    np.ndarray: int8 states with the same shape (0: Normal, 1: Warning, 2: Critical)
+    """
+    values = np.asarray(readings, dtype=np.float64)
+    normal_lo, normal_hi, warning_lo, warning_hi = thresholds.T
+    # NaN fails every comparison, so it lands in Critical like the scalar checks did
+    not_normal = ~((values >= normal_lo) & (values <= normal_hi))
+    warning = (values >= warning_lo) & (values <= warning_hi)
+    # Equivalent to np.select([normal, warning], [0, 1], default=2) without int64 temporaries
+    states = np.subtract(2, warning, dtype=np.int8)
+    states *= not_normal
+    return states
+
+
+def classify_sensor(sensor_type, values):
+    """Vectorized state labelling for a single sensor's values"""
+    i = SENSOR_INDEX[sensor_type]
+    return classify_readings(np.expand_dims(values, -1), STATE_THRESHOLDS[i:i + 1])[..., 0]
+
+
+def get_sensor_state(sensor_type, value):
+    """Determine sensor state based on thresholds"""
+    return int(classify_sensor(sensor_type, value))
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import numpy as np
+
+from serial_protocol import SENSOR_FIELDS, TextLineDecoder
+
+
+class SensorRingBuffer:
+    """
+    Fixed-capacity ring buffer of timestamped sensor readings.
+
+    Storage is a single preallocated (capacity + 1, 1 + n_sensors) float64 array
+    whose first column is the UNIX timestamp. There is exactly one writer (the
+    reader thread) and any number of readers; the writer fills a slot and only
+    then publishes it by bumping the write counter, and readers validate their
+    copy against the counter afterwards, so no lock is needed.
+    """
+
+    def __init__(self, capacity=4096, n_fields=len(SENSOR_FIELDS)):
+        self.capacity = capacity
+        # One spare slot: the writer may be filling it while readers copy the rest
+        self._slots = capacity + 1
+        self._data = np.zeros((self._slots, 1 + n_fields), dtype=np.float64)
+        self._written = 0  # total number of rows ever published
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    @property
+    def total_written(self):
+        return self._written
+
+    def append(self, timestamp, values):
+        """Write one reading (writer thread only)"""
+        row = self._data[self._written % self._slots]
+        row[0] = timestamp
+        row[1:] = values
+        self._written += 1
+
+    def since(self, cursor):
+        """
+        Copy every reading published at or after absolute position `cursor`.
+
+        Returns (rows, next_cursor, lost) where `lost` counts readings that
+        were overwritten before the caller got to them.
+        """
+        while True:
+            end = self._written
+            start = max(cursor, end - self.capacity)
+            rows = self._data[np.arange(start, end) % self._slots]
+            # The slot being written next still holds position `written - slots`;
+            # if the writer reached our oldest row during the copy, try again.
+            if self._written - self._slots < start:
+                return rows, end, start - cursor
+
+    def snapshot(self, n=None):
+        """Copy of the most recent `n` readings (all buffered if None), oldest first"""
+        end = self._written
+        size = len(self) if n is None else min(n, len(self))
+        rows, _, _ = self.since(end - size)
+        return rows
+
+    def latest(self):
+        """Return (timestamp, sensor dict) for the newest reading, or None"""
+        rows = self.snapshot(1)
+        if len(rows) == 0:
+            return None
+        row = rows[-1]
+        return row[0], dict(zip(SENSOR_FIELDS, row[1:].tolist()))
+
+
+class SerialReader(threading.Thread):
+    """Background thread that drains a serial port into a SensorRingBuffer"""
+
+    def __init__(self, port, buffer, decoder=None):
+        super().__init__(name='serial-reader', daemon=True)
+        self.port = port
+        self.buffer = buffer
+        self.decoder = decoder if decoder is not None else TextLineDecoder()
+        self.error = None
+        self._stop_event = threading.Event()
+
+    @property
+    def readings(self):
+        return self.decoder.readings
+
+    @property
+    def parse_errors(self):
+        return self.decoder.errors
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                # Blocks for at most the port timeout, so stop() stays responsive
+                chunk = self.port.read(self.port.in_waiting or 1)
+            except Exception as e:
+                self.error = e
+                break
+            if not chunk:
+                continue
+
+            now = time.time()
+            n = self.decoder.feed(chunk)
+            while n:
+                for row in self.decoder.values[:n]:
+                    self.buffer.append(now, row)
+                n = self.decoder.feed(b'')
+
+    def stop(self, timeout=None):
+        """Ask the thread to exit and wait for it"""
+        self._stop_event.set()
+        self.join(timeout)
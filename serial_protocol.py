@@ -0,0 +1,173 @@
+from collections import deque
+
+import numpy as np
+
+# Column order used for every sensor array in the project
+SENSOR_FIELDS = ('temperature', 'voltage', 'current', 'cpu_usage', 'fan_speed')
+
+# Binary frame, little-endian, 25 bytes (must match SensorFrame in arduino_code.ino):
+#   sync  0xA5 0x5A | uint16 sequence | 5 x float32 readings | uint8 checksum
+# The checksum is the low byte of the sum of the sequence and reading bytes.
+FRAME_SYNC = b'\xa5\x5a'
+FRAME_DTYPE = np.dtype([
+    ('sync', 'u1', (2,)),
+    ('seq', '<u2'),
+    ('values', '<f4', (len(SENSOR_FIELDS),)),
+    ('checksum', 'u1'),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+
+def parse_sensor_line(line):
+    """Parse one text line from the Arduino into a dict of sensor values"""
+    data = {}
+    parts = line.split(" | ")
+
+    for part in parts:
+        if ":" in part:
+            key, value = part.split(":", 1)
+            key = key.strip().lower()
+            try:
+                value = float(value.split()[0])  # Extract the numeric value
+
+                # Map the keys to the expected format
+                if "temperature" in key:
+                    data['temperature'] = value
+                elif "voltage" in key:
+                    data['voltage'] = value
+                elif "current" in key:
+                    data['current'] = value
+                elif "cpu usage" in key or "cpu" in key:
+                    data['cpu_usage'] = value
+                elif "fan speed" in key or "fan" in key:
+                    data['fan_speed'] = value
+            except (ValueError, IndexError):
+                continue
+
+    return data
+
+
+def encode_frame(seq, values):
+    """Build one binary frame; mirrors sendFrame() in the sketch"""
+    frame = np.zeros(1, dtype=FRAME_DTYPE)
+    frame['sync'] = np.frombuffer(FRAME_SYNC, dtype='u1')
+    frame['seq'] = seq & 0xFFFF
+    frame['values'] = values
+    raw = frame.view('u1')
+    raw[-1] = int(raw[2:-1].sum()) & 0xFF
+    return raw.tobytes()
+
+
+class TextLineDecoder:
+    """
+    Incremental decoder for the " | "-delimited text format.
+
+    `feed(data)` buffers bytes and returns how many complete readings were
+    written to the first rows of `values`; call `feed(b'')` again until it
+    returns 0 to drain a large chunk.
+    """
+
+    def __init__(self, max_readings=256):
+        self.values = np.empty((max_readings, len(SENSOR_FIELDS)), dtype=np.float64)
+        self.readings = 0
+        self.errors = 0
+        self._pending = b''
+        self._lines = deque()
+
+    def feed(self, data):
+        if data:
+            self._pending += data
+            *lines, self._pending = self._pending.split(b'\n')
+            self._lines.extend(lines)
+
+        n = 0
+        while self._lines and n < len(self.values):
+            reading = parse_sensor_line(self._lines.popleft().decode('utf-8', errors='ignore').strip())
+            if all(k in reading for k in SENSOR_FIELDS):
+                self.values[n] = [reading[k] for k in SENSOR_FIELDS]
+                n += 1
+            else:
+                self.errors += 1
+        self.readings += n
+        return n
+
+
+class BinaryFrameDecoder:
+    """
+    Incremental decoder for the framed binary protocol.
+
+    Runs of well-formed frames are decoded in bulk with `numpy.frombuffer`
+    straight into the preallocated `values`/`seqs` arrays; the byte-wise
+    search for the sync marker only happens after corruption. Same `feed`
+    contract as TextLineDecoder.
+
+    A corrupt frame counts as one error, including the bytes skipped while
+    resyncing after it. A sequence number falling back to 0 is taken as the
+    device restarting rather than as lost frames.
+    """
+
+    def __init__(self, max_readings=256):
+        self.values = np.empty((max_readings, len(SENSOR_FIELDS)), dtype=np.float64)
+        self.seqs = np.empty(max_readings, dtype=np.uint16)
+        self.readings = 0
+        self.errors = 0    # frames dropped for a bad checksum or garbage between frames
+        self.lost = 0      # frames missing according to the sequence numbers
+        self._last_seq = None
+        self._resyncing = False
+        self._buf = bytearray()
+
+    def feed(self, data):
+        self._buf += data
+        n = 0
+        pos = 0
+        capacity = len(self.values)
+        while n < capacity and len(self._buf) - pos >= FRAME_SIZE:
+            if self._buf[pos:pos + 2] != FRAME_SYNC:
+                # Out of sync: skip to the next marker
+                nxt = self._buf.find(FRAME_SYNC, pos + 1)
+                pos = nxt if nxt >= 0 else len(self._buf) - 1
+                if not self._resyncing:   # already counted with the frame that broke sync
+                    self.errors += 1
+                    self._resyncing = True
+                continue
+
+            count = min((len(self._buf) - pos) // FRAME_SIZE, capacity - n)
+            frames = np.frombuffer(self._buf, dtype=FRAME_DTYPE, count=count, offset=pos)
+            raw = np.frombuffer(self._buf, dtype=np.uint8, count=count * FRAME_SIZE, offset=pos)
+            raw = raw.reshape(count, FRAME_SIZE)
+            ok = ((raw[:, 0] == FRAME_SYNC[0]) & (raw[:, 1] == FRAME_SYNC[1])
+                  & ((raw[:, 2:-1].sum(axis=1) & 0xFF) == raw[:, -1]))
+            good = count if ok.all() else int(np.argmin(ok))
+
+            if good:
+                self.values[n:n + good] = frames['values'][:good]
+                self.seqs[n:n + good] = frames['seq'][:good]
+                self._track_sequence(self.seqs[n:n + good])
+                n += good
+                pos += good * FRAME_SIZE
+                self._resyncing = False
+            if good < count:
+                # Bad frame at `pos`: drop its marker and resync
+                self.errors += 1
+                self._resyncing = True
+                pos += 1
+            del frames, raw  # release the buffer exports before resizing
+
+        del self._buf[:pos]
+        self.readings += n
+        return n
+
+    def _track_sequence(self, seqs):
+        """Count frames skipped by the sender or lost on the wire (uint16 wraps, 0 after a restart)"""
+        previous = seqs[:-1] if self._last_seq is None else np.concatenate(([self._last_seq], seqs[:-1]))
+        current = seqs[len(seqs) - len(previous):]
+        gaps = (current - (previous.astype(np.uint16) + np.uint16(1))) & 0xFFFF
+        gaps[current == 0] = 0   # the device restarted
+        self.lost += int(gaps.sum())
+        self._last_seq = int(seqs[-1])
+
+
+DECODERS = {
+    'text': TextLineDecoder,
+    'binary': BinaryFrameDecoder,
+}
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Emulated link profiles: mean request latency, its jitter (std dev) and the
+# chance a request loses a packet and waits out a TCP retransmission
+NETWORK_PROFILES = {
+    '4G': {'latency_ms': 50.0, 'jitter_ms': 15.0, 'loss_rate': 0.01},
+    '5G': {'latency_ms': 12.0, 'jitter_ms': 4.0, 'loss_rate': 0.001},
+}
+RETRANSMIT_MS = 200.0   # Linux's minimum TCP retransmission timeout
+
+
+class _InvocationHandler(BaseHTTPRequestHandler):
+    """Answers POST /endpoints/<name>/invocations like the SageMaker runtime"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so client connection pools are exercised
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        n_rows = len([line for line in body.split('\n') if line.strip()])
+
+        stub.record_request(n_rows)
+        delay_ms, throttled = stub.sample()
+        if throttled:
+            self._reply(429, b'{"message": "Rate exceeded"}', 'application/json',
+                        {'x-amzn-ErrorType': 'ThrottlingException'})
+            return
+
+        time.sleep(delay_ms / 1000)
+        payload = '\n'.join(stub.response_row for _ in range(n_rows)).encode()
+        self._reply(200, payload, 'text/csv')
+
+    def _reply(self, status, payload, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubEndpoint:
+    """
+    Local stand-in for a SageMaker inference endpoint.
+
+    Point a sagemaker-runtime client at `url` (endpoint_url=...) with any
+    credentials. Every request sleeps `latency_ms` and returns one CSV row of
+    class probabilities per input row; a `throttle_rate` fraction of requests
+    is rejected with a ThrottlingException instead.
+
+    To emulate a cellular link (see NETWORK_PROFILES), the delay is drawn
+    from a normal distribution with `jitter_ms` standard deviation, and a
+    `loss_rate` fraction of requests waits an extra RETRANSMIT_MS as if a
+    packet had been lost. A `seed` makes the sequence of delays repeatable.
+    """
+
+    def __init__(self, latency_ms=20, throttle_rate=0.0, response_row='0.8,0.15,0.05',
+                 host='127.0.0.1', port=0, jitter_ms=0.0, loss_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.jitter_ms = jitter_ms
+        self.loss_rate = loss_rate
+        self.response_row = response_row
+        self.lost = 0
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _InvocationHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @classmethod
+    def for_network(cls, network, **kwargs):
+        """Stub emulating one of NETWORK_PROFILES; keyword arguments override the profile"""
+        return cls(**{**NETWORK_PROFILES[network], **kwargs})
+
+    def record_request(self, n_rows):
+        with self._lock:
+            self.requests += 1
+            self.rows += n_rows
+
+    def sample(self):
+        """Draw (delay in ms, throttled?) for one request"""
+        with self._lock:
+            if self.throttle_rate and self._random.random() < self.throttle_rate:
+                return 0.0, True
+            delay = self.latency_ms
+            if self.jitter_ms:
+                delay = max(0.0, self._random.gauss(delay, self.jitter_ms))
+            if self.loss_rate and self._random.random() < self.loss_rate:
+                delay += RETRANSMIT_MS
+                self.lost += 1
+            return delay, False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-endpoint', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
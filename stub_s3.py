@@ -0,0 +1,242 @@
+import hashlib
+import itertools
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from xml.sax.saxutils import escape, unescape
+
+XML_NAMESPACE = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+def _decode_aws_chunked(body):
+    """Payload of an aws-chunked body (size;signature CRLF data CRLF ... 0 CRLF trailers)"""
+    data, pos = bytearray(), 0
+    while True:
+        end = body.index(b'\r\n', pos)
+        size = int(body[pos:end].split(b';')[0], 16)
+        if not size:
+            return bytes(data)
+        data += body[end + 2:end + 2 + size]
+        pos = end + 2 + size + 2
+
+
+class _S3Handler(BaseHTTPRequestHandler):
+    """Answers the path-style S3 calls boto3's uploads, downloads, listings and deletes use"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _route(self):
+        url = urlsplit(self.path)
+        bucket, _, key = url.path.lstrip('/').partition('/')
+        query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        return unquote(bucket), unquote(key), query
+
+    def _body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+            body = _decode_aws_chunked(body)
+        return body
+
+    def do_HEAD(self):
+        bucket, key, _ = self._route()
+        obj = self.server.stub.get(bucket, key)
+        if obj is None:
+            self._reply(404, b'')
+            return
+        self._reply(200, b'', obj, length=len(obj['body']))
+
+    def do_GET(self):
+        bucket, key, query = self._route()
+        if not key and 'list-type' in query:
+            self._list(bucket, query)
+            return
+        obj = self.server.stub.get(bucket, key)
+        if obj is None:
+            self._error(404, 'NoSuchKey', key)
+            return
+        self._reply(200, obj['body'], obj)
+
+    def do_PUT(self):
+        stub = self.server.stub
+        bucket, key, query = self._route()
+        body = self._body()
+        if not key:
+            stub.create_bucket(bucket)
+            self._reply(200, b'')
+        elif 'uploadId' in query:
+            etag = stub.upload_part(query['uploadId'], int(query['partNumber']), body)
+            if etag is None:
+                self._error(404, 'NoSuchUpload', key)
+            else:
+                self._reply(200, b'', {'etag': etag})
+        else:
+            metadata = {name[len('x-amz-meta-'):]: value for name, value in self.headers.items()
+                        if name.lower().startswith('x-amz-meta-')}
+            self._reply(200, b'', stub.put(bucket, key, body, metadata))
+
+    def do_POST(self):
+        stub = self.server.stub
+        bucket, key, query = self._route()
+        body = self._body()
+        if 'uploads' in query:
+            metadata = {name[len('x-amz-meta-'):]: value for name, value in self.headers.items()
+                        if name.lower().startswith('x-amz-meta-')}
+            upload_id = stub.create_upload(bucket, key, metadata)
+            self._xml('InitiateMultipartUploadResult', f'<Bucket>{escape(bucket)}</Bucket>'
+                      f'<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>')
+        elif 'uploadId' in query:
+            obj = stub.complete_upload(query['uploadId'])
+            if obj is None:
+                self._error(404, 'NoSuchUpload', key)
+                return
+            self._xml('CompleteMultipartUploadResult', f'<Bucket>{escape(bucket)}</Bucket>'
+                      f'<Key>{escape(key)}</Key><ETag>{escape(obj["etag"])}</ETag>')
+        elif 'delete' in query:
+            keys = [unescape(k) for k in re.findall(r'<Key>(.*?)</Key>', body.decode())]
+            for k in keys:
+                stub.delete(bucket, k)
+            self._xml('DeleteResult', ''.join(f'<Deleted><Key>{escape(k)}</Key></Deleted>' for k in keys))
+        else:
+            self._error(400, 'InvalidRequest', key)
+
+    def do_DELETE(self):
+        bucket, key, _ = self._route()
+        self.server.stub.delete(bucket, key)
+        self._reply(204, b'')
+
+    def _list(self, bucket, query):
+        """ListObjectsV2, in one page"""
+        prefix = query.get('prefix', '')
+        encode = quote if query.get('encoding-type') == 'url' else (lambda k: k)
+        objects = self.server.stub.list(bucket, prefix)
+        contents = ''.join(f'<Contents><Key>{escape(encode(key))}</Key><Size>{len(obj["body"])}</Size>'
+                           f'<ETag>{escape(obj["etag"])}</ETag></Contents>' for key, obj in objects)
+        self._xml('ListBucketResult', f'<Name>{escape(bucket)}</Name><Prefix>{escape(encode(prefix))}</Prefix>'
+                  f'<KeyCount>{len(objects)}</KeyCount><MaxKeys>{max(len(objects), 1000)}</MaxKeys>'
+                  f'<IsTruncated>false</IsTruncated>{contents}')
+
+    def _xml(self, root, content):
+        payload = f'<?xml version="1.0" encoding="UTF-8"?><{root} xmlns="{XML_NAMESPACE}">{content}</{root}>'
+        self._reply(200, payload.encode(), content_type='application/xml')
+
+    def _error(self, status, code, key):
+        payload = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Key>{escape(key)}</Key></Error>'
+        self._reply(status, payload.encode(), content_type='application/xml')
+
+    def _reply(self, status, payload, obj=None, content_type='binary/octet-stream', length=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload) if length is None else length))
+        if obj is not None:
+            self.send_header('ETag', obj['etag'])
+            for name, value in obj.get('metadata', {}).items():
+                self.send_header(f'x-amz-meta-{name}', value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubS3:
+    """
+    Local, in-memory stand-in for S3.
+
+    Point an S3 client at `url` (endpoint_url=..., path-style addressing)
+    with any credentials. Supports what data_prep.py and boto3's transfer
+    manager use: bucket creation, put/get/head/delete of objects with user
+    metadata, listing by prefix, multipart uploads and batch deletes.
+    `objects` maps (bucket, key) to the stored object; `requests` counts
+    calls by method.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, buckets=()):
+        self.objects = {}
+        self.buckets = set(buckets)
+        self.requests = {}
+        self._uploads = {}
+        self._upload_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _S3Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _count(self, method):
+        self.requests[method] = self.requests.get(method, 0) + 1
+
+    def create_bucket(self, bucket):
+        with self._lock:
+            self.buckets.add(bucket)
+
+    def get(self, bucket, key):
+        with self._lock:
+            self._count('get')
+            return self.objects.get((bucket, key))
+
+    def put(self, bucket, key, body, metadata=None):
+        obj = {'body': body, 'etag': f'"{hashlib.md5(body).hexdigest()}"', 'metadata': metadata or {}}
+        with self._lock:
+            self._count('put')
+            self.buckets.add(bucket)
+            self.objects[bucket, key] = obj
+        return obj
+
+    def list(self, bucket, prefix=''):
+        """(key, object) pairs in `bucket` whose key starts with `prefix`, in key order"""
+        with self._lock:
+            self._count('list')
+            return sorted((key, obj) for (b, key), obj in self.objects.items()
+                          if b == bucket and key.startswith(prefix))
+
+    def delete(self, bucket, key):
+        with self._lock:
+            self._count('delete')
+            self.objects.pop((bucket, key), None)
+
+    def create_upload(self, bucket, key, metadata=None):
+        with self._lock:
+            upload_id = str(next(self._upload_ids))
+            self._uploads[upload_id] = {'bucket': bucket, 'key': key, 'metadata': metadata or {}, 'parts': {}}
+        return upload_id
+
+    def upload_part(self, upload_id, number, body):
+        with self._lock:
+            self._count('upload_part')
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                return None
+            upload['parts'][number] = body
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def complete_upload(self, upload_id):
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is None:
+            return None
+        body = b''.join(upload['parts'][number] for number in sorted(upload['parts']))
+        obj = self.put(upload['bucket'], upload['key'], body, upload['metadata'])
+        obj['etag'] = f'"{hashlib.md5(body).hexdigest()}-{len(upload["parts"])}"'
+        return obj
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-s3', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
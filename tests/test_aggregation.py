@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from dateutil import tz
+
+import history_store
+from aggregation import HistoryAggregator
+from history_store import RECORD_DTYPE, local_offsets_ns
+
+NS = 1_000_000_000
+BERLIN = tz.gettz('Europe/Berlin')
+T0 = 1_699_999_980 * NS   # on a whole minute
+
+
+def make_records(timestamps, temperature=None):
+    records = np.zeros(len(timestamps), dtype=RECORD_DTYPE)
+    records['timestamp'] = timestamps
+    records['temperature'] = np.arange(len(timestamps)) if temperature is None else temperature
+    return records
+
+
+def test_fall_back_day_is_one_25_hour_window(monkeypatch):
+    monkeypatch.setattr(history_store, 'LOCAL_TIMEZONE', BERLIN)
+    first = int(datetime(2024, 10, 27, tzinfo=BERLIN).timestamp()) * NS
+    end = int(datetime(2024, 10, 29, tzinfo=BERLIN).timestamp()) * NS
+    aggregator = HistoryAggregator(utc_offset=local_offsets_ns)
+    aggregator.add(make_records(np.arange(first, end, 600 * NS)))
+
+    days = aggregator.windows(86_400)
+    assert [datetime.fromtimestamp(t / NS, BERLIN).replace(tzinfo=None) for t in days['timestamp']] == \
+        [datetime(2024, 10, 27), datetime(2024, 10, 28)]
+    assert days['count'].tolist() == [150, 144]
+    hours = aggregator.windows(3_600)
+    assert len(hours) == 49   # 02:00-03:00 happens twice and stays two windows
+    assert np.all(np.diff(hours['timestamp']) == 3_600 * NS)
+    assert np.all(hours['count'] == 6)
+
+
+def test_late_rows_merge_into_older_windows():
+    aggregator = HistoryAggregator({60: None})
+    aggregator.add(make_records(T0 + np.r_[0:60, 180:300] * NS))   # minutes 0, 3, 4
+    # Out of order within the batch, into an existing window, a missing one and a new one
+    aggregator.add(make_records(T0 + np.array([400, 30, 100]) * NS, temperature=[0, -5, 50]))
+
+    windows = aggregator.windows(60)
+    assert ((windows['timestamp'] - T0) // NS).tolist() == [0, 60, 180, 240, 360]
+    assert windows['count'].tolist() == [61, 1, 60, 60, 1]
+    assert windows['temperature_min'][0] == -5
+    assert windows['temperature_sum'][0] == sum(range(60)) - 5
+    assert aggregator.records == 183
+
+
+def test_query_falls_through_to_coarser_levels_once_trimmed():
+    aggregator = HistoryAggregator({1: 100, 60: None})
+    timestamps = T0 + np.arange(0, 600 * NS, NS // 2)   # 2 rows a second for 10 minutes
+    for chunk in np.array_split(make_records(timestamps), 20):
+        aggregator.add(chunk)
+    fine = aggregator.levels[0]
+    assert fine.size <= 2 * 100 and fine.trimmed_before is not None
+
+    # Recent range still held at 1 s
+    resolution, windows = aggregator.query(T0 + 560 * NS, T0 + 600 * NS, max_points=50)
+    assert resolution == 1 and len(windows) == 40 and windows['count'].sum() == 80
+    # Older than the 1 s windows kept: answered from the 1 min level, with every row counted
+    resolution, windows = aggregator.query(T0, T0 + 600 * NS, max_points=50)
+    assert resolution == 60 and len(windows) == 10
+    assert windows['count'].tolist() == [120] * 10
+    # Few enough rows to draw raw
+    assert aggregator.query(T0 + 590 * NS, T0 + 600 * NS, max_points=50) == (None, None)
+
+
+@pytest.mark.parametrize('rows', [1, 300])
+def test_buffered_single_records_are_folded_before_a_query(rows):
+    aggregator = HistoryAggregator({60: None})
+    for record in make_records(T0 + np.arange(rows) * NS):
+        aggregator.add(record)
+    assert aggregator.windows(60)['count'].sum() == rows
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_prep import LABEL, make_s3_client, prepare
+from serial_protocol import SENSOR_FIELDS
+from stub_s3 import StubS3
+
+BUCKET = 'prepared-data'
+
+
+def write_shard(path, n, seed):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'temperature': rng.uniform(40, 100, n), 'voltage': rng.uniform(9, 15, n),
+        'current': rng.uniform(5, 15, n), 'cpu_usage': rng.uniform(0, 100, n),
+        'fan_speed': rng.uniform(1000, 3000, n),
+    })[list(SENSOR_FIELDS)]
+    frame[LABEL] = rng.integers(0, 3, n)
+    frame.to_csv(path, index=False)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    with StubS3(buckets=[BUCKET]) as stub:
+        yield stub, make_s3_client('us-east-1', endpoint_url=stub.url)
+
+
+@pytest.fixture
+def shards(tmp_path):
+    for name in ('train', 'test'):
+        (tmp_path / name).mkdir()
+    for i in range(3):
+        write_shard(tmp_path / 'train' / f'part-{i}.csv', 500, seed=i)
+    write_shard(tmp_path / 'test' / 'part-0.csv', 200, seed=10)
+    return tmp_path
+
+
+def run(shards, client, **options):
+    return prepare(str(shards / 'train'), str(shards / 'test'), output_dir=str(shards / 'prepared'),
+                   bucket=BUCKET, prefix='fleet', client=client, workers=1, **options)
+
+
+def test_rerun_skips_unchanged_parts(s3, shards):
+    stub, client = s3
+    first = run(shards, client)
+    keys = {key for bucket, key in stub.objects}
+    assert first['shards_written'] == 4 and first['parts_uploaded'] == 7   # train + validation per training shard
+    assert keys == {'fleet/manifest.json'} | {f'fleet/{split}/part-{i}.csv' for split in ('train', 'validation')
+                                              for i in range(3)} | {'fleet/test/part-0.csv'}
+
+    puts = stub.requests['put']
+    second = run(shards, client)
+    assert second['shards_written'] == second['parts_uploaded'] == 0
+    assert second['shards_skipped'] == 4 and second['parts_skipped'] == 7
+    assert stub.requests['put'] == puts + 1   # only the manifest
+    assert second['rows'] == first['rows']
+
+
+def test_changed_shard_uploads_only_its_parts(s3, shards):
+    stub, client = s3
+    pipeline = run(shards, client)['pipeline']
+    body = stub.objects[BUCKET, 'fleet/train/part-0.csv']['body']
+
+    write_shard(shards / 'test' / 'part-0.csv', 300, seed=11)
+    rerun = run(shards, client, pipeline=pipeline)
+    assert rerun['shards_written'] == rerun['parts_uploaded'] == 1
+    assert rerun['parts_skipped'] == 6
+    assert rerun['rows']['test'] == 300
+    assert stub.objects[BUCKET, 'fleet/train/part-0.csv']['body'] == body
+
+
+def test_objects_under_the_channels_not_in_the_manifest_are_deleted(s3, shards):
+    stub, client = s3
+    for key in ('fleet/train/train_xgb_improved.csv', 'fleet/validation/validation_xgb_improved.csv',
+                'fleet/output/model.tar.gz'):
+        stub.put(BUCKET, key, b'legacy')
+
+    summary = run(shards, client)
+    keys = {key for bucket, key in stub.objects}
+    assert summary['parts_deleted'] == 2
+    assert 'fleet/train/train_xgb_improved.csv' not in keys
+    assert 'fleet/validation/validation_xgb_improved.csv' not in keys
+    assert 'fleet/output/model.tar.gz' in keys   # outside the channels
@@ -0,0 +1,122 @@
+import random
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from benchmark_fleet import device_frames
+from dispatcher import InferenceDispatcher, make_sagemaker_client
+from fleet import FleetIngestor, SocketSource
+from inference import BatchingPredictor, RemoteBackend
+from serial_protocol import FRAME_DTYPE, FRAME_SIZE
+from stub_endpoint import StubEndpoint
+
+NORMAL = [70.0, 12.0, 10.0, 50.0, 2000.0]
+HOT = [95.0, 12.0, 10.0, 50.0, 2000.0]   # temperature over the Critical threshold
+
+
+class ThresholdBackend:
+    """Critical when the temperature feature is over 85, else Normal, after a random delay"""
+
+    name = 'remote'
+
+    def __init__(self, max_delay_ms=20, fail_first_hot=False, seed=0):
+        self.max_delay_ms = max_delay_ms
+        self.fail_first_hot = fail_first_hot
+        self._random = random.Random(seed)
+
+    def predict_batch(self, rows, timings=None):
+        time.sleep(self._random.uniform(0, self.max_delay_ms) / 1000)
+        hot = np.array([row[0] > 85 for row in rows])
+        if self.fail_first_hot and hot.any():
+            self.fail_first_hot = False
+            raise RuntimeError("endpoint error")
+        probabilities = np.where(hot[:, None], [0.0, 0.1, 0.9], [0.9, 0.1, 0.0])
+        return probabilities, 1.0
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def threshold_predictor():
+    def build(**options):
+        backend = ThresholdBackend(**options)
+        dispatcher = InferenceDispatcher(backend, max_in_flight=8)
+        predictor = BatchingPredictor(backend, max_batch_size=1, max_wait_ms=0, dispatcher=dispatcher)
+        built.append((predictor, dispatcher))
+        return predictor
+
+    built = []
+    yield build
+    for predictor, dispatcher in built:
+        predictor.close()
+        dispatcher.close()
+
+
+def test_history_stays_in_reading_order_with_jittery_endpoint(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    n = 400
+    stream = device_frames(1, n)[0]
+    sent = np.frombuffer(stream, dtype=FRAME_DTYPE)['values']
+    with StubEndpoint(latency_ms=30, jitter_ms=20, seed=1) as stub:
+        client = make_sagemaker_client(endpoint_url=stub.url, max_pool_connections=8)
+        backend = RemoteBackend(client, 'stub-endpoint')
+        dispatcher = InferenceDispatcher(backend, max_in_flight=8)
+        predictor = BatchingPredictor(backend, max_batch_size=4, max_wait_ms=1, dispatcher=dispatcher)
+        ingestor = FleetIngestor(predictor).start()
+        device_end, ingest_end = socket.socketpair()
+        try:
+            ingestor.add_source(SocketSource('bench-1', ingest_end, protocol='binary'))
+            for i in range(n):
+                device_end.sendall(stream[i * FRAME_SIZE:(i + 1) * FRAME_SIZE])
+                time.sleep(0.002)
+            state = ingestor.device('bench-1')
+            wait_for(lambda: len(state.history) == n)
+        finally:
+            ingestor.stop()
+            predictor.close()
+            dispatcher.close()
+            device_end.close()
+
+    assert state.stats['shed'] == state.stats['errors'] == 0
+    assert state.stats['suppressed'] > 0
+    assert np.all(np.diff(state.history.column('timestamp')) >= 0)
+    recorded = np.column_stack([state.history.column(name) for name in ('temperature', 'voltage')])
+    np.testing.assert_array_equal(recorded, sent[:, :2])
+
+
+def test_gated_readings_never_reuse_a_pre_change_prediction(threshold_predictor):
+    ingestor = FleetIngestor(threshold_predictor())
+    readings = [NORMAL] * 50 + [HOT] * 100
+    for i, values in enumerate(readings):
+        ingestor.emit('dev', 1_700_000_000 + i, np.array([values]))
+        time.sleep(0.001)
+    state = ingestor.device('dev')
+    wait_for(lambda: len(state.history) == len(readings))
+
+    predictions = state.history.column('prediction')
+    hot = state.history.column('temperature') > 85
+    assert np.all(predictions[hot] == 2)
+    assert np.all(predictions[~hot] == 0)
+    assert np.all(np.diff(state.history.column('timestamp')) >= 0)
+
+
+def test_failed_forward_rearms_the_gate(threshold_predictor):
+    ingestor = FleetIngestor(threshold_predictor(fail_first_hot=True))
+    readings = [NORMAL] * 20 + [HOT] * 40
+    for i, values in enumerate(readings):
+        ingestor.emit('dev', 1_700_000_000 + i, np.array([values]))
+        wait_for(lambda: not ingestor.device('dev').pending)
+    state = ingestor.device('dev')
+
+    assert state.stats['errors'] == 1
+    assert len(state.history) == len(readings) - 1
+    hot = state.history.column('temperature') > 85
+    assert np.all(state.history.column('prediction')[hot] == 2)
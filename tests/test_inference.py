@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from dispatcher import InferenceDispatcher
+from inference import BatchingPredictor, predict_reading
+from instrumentation import Instrumentation
+
+NORMAL = [70.0, 12.0, 10.0, 50.0, 2000.0]
+BATCH = 8
+
+
+class TimedBackend:
+    name = 'remote'
+
+    def predict_batch(self, rows, timings=None):
+        if timings is not None:
+            timings.update(serialize=1_000, network=2_000_000, response_parse=3_000)
+        return np.tile([0.9, 0.1, 0.0], (len(rows), 1)), 2.0
+
+
+@pytest.fixture(params=['direct', 'dispatcher'])
+def predictor(request):
+    backend = TimedBackend()
+    dispatcher = InferenceDispatcher(backend, max_in_flight=2) if request.param == 'dispatcher' else None
+    # A long window, so the rows below always fill exactly one batch
+    predictor = BatchingPredictor(backend, max_batch_size=BATCH, max_wait_ms=5_000, dispatcher=dispatcher,
+                                  instrumentation=Instrumentation())
+    yield predictor
+    predictor.close()
+    if dispatcher is not None:
+        dispatcher.close()
+
+
+def test_batch_stages_are_recorded_once_per_batch(predictor):
+    instrumentation = predictor.instrumentation
+
+    def reading(_):
+        return predict_reading(NORMAL, lambda features: predictor.predict(features, timeout=10, route='5G'),
+                               instrumentation=instrumentation, network='5G')
+
+    with ThreadPoolExecutor(BATCH) as pool:
+        results = list(pool.map(reading, range(BATCH)))
+    assert all(result['batch_size'] == BATCH for result in results)
+    for stage in ('serialize', 'network', 'response_parse'):
+        assert instrumentation.histogram(stage, '5G').count == 1
+    # Per-row stages still get a sample for every row
+    assert instrumentation.histogram('features', '5G').count == BATCH
+    assert instrumentation.histogram('prediction', '5G').count == BATCH
+
+
+def test_mixed_batch_records_once_per_route(predictor):
+    instrumentation = predictor.instrumentation
+    routes = ['4G', '4G', 'Edge', None] * (BATCH // 4)
+    futures = [predictor.submit([0.0] * 10, route) for route in routes]
+    assert all(future.result(timeout=10)['batch_size'] == BATCH for future in futures)
+    assert instrumentation.histogram('network', '4G').count == 1
+    assert instrumentation.histogram('network', 'Edge').count == 1
+    assert instrumentation.histogram('network', 'all') is None   # rows without a route aren't recorded
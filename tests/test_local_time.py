@@ -0,0 +1,34 @@
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from dateutil import tz
+
+import history_store
+from export import iter_csv
+from history_store import RECORD_DTYPE
+from replay import _parse_timestamps
+
+BERLIN = tz.gettz('Europe/Berlin')
+
+
+@pytest.fixture(autouse=True)
+def berlin(monkeypatch):
+    monkeypatch.setattr(history_store, 'LOCAL_TIMEZONE', BERLIN)
+
+
+def records(start, hours, step_s=600):
+    """Records every `step_s` from the local datetime `start` for `hours` real hours"""
+    first = int(start.replace(tzinfo=BERLIN).timestamp()) * 1_000_000_000
+    rows = np.zeros(hours * 3600 // step_s, dtype=RECORD_DTYPE)
+    rows['timestamp'] = first + np.arange(len(rows), dtype=np.int64) * step_s * 1_000_000_000
+    return rows
+
+
+@pytest.mark.parametrize('start', [datetime(2024, 3, 30, 22), datetime(2024, 10, 26, 22)])
+def test_local_time_export_round_trips_through_replay(start):
+    rows = records(start, 8, step_s=300)
+    frame = pd.read_csv(io.BytesIO(b''.join(iter_csv([rows]))))
+    np.testing.assert_array_equal(_parse_timestamps(frame['timestamp']), rows['timestamp'])
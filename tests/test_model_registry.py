@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from dispatcher import make_sagemaker_client
+from model_registry import ModelRegistry
+from stub_endpoint import StubEndpoint
+
+ROW = [0.0] * 16
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def write_registry(path, entry, mtime):
+    with open(path, 'w') as f:
+        json.dump(entry, f)
+    os.utime(path, (mtime, mtime))   # distinct mtimes even on coarse-grained filesystems
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    with StubEndpoint(latency_ms=5, jitter_ms=5, seed=2) as endpoint:
+        yield endpoint
+
+
+def test_swaps_under_load_lose_no_rows(stub):
+    registry = ModelRegistry({'endpoint': 'model-a'}, lambda: make_sagemaker_client(endpoint_url=stub.url),
+                             max_batch_size=4, max_wait_ms=1, probe=ROW)
+    futures = []
+    stop = threading.Event()
+
+    def load():
+        while not stop.is_set():
+            futures.append(registry.submit(ROW))
+            time.sleep(0.0005)
+
+    producer = threading.Thread(target=load)
+    producer.start()
+    try:
+        for name in ('model-b', 'model-a', 'model-b', 'model-a'):
+            time.sleep(0.05)
+            registry.activate({'endpoint': name})
+    finally:
+        stop.set()
+        producer.join()
+    results = [f.result(timeout=30) for f in futures]
+    wait_for(lambda: not registry.draining)
+    registry.close()
+
+    assert registry.swaps == 4
+    assert len(results) == len(futures) > 0
+    assert all(result['prediction'] == 'Normal' for result in results)
+    assert stub.rows == len(futures) + 4   # every row scored exactly once, plus each rollout's probe
+
+
+def test_failed_rollout_stays_reported_and_is_retried(stub, tmp_path):
+    path = str(tmp_path / 'registry.json')
+    write_registry(path, {'active': {'endpoint': 'model-a'}}, 1_000)
+    registry = ModelRegistry.from_file(path, client_factory=lambda: make_sagemaker_client(endpoint_url=stub.url))
+    registry.watch(interval_s=0.01)
+    try:
+        write_registry(path, {'active': {'model': str(tmp_path / 'missing.json')}}, 2_000)
+        wait_for(lambda: registry.error is not None)
+        time.sleep(0.1)   # several more polls
+        assert registry.error is not None
+        assert registry.active.name == 'model-a'
+
+        write_registry(path, {'active': {'endpoint': 'model-b'}}, 3_000)
+        wait_for(lambda: registry.active.name == 'model-b')
+        wait_for(lambda: registry.error is None)
+    finally:
+        registry.close()
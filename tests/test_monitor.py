@@ -0,0 +1,60 @@
+import pytest
+
+import monitor_client
+from fleet import FleetIngestor
+from monitor_client import MonitorClient, RemoteHistory
+from monitor_service import MonitorService
+from timeseries_log import TimeSeriesLog
+
+RESULT = {'probabilities': {'Normal': 0.9, 'Warning': 0.1, 'Critical': 0.0}, 'latency': 1.0,
+          'amortized_latency': 1.0, 'batch_size': 1, 'backend': 'local'}
+
+
+@pytest.fixture(params=['memory', 'log'])
+def service(request, tmp_path):
+    log_factory = (lambda device: TimeSeriesLog(str(tmp_path / device))) if request.param == 'log' else None
+    service = MonitorService(FleetIngestor(None, log_factory=log_factory), port=0).start()
+    yield service
+    service.stop()
+
+
+def record(state, timestamp, n, first=0):
+    """`n` rows with the same timestamp (UNIX s), as FleetIngestor.emit records one decoded chunk"""
+    for i in range(first, first + n):
+        state.record(timestamp, [70.0 + i, 12.0, 10.0, 50.0, 2000.0], RESULT, '4G')
+
+
+def test_rows_sharing_a_timestamp_arrive_across_refreshes(service):
+    state = service.ingestor.device('dev')
+    mirror = RemoteHistory(MonitorClient(service.url), 'dev')
+    record(state, 1_700_000_000, 2)
+    assert mirror.refresh() == 2
+
+    record(state, 1_700_000_000, 3, first=2)   # rest of the chunk, after the poll
+    record(state, 1_700_000_001, 1, first=5)
+    assert mirror.refresh() == 4
+    assert mirror.refresh() == 0
+    assert mirror.store.column('temperature').tolist() == [70.0 + i for i in range(6)]
+
+
+def test_pages_split_inside_a_timestamp(service, monkeypatch):
+    monkeypatch.setattr(monitor_client, 'PAGE_ROWS', 2)
+    state = service.ingestor.device('dev')
+    record(state, 1_700_000_000, 5)
+    record(state, 1_700_000_001, 2, first=5)
+
+    mirror = RemoteHistory(MonitorClient(service.url), 'dev')
+    assert mirror.refresh() == 7
+    assert mirror.store.column('temperature').tolist() == [70.0 + i for i in range(7)]
+
+
+def test_history_stores_report_timestamps_as_ns(service):
+    state = service.ingestor.device('dev')
+    mirror = RemoteHistory(MonitorClient(service.url), 'dev')
+    assert state.history.first_timestamp() is None and mirror.first_timestamp() is None
+    record(state, 1_700_000_000, 1)
+    record(state, 1_700_000_005, 1, first=1)
+    mirror.refresh()
+    for history in (state.history, mirror, state.log or state.history):
+        assert history.first_timestamp() == 1_700_000_000 * 10**9
+        assert history.last_timestamp() == 1_700_000_005 * 10**9
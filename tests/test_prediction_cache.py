@@ -0,0 +1,74 @@
+from prediction_cache import SENSOR_RESOLUTION, PredictionCache
+from serial_protocol import SENSOR_FIELDS
+
+READING = [70.0, 12.0, 10.0, 50.0, 2000.0]
+TAG = ('remote', 'endpoint-a', None)   # as ModelVersion.tag
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def result(latency=40.0):
+    return {'prediction': 'Normal', 'latency': latency}
+
+
+def reading(i):
+    return [READING[0] + i, *READING[1:]]
+
+
+def test_readings_within_one_step_share_an_entry():
+    steps = [SENSOR_RESOLUTION[name] for name in SENSOR_FIELDS]
+    on_step = [round(v / s) * s for v, s in zip(READING, steps)]   # bucket centre
+    cache = PredictionCache()
+    cache.put(on_step, TAG, result())
+    assert cache.get([v + 0.4 * s for v, s in zip(on_step, steps)], TAG) is not None
+    assert cache.get([v - 0.4 * s for v, s in zip(on_step, steps)], TAG) is not None
+    assert cache.get([on_step[0] + 0.6 * steps[0], *on_step[1:]], TAG) is None
+    assert cache.get([float('nan'), *on_step[1:]], TAG) is None
+    assert cache.stats['hits'] == 2 and cache.stats['saved_latency_ms'] == 80.0
+
+
+def test_coarser_resolution_widens_the_bucket():
+    cache = PredictionCache(resolution={'temperature': 5.0})
+    cache.put([71.0, *READING[1:]], TAG, result())
+    assert cache.get([69.0, *READING[1:]], TAG) is not None
+    assert cache.get([73.0, *READING[1:]], TAG) is None
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl_s=30.0, clock=clock)
+    cache.put(READING, TAG, result())
+    clock.now = 29.9
+    assert cache.get(READING, TAG) is not None   # a hit doesn't extend the lifetime
+    clock.now = 30.0
+    assert cache.get(READING, TAG) is None
+    assert cache.stats['expired'] == 1 and len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(capacity=3)
+    for i in range(3):
+        cache.put(reading(i), TAG, result())
+    assert cache.get(reading(0), TAG) is not None   # 1 is now the least recently used
+    cache.put(reading(3), TAG, result())
+    assert len(cache) == 3 and cache.stats['evicted'] == 1
+    assert cache.get(reading(1), TAG) is None
+    assert all(cache.get(reading(i), TAG) is not None for i in (0, 2, 3))
+
+
+def test_model_tag_change_invalidates():
+    cache = PredictionCache()
+    cache.put(READING, TAG, result())
+    swapped = ('remote', 'endpoint-b', None)
+    assert cache.get(READING, swapped) is None   # never an answer from the previous model
+    assert cache.stats['invalidations'] == 1 and len(cache) == 0
+
+    cache.put(READING, swapped, result())
+    assert cache.get(READING, TAG) is None   # swapping back doesn't revive old entries
+    assert cache.stats['invalidations'] == 2
@@ -0,0 +1,60 @@
+import numpy as np
+
+from serial_protocol import FRAME_SIZE, BinaryFrameDecoder, encode_frame
+
+VALUES = [70.0, 12.0, 10.0, 50.0, 2000.0]
+
+
+def frames(seqs):
+    return b''.join(encode_frame(seq, [VALUES[0] + seq % 100, *VALUES[1:]]) for seq in seqs)
+
+
+def test_corrupt_frame_is_counted_once():
+    stream = bytearray(frames(range(6)))
+    stream[3 * FRAME_SIZE + 10] ^= 0xFF   # payload of frame 3, so its checksum fails
+    decoder = BinaryFrameDecoder()
+    assert decoder.feed(bytes(stream)) == 5
+    assert decoder.errors == 1
+    assert decoder.lost == 1
+    assert decoder.seqs[:5].tolist() == [0, 1, 2, 4, 5]
+
+    decoder = BinaryFrameDecoder()   # the same stream a byte at a time
+    for i in range(len(stream)):
+        decoder.feed(bytes(stream[i:i + 1]))
+    assert (decoder.readings, decoder.errors, decoder.lost) == (5, 1, 1)
+
+
+def test_resyncs_after_garbage_between_frames():
+    decoder = BinaryFrameDecoder()
+    stream = b'\x01\x02\x03' + frames([0]) + b'\xa5\x00garbage' + frames([1, 2])
+    assert decoder.feed(stream) == 3
+    assert decoder.errors == 2   # two separate runs of garbage
+    assert decoder.lost == 0
+    np.testing.assert_array_equal(decoder.values[:3, 0], [70.0, 71.0, 72.0])
+
+
+def test_seq_wrap_is_not_a_restart():
+    decoder = BinaryFrameDecoder()
+    decoder.feed(frames([65533, 65534, 65535, 0, 1]))
+    assert decoder.lost == 0
+    decoder.feed(frames([3]))   # one frame lost after the wrap
+    assert decoder.lost == 1
+
+
+def test_seq_falling_back_to_0_is_a_restart():
+    decoder = BinaryFrameDecoder()
+    decoder.feed(frames([500, 501, 502]))
+    decoder.feed(frames([0, 1, 2]))   # device rebooted
+    assert decoder.lost == 0
+    decoder.feed(frames([10, 11, 12, 0, 1, 5]))
+    assert decoder.lost == 7 + 3   # 3..9 between the batches, then 2..4 after the second restart
+
+
+def test_frame_split_across_feeds():
+    stream = frames(range(3))
+    decoder = BinaryFrameDecoder()
+    assert decoder.feed(stream[:FRAME_SIZE + 7]) == 1
+    assert decoder.feed(stream[FRAME_SIZE + 7:2 * FRAME_SIZE + 20]) == 1
+    assert decoder.feed(stream[2 * FRAME_SIZE + 20:]) == 1
+    assert decoder.readings == 3 and decoder.errors == decoder.lost == 0
+    assert decoder.values[0, 0] == 72.0   # the buffers hold the latest feed's readings
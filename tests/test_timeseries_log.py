@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from history_store import RECORD_DTYPE
+from timeseries_log import INDEX_INTERVAL, TimeSeriesLog
+
+SEGMENT = 3 * INDEX_INTERVAL + 100   # several index blocks per segment and a partial last one
+
+
+def make_records(timestamps):
+    records = np.zeros(len(timestamps), dtype=RECORD_DTYPE)
+    records['timestamp'] = timestamps
+    records['temperature'] = np.arange(len(timestamps))
+    return records
+
+
+@pytest.fixture
+def timestamps():
+    # Non-decreasing with runs of equal timestamps, spanning several segments; one run (as clamping
+    # produces) covers several index intervals and the end of the second segment
+    rng = np.random.default_rng(0)
+    steps = rng.integers(0, 3, 4 * SEGMENT + 50)
+    steps[2 * SEGMENT - 2 * INDEX_INTERVAL:2 * SEGMENT + INDEX_INTERVAL] = 0
+    return np.cumsum(steps).astype(np.int64) + 1_000
+
+
+def test_ranges_across_segment_boundaries(tmp_path, timestamps):
+    log = TimeSeriesLog(str(tmp_path), segment_records=SEGMENT)
+    for chunk in np.array_split(make_records(timestamps), 7):
+        log.append(chunk)
+    assert len(log) == len(timestamps)
+    assert (tmp_path / 'segment-000003.idx').exists()   # rolled and sealed
+    log.close()
+
+    boundaries = [timestamps[i] for i in range(SEGMENT - 2, len(timestamps), SEGMENT)]
+    probes = [timestamps[0] - 1, timestamps[-1] + 1, *boundaries, *(b + 1 for b in boundaries),
+              *timestamps[::INDEX_INTERVAL]]
+    log = TimeSeriesLog(str(tmp_path), segment_records=SEGMENT)   # sealed segments search their .idx files
+    for start in probes:
+        for end in (start, start + 1, start + 5, start + 3 * SEGMENT, None):
+            expected = np.flatnonzero((timestamps >= start) & (end is None or timestamps < end))
+            got = log.query(start, end)['temperature']
+            np.testing.assert_array_equal(got, expected.astype(np.float32))
+    log.close()
+
+
+def test_reopen_drops_a_partial_tail_record(tmp_path, timestamps):
+    log = TimeSeriesLog(str(tmp_path), segment_records=SEGMENT)
+    log.append(make_records(timestamps[:SEGMENT + 10]))
+    log.close()
+    tail = tmp_path / 'segment-000001.bin'
+    with open(tail, 'ab') as f:
+        f.write(make_records([timestamps[SEGMENT + 10]]).tobytes()[:RECORD_DTYPE.itemsize // 2])
+
+    log = TimeSeriesLog(str(tmp_path), segment_records=SEGMENT)
+    assert len(log) == SEGMENT + 10
+    assert os.path.getsize(tail) == 10 * RECORD_DTYPE.itemsize
+    assert log.last_timestamp() == timestamps[SEGMENT + 9]
+    log.append(make_records(timestamps[SEGMENT + 10:SEGMENT + 20]))
+    np.testing.assert_array_equal(log.query()['timestamp'], timestamps[:SEGMENT + 20])
+    log.close()
+
+
+def test_out_of_order_records_are_clamped(tmp_path):
+    log = TimeSeriesLog(str(tmp_path))
+    log.append(make_records([100, 90, 120, 110]))
+    log.close()
+
+    log = TimeSeriesLog(str(tmp_path))   # the clamp survives a reopen
+    log.append(make_records([50, 130]))
+    assert log.query()['timestamp'].tolist() == [100, 100, 120, 120, 120, 130]
+    assert log.query(120, 130)['temperature'].tolist() == [2, 3, 0]
+    log.close()
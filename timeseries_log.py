@@ -0,0 +1,195 @@
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+
+from history_store import RECORD_DTYPE
+
+SEGMENT_RECORDS = 1_000_000   # records per segment file before rolling over
+INDEX_INTERVAL = 1024         # one sparse index entry per this many records
+
+
+class _Segment:
+    """One append-only segment file plus its sparse timestamp index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path[:-len('.bin')] + '.idx'
+        self.count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        self._map = None
+        self._index = None
+
+    @property
+    def sealed(self):
+        return os.path.exists(self.index_path)
+
+    def records(self):
+        """Memory-mapped view of every complete record in the segment"""
+        if self.count == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        if self._map is None or len(self._map) != self.count:
+            self._map = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', shape=(self.count,))
+        return self._map
+
+    def sparse_index(self):
+        """Timestamp of every INDEX_INTERVAL-th record (persisted once the segment is sealed)"""
+        if self._index is not None:
+            return self._index
+        if self.sealed:
+            self._index = np.fromfile(self.index_path, dtype=np.int64)
+            return self._index
+        # Active segment: strided read touches one page per interval
+        return np.array(self.records()['timestamp'][::INDEX_INTERVAL])
+
+    def seal(self):
+        self.sparse_index().tofile(self.index_path)
+
+    def first_timestamp(self):
+        return int(self.records()['timestamp'][0]) if self.count else None
+
+    def last_timestamp(self):
+        return int(self.records()['timestamp'][-1]) if self.count else None
+
+    def locate(self, timestamp):
+        """Position of the first record with timestamp >= `timestamp`"""
+        index = self.sparse_index()
+        block = max(int(np.searchsorted(index, timestamp, 'left')) - 1, 0)
+        lo = block * INDEX_INTERVAL
+        hi = min(lo + 2 * INDEX_INTERVAL, self.count)
+        timestamps = self.records()['timestamp']
+        return lo + int(np.searchsorted(timestamps[lo:hi], timestamp, 'left'))
+
+
+class TimeSeriesLog:
+    """
+    Append-only on-disk log of prediction records.
+
+    Records use the fixed-width RECORD_DTYPE layout and go into numbered
+    segment files of SEGMENT_RECORDS rows. A closed segment gets a sparse
+    `.idx` file holding every INDEX_INTERVAL-th timestamp, so a time-range
+    query only binary-searches the index and one interval of the
+    memory-mapped segment instead of scanning it. Timestamps are kept
+    non-decreasing (a record older than the previous one is clamped to it)
+    so the searches stay valid across clock adjustments.
+    """
+
+    def __init__(self, directory, segment_records=SEGMENT_RECORDS):
+        self.directory = directory
+        self.segment_records = segment_records
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._check_layout()
+
+        self._segments = [_Segment(path) for path in sorted(glob.glob(os.path.join(directory, 'segment-*.bin')))]
+        for segment in self._segments:
+            # Drop a partially written trailing record left by a crash
+            expected = segment.count * RECORD_DTYPE.itemsize
+            if os.path.getsize(segment.path) != expected:
+                with open(segment.path, 'r+b') as f:
+                    f.truncate(expected)
+        if not self._segments:
+            self._segments.append(self._new_segment(0))
+        self._last_timestamp = next(
+            (segment.last_timestamp() for segment in reversed(self._segments) if segment.count), 0)
+        self._file = open(self._segments[-1].path, 'ab')
+
+    def _check_layout(self):
+        """Refuse to mix record layouts in one directory"""
+        meta_path = os.path.join(self.directory, 'layout.json')
+        layout = {'record_dtype': RECORD_DTYPE.descr, 'index_interval': INDEX_INTERVAL}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored = json.load(f)
+            if stored != json.loads(json.dumps(layout)):
+                raise ValueError(f"{self.directory} was written with a different record layout")
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump(layout, f)
+
+    def _new_segment(self, number):
+        path = os.path.join(self.directory, f'segment-{number:06d}.bin')
+        open(path, 'ab').close()
+        return _Segment(path)
+
+    def __len__(self):
+        return sum(segment.count for segment in self._segments)
+
+    def first_timestamp(self):
+        """Oldest timestamp in the log (ns), or None if empty"""
+        for segment in self._segments:
+            if segment.count:
+                return segment.first_timestamp()
+        return None
+
+    def last_timestamp(self):
+        """Newest timestamp in the log (ns), or None if empty"""
+        return self._last_timestamp if len(self) else None
+
+    def append(self, records):
+        """Append a RECORD_DTYPE array (or a single record)"""
+        records = np.array(records, dtype=RECORD_DTYPE, ndmin=1)
+        if not len(records):
+            return
+        with self._lock:
+            timestamps = np.maximum.accumulate(np.maximum(records['timestamp'], self._last_timestamp))
+            records['timestamp'] = timestamps
+            self._last_timestamp = int(timestamps[-1])
+
+            while len(records):
+                active = self._segments[-1]
+                room = self.segment_records - active.count
+                if room == 0:
+                    self._roll()
+                    continue
+                chunk = records[:room]
+                self._file.write(chunk.tobytes())
+                self._file.flush()
+                active.count += len(chunk)
+                records = records[room:]
+
+    def _roll(self):
+        """Seal the active segment and start a new one"""
+        self._file.close()
+        self._segments[-1].seal()
+        self._segments.append(self._new_segment(len(self._segments)))
+        self._file = open(self._segments[-1].path, 'ab')
+
+    def iter_range(self, start_ns=None, end_ns=None):
+        """Yield zero-copy memory-mapped slices with timestamps in [start_ns, end_ns)"""
+        for segment in list(self._segments):
+            if segment.count == 0:
+                continue
+            if end_ns is not None and segment.first_timestamp() >= end_ns:
+                break
+            if start_ns is not None and segment.last_timestamp() < start_ns:
+                continue
+            lo = 0 if start_ns is None else segment.locate(start_ns)
+            hi = segment.count if end_ns is None else segment.locate(end_ns)
+            if hi > lo:
+                yield segment.records()[lo:hi]
+
+    def query(self, start_ns=None, end_ns=None):
+        """Records with timestamps in [start_ns, end_ns) as one array"""
+        parts = list(self.iter_range(start_ns, end_ns))
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def tail(self, n):
+        """The newest `n` records, oldest first"""
+        parts = []
+        for segment in reversed(self._segments):
+            if n <= 0:
+                break
+            records = segment.records()
+            parts.append(records[max(len(records) - n, 0):])
+            n -= len(parts[-1])
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts[::-1])
+
+    def close(self):
+        with self._lock:
+            self._file.close()